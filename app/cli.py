@@ -0,0 +1,163 @@
+"""Operational commands: ``python -m app.cli <command>``."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+from app import database, migrations, sharding
+from app.synthetic import SyntheticSpec, generate_synthetic_data
+from app.services.rescore import rescore_all, utcnow
+from app.services.sync import queue_all_syncs, run_sync_jobs
+from app.services.training_export import export_training_dataset
+
+
+def _prepare_database() -> None:
+    database.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations(database.engine)
+
+
+def _export_training(args: argparse.Namespace) -> None:
+    # Shards export one after another from their own watermarks; part file names never collide.
+    results = [export_training_dataset(db, Path(args.output), batch_size=args.batch_size) for db in sharding.each_session()]
+    rows = sum(result.rows for result in results)
+    files = sum(len(result.files) for result in results)
+    watermark = max((result.watermark for result in results if result.watermark is not None), default=None)
+    print(f"exported {rows} feedback rows into {files} files from {len(results)} databases; watermark={watermark}")
+
+
+def _generate_synthetic(args: argparse.Namespace) -> None:
+    spec = SyntheticSpec(
+        tenants=args.tenants,
+        connectors_per_tenant=args.connectors,
+        skus_per_connector=args.skus,
+        open_lines_per_tenant=args.open_lines,
+        history_depth=args.history_depth,
+        assessment_depth=args.assessment_depth,
+        seed=args.seed,
+    )
+    # Without a session every tenant is written to its own shard.
+    dataset = generate_synthetic_data(None, spec)
+    counts = ", ".join(f"{name}={value}" for name, value in dataset.counts.items())
+    print(f"generated tenants {', '.join(dataset.tenant_ids)}: {counts}")
+
+
+def _rescore_all(args: argparse.Namespace) -> None:
+    run_id = args.run_id or f"rescore-{utcnow():%Y%m%dT%H%M%S}"
+    result = rescore_all(
+        run_id,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        tenant_ids=args.tenant or None,
+        alerts=not args.no_alerts,
+    )
+    if result.skipped_tenants:
+        print(f"{len(result.skipped_tenants)} tenants already finished in {run_id}")
+    print(
+        f"{run_id}: rescored {result.lines} open lines across {len(result.lines_by_tenant)} tenants "
+        f"in {result.elapsed_s:.1f}s ({result.lines_per_second:.0f} lines/s)"
+    )
+
+
+def _shard_router(args: argparse.Namespace) -> sharding.ShardRouter:
+    directory = args.directory or sharding.get_shard_directory()
+    if not directory:
+        raise SystemExit("set SHARD_DIRECTORY or pass --directory")
+    return sharding.configure(directory, args.buckets)
+
+
+def _migrate_shards(args: argparse.Namespace) -> None:
+    router = _shard_router(args)
+    copied = sharding.migrate_tenants(database.engine, router, args.tenant or None, purge_source=args.purge_source)
+    for tenant_id, rows in copied.items():
+        print(f"{tenant_id}: {rows} rows -> {router.shard_key(tenant_id)}")
+    print(f"migrated {len(copied)} tenants into {router.directory}")
+
+
+def _rebalance_shards(args: argparse.Namespace) -> None:
+    router = _shard_router(args)
+    moved = sharding.rebalance(router)
+    for tenant_id, (source, target) in moved.items():
+        print(f"{tenant_id}: {source} -> {target}")
+    print(f"moved {len(moved)} tenants; {len(router.shard_keys())} shard files in {router.directory}")
+
+
+def _sync_all(args: argparse.Namespace) -> None:
+    jobs = queue_all_syncs(args.mode, args.tenant or None)
+    started = time.perf_counter()
+    run_sync_jobs(jobs, args.workers)
+    print(f"ran {len(jobs)} syncs in {time.perf_counter() - started:.1f}s")
+
+
+def _add_shard_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--directory", help="shard directory (default: SHARD_DIRECTORY)")
+    parser.add_argument("--buckets", type=int, default=None, help="tenant hash buckets, 0 = file per tenant (default: SHARD_BUCKETS)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export_training = subcommands.add_parser(
+        "export-training",
+        help="append new alert feedback to the date-partitioned Parquet training dataset",
+    )
+    export_training.add_argument("--output", default="data/training", help="dataset root directory")
+    export_training.add_argument("--batch-size", type=int, default=5000)
+    export_training.set_defaults(handler=_export_training)
+
+    synthetic = subcommands.add_parser(
+        "generate-synthetic",
+        help="bulk insert synthetic tenants with order lines, history, assessments and alerts",
+    )
+    synthetic.add_argument("--tenants", type=int, default=1)
+    synthetic.add_argument("--connectors", type=int, default=2, help="connectors per tenant")
+    synthetic.add_argument("--skus", type=int, default=200, help="SKUs per connector")
+    synthetic.add_argument("--open-lines", type=int, default=5000, help="open order lines per tenant")
+    synthetic.add_argument("--history-depth", type=int, default=3, help="closed lines per SKU")
+    synthetic.add_argument("--assessment-depth", type=int, default=3, help="assessments per open line")
+    synthetic.add_argument("--seed", type=int, default=42)
+    synthetic.set_defaults(handler=_generate_synthetic)
+
+    rescore = subcommands.add_parser(
+        "rescore-all",
+        help="rescore every open line of every tenant with the current model and thresholds",
+    )
+    rescore.add_argument("--run-id", help="checkpoint name; rerun with the same id to resume (default: rescore-<UTC timestamp>, printed when done)")
+    rescore.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes; tenants are split across them")
+    rescore.add_argument("--batch-size", type=int, default=None, help="lines scored and committed per chunk")
+    rescore.add_argument("--tenant", action="append", help="limit to this tenant (repeatable)")
+    rescore.add_argument("--no-alerts", action="store_true", help="store assessments without raising alerts")
+    rescore.set_defaults(handler=_rescore_all)
+
+    migrate = subcommands.add_parser("migrate-shards", help="copy tenants from DATABASE_URL into their SQLite shards")
+    _add_shard_arguments(migrate)
+    migrate.add_argument("--tenant", action="append", help="limit to this tenant (repeatable)")
+    migrate.add_argument("--purge-source", action="store_true", help="delete migrated tenants from DATABASE_URL")
+    migrate.set_defaults(handler=_migrate_shards)
+
+    rebalance = subcommands.add_parser(
+        "rebalance-shards",
+        help="move tenants whose shard file does not match the current layout (e.g. after changing --buckets)",
+    )
+    _add_shard_arguments(rebalance)
+    rebalance.set_defaults(handler=_rebalance_shards)
+
+    sync_all = subcommands.add_parser("sync-all", help="sync every connector; different shards sync in parallel")
+    sync_all.add_argument("--mode", choices=("incremental", "full"), default="incremental")
+    sync_all.add_argument("--workers", type=int, default=None, help="shards synced at once")
+    sync_all.add_argument("--tenant", action="append", help="limit to this tenant (repeatable)")
+    sync_all.set_defaults(handler=_sync_all)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    _prepare_database()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
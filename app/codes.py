@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterable
+
+RISK_STATUS_CODES = {
+    "green": 0,
+    "yellow": 1,
+    "red": 2,
+}
+RISK_STATUS_BY_CODE = {code: name for name, code in RISK_STATUS_CODES.items()}
+
+# Bit positions are persisted in risk_assessments.reason_mask; append new codes, never reorder.
+REASON_CODE_BITS = {
+    "LOW_STOCK": 1 << 0,
+    "SUPPLIER_LATE_HISTORY": 1 << 1,
+    "ETA_VOLATILITY": 1 << 2,
+    "LEAD_TIME_UPTREND": 1 << 3,
+    "NO_HISTORY": 1 << 4,
+    "PARTIAL_DELIVERY": 1 << 5,
+    "STALE_DATA": 1 << 6,
+    "HEURISTIC_BASELINE": 1 << 7,
+}
+
+
+def encode_status(status: str) -> int:
+    try:
+        return RISK_STATUS_CODES[status]
+    except KeyError:
+        raise ValueError(f"unknown risk status: {status}") from None
+
+
+def decode_status(code: int) -> str:
+    return RISK_STATUS_BY_CODE[code]
+
+
+def encode_reason_codes(reason_codes: Iterable[str]) -> int:
+    mask = 0
+    for reason in reason_codes:
+        try:
+            mask |= REASON_CODE_BITS[reason]
+        except KeyError:
+            raise ValueError(f"unknown reason code: {reason}") from None
+    return mask
+
+
+@lru_cache(maxsize=256)
+def decode_reason_codes(mask: int) -> tuple[str, ...]:
+    return tuple(reason for reason, bit in REASON_CODE_BITS.items() if mask & bit)
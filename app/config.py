@@ -19,3 +19,43 @@ DEFAULT_TENANT_ID = "demo-tenant"
 DEFAULT_USER_ID = "demo-user"
 DEFAULT_USER_ROLE = "owner"
 
+
+# heuristic_v2 adds the ETA revision statistics; try it per tenant or in shadow before switching the default.
+DEFAULT_SCORING_MODEL = "heuristic_v1"
+# tenant_id -> model version; tenants not listed use DEFAULT_SCORING_MODEL.
+TENANT_SCORING_MODELS: dict[str, str] = {}
+# tenant_id -> candidate model version scored in shadow mode alongside the primary model.
+TENANT_SHADOW_MODELS: dict[str, str] = {}
+SHADOW_MAX_LINES_PER_BATCH = 500
+SHADOW_SCORE_DIVERGENCE = 0.10
+SIMULATION_MAX_LINES = 10000
+
+# Per-request query/DB/serialization metrics (Server-Timing header and /metrics).
+INSTRUMENTATION_ENABLED = True
+# Log a possible N+1 when one request repeats the same SQL statement more than this many times; 0 disables.
+N_PLUS_ONE_THRESHOLD = 20
+# Stack sampling interval for profiled sync runs.
+PROFILE_SAMPLE_INTERVAL_S = 0.005
+# Weight of the newest ETA revision in the exponentially weighted volatility/trend statistics.
+ETA_EWMA_ALPHA = 0.3
+# Feedback younger than this is left for the next training export, so rows committed late by a slow
+# transaction cannot fall behind the export watermark.
+TRAINING_EXPORT_SETTLE_WINDOW = timedelta(minutes=5)
+# Open lines scored and committed per chunk by ``python -m app.cli rescore-all``.
+RESCORE_BATCH_SIZE = 1000
+# Timeline events returned with an order detail; older ones are paged from /api/orders/{id}/timeline.
+ORDER_TIMELINE_LIMIT = 50
+# Most alert ids accepted by one POST /api/alerts/bulk request.
+BULK_ALERT_MAX_IDS = 500
+# Most order ids accepted by one POST /api/orders/batch request.
+ORDER_BATCH_MAX_IDS = 200
+# Timeline events per line in batch responses unless the request asks for more.
+ORDER_BATCH_TIMELINE_LIMIT = 10
+# Tenant hash buckets when sharding is on (SHARD_DIRECTORY set); 0 gives every tenant its own SQLite file.
+SHARD_BUCKETS = 0
+# Shard engines kept open by the tenant router; the least recently used one is disposed beyond this.
+SHARD_ENGINE_CACHE_SIZE = 64
+# Parallel sync workers for ``python -m app.cli sync-all``; at most one per shard.
+SYNC_ALL_WORKERS = 4
+# After a commit, the same tenant/user reads from the primary for this long so replica lag never hides their write.
+READ_YOUR_WRITES_WINDOW_S = 5.0
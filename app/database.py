@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 
@@ -11,22 +12,62 @@ def _build_engine(database_url: str):
     return create_engine(database_url, connect_args=connect_args, future=True)
 
 
+def _is_sqlite_file(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def build_primary_engine(database_url: str):
+    engine = _build_engine(database_url)
+    if _is_sqlite_file(database_url):
+        # WAL lets the read-only pool read while a writer holds the lock.
+        @event.listens_for(engine, "connect")
+        def _wal(dbapi_connection, connection_record) -> None:
+            dbapi_connection.execute("PRAGMA journal_mode = WAL")
+
+    return engine
+
+
+def build_read_engine(database_url: str, read_database_url: str | None = None):
+    """Engine for read-only requests: the replica when given, else a query-only pool on the same SQLite file.
+
+    Returns None when neither applies; reads then share the primary engine.
+    """
+    if read_database_url:
+        return _build_engine(read_database_url)
+    if not _is_sqlite_file(database_url):
+        return None
+    engine = _build_engine(database_url)
+
+    @event.listens_for(engine, "connect")
+    def _query_only(dbapi_connection, connection_record) -> None:
+        dbapi_connection.execute("PRAGMA query_only = ON")
+
+    return engine
+
+
+def session_factory(bind) -> sessionmaker:
+    return sessionmaker(bind=bind, autoflush=False, autocommit=False, expire_on_commit=False)
+
+
 def get_database_url() -> str:
     return os.getenv("DATABASE_URL", "sqlite:///./buildsight.db")
 
 
-engine = _build_engine(get_database_url())
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
-Base = declarative_base()
+def get_read_database_url() -> str | None:
+    return os.getenv("READ_DATABASE_URL") or None
 
 
-def reset_engine(database_url: str) -> None:
-    global engine, SessionLocal
-    engine = _build_engine(database_url)
-    SessionLocal = sessionmaker(
-        bind=engine,
-        autoflush=False,
-        autocommit=False,
-        expire_on_commit=False,
-    )
+engine = build_primary_engine(get_database_url())
+read_engine = build_read_engine(get_database_url(), get_read_database_url()) or engine
+SessionLocal = session_factory(engine)
+ReadSessionLocal = session_factory(read_engine)
+Base = declarative_base()
+
 
+def reset_engine(database_url: str, read_database_url: str | None = None) -> None:
+    global engine, read_engine, SessionLocal, ReadSessionLocal
+    engine = build_primary_engine(database_url)
+    read_engine = build_read_engine(database_url, read_database_url) or engine
+    SessionLocal = session_factory(engine)
+    ReadSessionLocal = session_factory(read_engine)
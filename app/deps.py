@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import threading
+import time
 from dataclasses import dataclass
 from typing import Generator
 
-from fastapi import Header
+from fastapi import Depends, Header
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from app import config
-from app import database
+from app import sharding
+
+WRITER_KEY = "writer"
 
 
 @dataclass
@@ -17,14 +22,6 @@ class RequestContext:
     role: str
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def get_request_context(
     x_tenant_id: str | None = Header(default=None),
     x_user_id: str | None = Header(default=None),
@@ -36,3 +33,56 @@ def get_request_context(
         role=(x_user_role or config.DEFAULT_USER_ROLE).lower(),
     )
 
+
+# (tenant_id, user_id) -> monotonic time until which that caller's reads stay on the primary.
+_read_primary_until: dict[tuple[str, str], float] = {}
+_read_primary_lock = threading.Lock()
+
+
+@event.listens_for(Session, "after_commit")
+def _start_read_your_writes(session: Session) -> None:
+    writer = session.info.get(WRITER_KEY)
+    if writer is None:
+        return
+    now = time.monotonic()
+    with _read_primary_lock:
+        # Re-inserting keeps the dict in deadline order (one shared window), so writers that never
+        # read again are dropped from the front here instead of accumulating.
+        _read_primary_until.pop(writer, None)
+        _read_primary_until[writer] = now + config.READ_YOUR_WRITES_WINDOW_S
+        for key, deadline in list(_read_primary_until.items()):
+            if deadline > now:
+                break
+            del _read_primary_until[key]
+
+
+def reads_primary(ctx: RequestContext) -> bool:
+    """True while the caller is inside the read-your-writes window of their last commit."""
+    key = (ctx.tenant_id, ctx.user_id)
+    deadline = _read_primary_until.get(key)
+    if deadline is None:
+        return False
+    if deadline > time.monotonic():
+        return True
+    with _read_primary_lock:
+        _read_primary_until.pop(key, None)
+    return False
+
+
+def get_db(ctx: RequestContext = Depends(get_request_context)) -> Generator[Session, None, None]:
+    # Routed to the tenant's shard when sharding is on, else the shared database.
+    db = sharding.session_for_tenant(ctx.tenant_id)
+    db.info[WRITER_KEY] = (ctx.tenant_id, ctx.user_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(ctx: RequestContext = Depends(get_request_context)) -> Generator[Session, None, None]:
+    """Session for read-only endpoints: the read pool, or the primary right after the caller committed."""
+    db = sharding.session_for_tenant(ctx.tenant_id, read_only=not reads_primary(ctx))
+    try:
+        yield db
+    finally:
+        db.close()
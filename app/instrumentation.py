@@ -0,0 +1,250 @@
+"""Per-request hot-path instrumentation.
+
+An ASGI middleware opens a ``RequestMetrics`` record in a context variable; SQLAlchemy cursor
+events, ORM load events, ``FastJSONResponse`` rendering and template rendering add to it. When the
+response starts, the totals go out as a ``Server-Timing`` header and into process-wide
+aggregates served in Prometheus text format from ``/metrics``. Each hook is a context-variable
+lookup plus a few additions, so the instrumentation stays on in production.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from fastapi.templating import Jinja2Templates
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+UNMATCHED_ROUTE = "unmatched"
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    query_count: int = 0
+    db_time: float = 0.0
+    # Rows written by DML plus ORM objects loaded from result rows.
+    rows: int = 0
+    serialize_time: float = 0.0
+    template_time: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    closed: bool = False
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+
+def current_metrics() -> RequestMetrics | None:
+    metrics = _current.get()
+    if metrics is None or metrics.closed:
+        return None
+    return metrics
+
+
+@contextmanager
+def timed(kind: str) -> Iterator[None]:
+    """Add the block's duration to the current request's ``serialize`` or ``template`` time."""
+    metrics = current_metrics()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if kind == "serialize":
+            metrics.serialize_time += elapsed
+        else:
+            metrics.template_time += elapsed
+
+
+class InstrumentedTemplates(Jinja2Templates):
+    """Jinja2Templates whose render time is attributed to the current request."""
+
+    def TemplateResponse(self, *args, **kwargs):  # noqa: N802 - Starlette's method name
+        with timed("template"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if current_metrics() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    metrics = current_metrics()
+    started = conn.info.get("query_started")
+    if metrics is None or not started:
+        return
+    metrics.db_time += time.perf_counter() - started.pop()
+    metrics.query_count += 1
+    metrics.statements[statement] += 1
+    if cursor.rowcount > 0:
+        metrics.rows += cursor.rowcount
+
+
+@event.listens_for(Mapper, "load")
+def _on_load(target, context) -> None:
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.rows += 1
+
+
+class _Registry:
+    """Process-wide aggregates rendered in Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.duration = defaultdict(lambda: _Histogram(DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: _Histogram(QUERY_COUNT_BUCKETS))
+        self.db_seconds: Counter = Counter()
+        self.rows: Counter = Counter()
+        self.serialize_seconds: Counter = Counter()
+        self.template_seconds: Counter = Counter()
+        self.n_plus_one: Counter = Counter()
+
+    def observe(self, method: str, route: str, status: int, elapsed: float, metrics: RequestMetrics, suspected: bool) -> None:
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, str(status))] += 1
+            self.duration[key].observe(elapsed)
+            self.queries[key].observe(metrics.query_count)
+            self.db_seconds[key] += metrics.db_time
+            self.rows[key] += metrics.rows
+            self.serialize_seconds[key] += metrics.serialize_time
+            self.template_seconds[key] += metrics.template_time
+            if suspected:
+                self.n_plus_one[key] += 1
+
+    def render(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            lines += _counter("buildsight_http_requests_total", "HTTP requests.", self.requests, ("method", "route", "status"))
+            lines += _histograms("buildsight_http_request_duration_seconds", "Time until the response started.", self.duration)
+            lines += _histograms("buildsight_db_queries_per_request", "SQL statements per request.", self.queries)
+            lines += _counter("buildsight_db_seconds_total", "Time spent executing SQL.", self.db_seconds)
+            lines += _counter("buildsight_db_rows_total", "Rows written plus ORM objects loaded.", self.rows)
+            lines += _counter("buildsight_serialization_seconds_total", "JSON response rendering time.", self.serialize_seconds)
+            lines += _counter("buildsight_template_seconds_total", "HTML template rendering time.", self.template_seconds)
+            lines += _counter("buildsight_n_plus_one_requests_total", "Requests flagged by the N+1 detector.", self.n_plus_one)
+        return "\n".join(lines) + "\n"
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _counter(name: str, help_text: str, values: Counter, label_names: tuple[str, ...] = ("method", "route")) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f"{name}{_labels(label_names, key)} {value}" for key, value in sorted(values.items())]
+    return lines
+
+
+def _histograms(name: str, help_text: str, histograms: dict) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in sorted(histograms.items()):
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{method="{method}",route="{route}",le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{method="{method}",route="{route}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{method="{method}",route="{route}"}} {histogram.total}')
+        lines.append(f'{name}_count{{method="{method}",route="{route}"}} {histogram.count}')
+    return lines
+
+
+registry = _Registry()
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+def _suspected_n_plus_one(method: str, route: str, metrics: RequestMetrics) -> bool:
+    threshold = config.N_PLUS_ONE_THRESHOLD
+    if threshold <= 0 or metrics.query_count <= threshold:
+        return False
+    statement, count = metrics.statements.most_common(1)[0]
+    if count <= threshold:
+        return False
+    logger.warning(
+        "possible N+1 route=%s %s statements=%d repeated=%d sql=%s",
+        method,
+        route,
+        metrics.query_count,
+        count,
+        " ".join(statement.split())[:200],
+    )
+    return True
+
+
+def _server_timing(metrics: RequestMetrics, elapsed: float) -> bytes:
+    parts = [
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.query_count} queries, {metrics.rows} rows"',
+        f"serialize;dur={metrics.serialize_time * 1000:.2f}",
+    ]
+    if metrics.template_time:
+        parts.append(f"template;dur={metrics.template_time * 1000:.2f}")
+    parts.append(f"total;dur={elapsed * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start" and not metrics.closed:
+                metrics.closed = True
+                elapsed = time.perf_counter() - metrics.started
+                route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+                method = scope["method"]
+                suspected = _suspected_n_plus_one(method, route, metrics)
+                registry.observe(method, route, message["status"], elapsed, metrics, suspected)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", _server_timing(metrics, elapsed))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
@@ -1,39 +1,49 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
 from fastapi import Depends, FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
 
-from app import config, database, models
-from app.deps import RequestContext, get_db, get_request_context
+from app import config, database, instrumentation, migrations, models, sharding
+from app.deps import RequestContext, get_read_db, get_request_context
 from app.routers.api import router as api_router
 from app.seed import seed_demo_data
+from app.services import recommendations, substitutions, timeline
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+templates = instrumentation.InstrumentedTemplates(directory=str(BASE_DIR / "templates"))
 
 
 def create_app(seed_demo: bool = True) -> FastAPI:
     app = FastAPI(title="Build Sight MVP", version="0.1.0")
     app.include_router(api_router)
+    if config.INSTRUMENTATION_ENABLED:
+        app.add_middleware(instrumentation.InstrumentationMiddleware)
     app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
     @app.on_event("startup")
     def startup() -> None:
         database.Base.metadata.create_all(bind=database.engine)
-        if not seed_demo:
-            return
-        db = database.SessionLocal()
-        try:
-            seed_demo_data(db)
-        finally:
-            db.close()
+        migrations.run_migrations(database.engine)
+        for db in sharding.each_session():
+            # Each shard only holds its own tenants, so shards merge into the in-memory caches.
+            tenants = sharding.tenant_ids(db) if sharding.router is not None else None
+            substitutions.load_index(db, tenant_ids=tenants)
+            recommendations.load_rules(db, tenant_ids=tenants)
+        if seed_demo:
+            db = sharding.session_for_tenant(config.DEFAULT_TENANT_ID)
+            try:
+                seed_demo_data(db)
+            finally:
+                db.close()
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(instrumentation.render_metrics(), media_type="text/plain; version=0.0.4")
 
     @app.get("/", include_in_schema=False)
     def root():
@@ -42,7 +52,7 @@ def create_app(seed_demo: bool = True) -> FastAPI:
     @app.get("/dashboard", response_class=HTMLResponse)
     def dashboard(
         request: Request,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         ctx: RequestContext = Depends(get_request_context),
     ):
         latest = (
@@ -64,7 +74,8 @@ def create_app(seed_demo: bool = True) -> FastAPI:
                 ),
             )
             .filter(models.OrderLine.tenant_id == ctx.tenant_id)
-            .order_by(models.RiskAssessment.risk_status.desc())
+            # Worst first: red, yellow, then green.
+            .order_by(models.RiskAssessment.status_code.desc())
             .all()
         )
         counts = {"green": 0, "yellow": 0, "red": 0}
@@ -80,7 +91,7 @@ def create_app(seed_demo: bool = True) -> FastAPI:
                     "risk_score": risk.risk_score,
                     "confidence": risk.confidence,
                     "impact_date": order_line.impact_date,
-                    "reason_codes": ", ".join(json.loads(risk.reason_codes_json)),
+                    "reason_codes": ", ".join(risk.reason_codes),
                 }
             )
         connectors = (
@@ -90,9 +101,9 @@ def create_app(seed_demo: bool = True) -> FastAPI:
             .all()
         )
         return templates.TemplateResponse(
+            request,
             "dashboard.html",
             {
-                "request": request,
                 "counts": counts,
                 "rows": table,
                 "connectors": connectors,
@@ -102,7 +113,7 @@ def create_app(seed_demo: bool = True) -> FastAPI:
     @app.get("/alerts", response_class=HTMLResponse)
     def alerts_page(
         request: Request,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         ctx: RequestContext = Depends(get_request_context),
     ):
         alerts = (
@@ -112,13 +123,14 @@ def create_app(seed_demo: bool = True) -> FastAPI:
             .limit(100)
             .all()
         )
-        return templates.TemplateResponse("alerts.html", {"request": request, "alerts": alerts})
+        return templates.TemplateResponse(request, "alerts.html", {"alerts": alerts})
 
     @app.get("/orders/{order_id}", response_class=HTMLResponse)
     def order_detail_page(
         order_id: str,
         request: Request,
-        db: Session = Depends(get_db),
+        before: str | None = None,
+        db: Session = Depends(get_read_db),
         ctx: RequestContext = Depends(get_request_context),
     ):
         order_line = (
@@ -126,33 +138,35 @@ def create_app(seed_demo: bool = True) -> FastAPI:
             .filter(models.OrderLine.id == order_id, models.OrderLine.tenant_id == ctx.tenant_id)
             .first()
         )
+        cursor = None
+        if before:
+            try:
+                cursor = timeline.parse_cursor(before)
+            except ValueError:
+                order_line = None
         if not order_line:
             return templates.TemplateResponse(
+                request,
                 "order_detail.html",
-                {"request": request, "order": None, "risk_history": [], "alerts": []},
+                {"order": None, "risk_history": [], "alerts": [], "older_cursor": None},
                 status_code=404,
             )
-        risks = (
-            db.query(models.RiskAssessment)
-            .filter(models.RiskAssessment.order_line_id == order_line.id)
-            .order_by(models.RiskAssessment.assessed_at.desc())
-            .all()
-        )
-        alerts = (
-            db.query(models.Alert)
-            .filter(models.Alert.order_line_id == order_line.id)
-            .order_by(models.Alert.created_at.desc())
-            .all()
-        )
+        history = timeline.order_timeline(db, order_line.id, config.ORDER_TIMELINE_LIMIT, before=cursor)
         return templates.TemplateResponse(
+            request,
             "order_detail.html",
-            {"request": request, "order": order_line, "risk_history": risks, "alerts": alerts},
+            {
+                "order": order_line,
+                "risk_history": [event for event in history.events if event.event_type == "risk_assessed"],
+                "alerts": [event for event in history.events if event.event_type == "alert_created"],
+                "older_cursor": history.next_cursor,
+            },
         )
 
     @app.get("/integrations", response_class=HTMLResponse)
     def integrations_page(
         request: Request,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         ctx: RequestContext = Depends(get_request_context),
     ):
         connectors = (
@@ -161,12 +175,12 @@ def create_app(seed_demo: bool = True) -> FastAPI:
             .order_by(models.SupplierConnector.created_at.desc())
             .all()
         )
-        return templates.TemplateResponse("integrations.html", {"request": request, "connectors": connectors})
+        return templates.TemplateResponse(request, "integrations.html", {"connectors": connectors})
 
     @app.get("/settings/notifications", response_class=HTMLResponse)
     def notification_settings_page(
         request: Request,
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         ctx: RequestContext = Depends(get_request_context),
     ):
         user = (
@@ -178,8 +192,9 @@ def create_app(seed_demo: bool = True) -> FastAPI:
         if user:
             prefs = user.notification_preferences
         return templates.TemplateResponse(
+            request,
             "settings_notifications.html",
-            {"request": request, "notification_preferences": prefs},
+            {"notification_preferences": prefs},
         )
 
     return app
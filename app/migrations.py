@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+
+from sqlalchemy import Integer, MetaData, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app import codes, models
+
+
+def _column_names(conn: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _migrate_risk_assessment_codes(conn: Connection) -> None:
+    """Move risk_status/reason_codes_json text columns to status_code/reason_mask integers."""
+    columns = _column_names(conn, "risk_assessments")
+    if "risk_status" not in columns:
+        return
+
+    if "status_code" not in columns:
+        conn.execute(text("ALTER TABLE risk_assessments ADD COLUMN status_code SMALLINT NOT NULL DEFAULT 0"))
+    if "reason_mask" not in columns:
+        conn.execute(text("ALTER TABLE risk_assessments ADD COLUMN reason_mask INTEGER NOT NULL DEFAULT 0"))
+
+    # Assessments repeat a handful of (status, reasons) combinations, so backfill per distinct pair.
+    pairs = conn.execute(text("SELECT DISTINCT risk_status, reason_codes_json FROM risk_assessments")).all()
+    for risk_status, reason_codes_json in pairs:
+        reasons = [code for code in json.loads(reason_codes_json or "[]") if code in codes.REASON_CODE_BITS]
+        conn.execute(
+            text(
+                "UPDATE risk_assessments SET status_code = :status_code, reason_mask = :reason_mask "
+                "WHERE risk_status = :risk_status AND reason_codes_json = :reason_codes_json"
+            ),
+            {
+                "status_code": codes.encode_status(risk_status),
+                "reason_mask": codes.encode_reason_codes(reasons),
+                "risk_status": risk_status,
+                "reason_codes_json": reason_codes_json,
+            },
+        )
+
+    conn.execute(text("ALTER TABLE risk_assessments DROP COLUMN risk_status"))
+    conn.execute(text("ALTER TABLE risk_assessments DROP COLUMN reason_codes_json"))
+
+
+def _has_integer_primary_key(conn: Connection, table: str) -> bool:
+    primary = [column for column in inspect(conn).get_columns(table) if column.get("primary_key")]
+    return len(primary) == 1 and isinstance(primary[0]["type"], Integer)
+
+
+def _rebuild_with_integer_key(conn: Connection, table: str, order_by: str) -> None:
+    """SQLite's documented rebuild: create ``<table>_new``, copy, drop the old table, rename the new one in.
+
+    Renaming the old table away instead would make SQLite rewrite other tables' foreign keys to the
+    temporary name, leaving them dangling once it is dropped.
+    """
+    rebuilt = f"{table}_new"
+    for index in inspect(conn).get_indexes(table):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+    target = models.Base.metadata.tables[table]
+    scratch = MetaData()
+    for foreign_key in target.foreign_keys:
+        foreign_key.column.table.to_metadata(scratch)
+    target.to_metadata(scratch, name=rebuilt).create(conn)
+
+    existing_columns = _column_names(conn, table)
+    copied = [column.name for column in target.columns if column.name in existing_columns and column.name != "id"]
+    column_list = ", ".join(copied)
+    # Insert in time order so the new integer keys are monotonic with event time.
+    conn.execute(text(f"INSERT INTO {rebuilt} ({column_list}) SELECT {column_list} FROM {table} ORDER BY {order_by}"))
+    conn.execute(text(f"DROP TABLE {table}"))
+    conn.execute(text(f"ALTER TABLE {rebuilt} RENAME TO {table}"))
+
+
+def _migrate_integer_surrogate_keys(conn: Connection) -> None:
+    """Replace 36-char string primary keys on append-heavy tables nothing references with integer keys."""
+    tables = [
+        ("risk_assessments", "assessed_at"),
+        ("supplier_inventory_snapshots", "captured_at"),
+    ]
+    existing = set(inspect(conn).get_table_names())
+    for table, order_by in tables:
+        if table in existing and not _has_integer_primary_key(conn, table):
+            _rebuild_with_integer_key(conn, table, order_by)
+
+
+def _add_order_line_closed_at(conn: Connection) -> None:
+    """Add order_lines.closed_at and backfill closed lines from their last supplier timestamp."""
+    if "order_lines" not in set(inspect(conn).get_table_names()) or "closed_at" in _column_names(conn, "order_lines"):
+        return
+    conn.execute(text("ALTER TABLE order_lines ADD COLUMN closed_at DATETIME"))
+    conn.execute(
+        text(
+            "UPDATE order_lines SET closed_at = COALESCE(source_timestamp, updated_at) "
+            "WHERE status NOT IN ('open', 'partially_delivered')"
+        )
+    )
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """create_all only creates new tables; add columns declared later (nullable or with a server default)."""
+    existing_tables = set(inspect(conn).get_table_names())
+    for table in models.Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = _column_names(conn, table.name)
+        for column in table.columns:
+            if column.name in columns or (column.server_default is None and not column.nullable):
+                continue
+            definition = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+            if not column.nullable:
+                definition += " NOT NULL"
+            if column.server_default is not None:
+                definition += f" DEFAULT {column.server_default.arg}"
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+
+
+def _create_missing_indexes(conn: Connection) -> None:
+    """create_all only indexes new tables; add indexes declared later on existing ones."""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in models.Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn)
+
+
+MIGRATIONS = [
+    _migrate_risk_assessment_codes,
+    _migrate_integer_surrogate_keys,
+    _add_order_line_closed_at,
+    _add_missing_columns,
+    _create_missing_indexes,
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    with engine.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
@@ -3,9 +3,23 @@ from __future__ import annotations
 import uuid
 from datetime import date, datetime, timezone
 
-from sqlalchemy import Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy import (
+    Boolean,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
+from app import codes
 from app.database import Base
 
 
@@ -54,13 +68,15 @@ class SupplierConnector(Base):
     last_sync_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     last_sync_error: Mapped[str | None] = mapped_column(Text, nullable=True)
     stale_since: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Profile every sync of this connector (see SyncRunProfile).
+    profile_syncs: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
 
 
 class SupplierInventorySnapshot(Base):
     __tablename__ = "supplier_inventory_snapshots"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     connector_id: Mapped[str] = mapped_column(String(36), ForeignKey("supplier_connectors.id"), nullable=False, index=True)
     supplier_sku: Mapped[str] = mapped_column(String(128), nullable=False, index=True)
     qty_available: Mapped[float] = mapped_column(Float, nullable=False)
@@ -69,6 +85,20 @@ class SupplierInventorySnapshot(Base):
     raw_payload_ref: Mapped[str | None] = mapped_column(String(255), nullable=True)
 
 
+class SkuSubstitution(Base):
+    __tablename__ = "sku_substitutions"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "supplier_id", "supplier_sku", name="uq_sku_substitution_tenant_supplier_sku"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    group_key: Mapped[str] = mapped_column(String(128), nullable=False)
+    supplier_id: Mapped[str] = mapped_column(String(36), ForeignKey("supplier_connectors.id"), nullable=False)
+    supplier_sku: Mapped[str] = mapped_column(String(128), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+
 class OrderLine(Base):
     __tablename__ = "order_lines"
     __table_args__ = (
@@ -91,33 +121,101 @@ class OrderLine(Base):
     source_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     eta_variance_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     lead_time_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    # Running statistics over ETA revisions (see app.services.eta), updated once per revision.
+    eta_revision_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    eta_shift_mean_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    eta_shift_m2: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    eta_volatility_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    eta_trend_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
     last_synced_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    # Set when a full sync no longer finds the line in the supplier feed; cleared when it reappears.
+    missing_since: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Supplier timestamp of the record that first moved the line out of an open status (delivery outcome time).
+    closed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
 
 
+class OrderLineFeatures(Base):
+    __tablename__ = "order_line_features"
+
+    order_line_id: Mapped[str] = mapped_column(String(36), ForeignKey("order_lines.id"), primary_key=True)
+    qty_available: Mapped[float | None] = mapped_column(Float, nullable=True)
+    inventory_source_timestamp: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    qty_ordered: Mapped[float] = mapped_column(Float, nullable=False)
+    qty_delivered: Mapped[float] = mapped_column(Float, nullable=False)
+    history_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    delayed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    avg_historical_lead_days: Mapped[float | None] = mapped_column(Float, nullable=True)
+    lead_time_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    eta_variance_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    impact_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    eta_volatility_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    eta_trend_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    eta_shift_stddev_days: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    computed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+
+class EtaRevision(Base):
+    """One supplier change to an order line's promised ETA; written only when the date moves."""
+
+    __tablename__ = "eta_revisions"
+    __table_args__ = (
+        Index("ix_eta_revisions_order_line_recorded", "order_line_id", "recorded_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    order_line_id: Mapped[str] = mapped_column(String(36), ForeignKey("order_lines.id"), nullable=False)
+    previous_eta: Mapped[date] = mapped_column(Date, nullable=False)
+    eta_date: Mapped[date] = mapped_column(Date, nullable=False)
+    shift_days: Mapped[int] = mapped_column(Integer, nullable=False)
+    source_timestamp: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    recorded_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+
 class RiskAssessment(Base):
     __tablename__ = "risk_assessments"
     __table_args__ = (
         Index("ix_risk_assessments_order_line_assessed", "order_line_id", "assessed_at"),
     )
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     order_line_id: Mapped[str] = mapped_column(String(36), ForeignKey("order_lines.id"), nullable=False, index=True)
     model_version: Mapped[str] = mapped_column(String(64), nullable=False, default="heuristic_v1")
     risk_score: Mapped[float] = mapped_column(Float, nullable=False)
-    risk_status: Mapped[str] = mapped_column(String(16), nullable=False)
+    status_code: Mapped[int] = mapped_column(SmallInteger, nullable=False)
     confidence: Mapped[float] = mapped_column(Float, nullable=False)
-    reason_codes_json: Mapped[str] = mapped_column(Text, nullable=False)
+    reason_mask: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     estimated_delay_days: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     stale_data: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     assessed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
 
+    @property
+    def risk_status(self) -> str:
+        return codes.decode_status(self.status_code)
+
+    @risk_status.setter
+    def risk_status(self, value: str) -> None:
+        self.status_code = codes.encode_status(value)
+
+    @property
+    def reason_codes(self) -> list[str]:
+        return list(codes.decode_reason_codes(self.reason_mask))
+
+    @reason_codes.setter
+    def reason_codes(self, value: list[str]) -> None:
+        self.reason_mask = codes.encode_reason_codes(value)
+
 
 class Alert(Base):
     __tablename__ = "alerts"
     __table_args__ = (
         Index("ix_alerts_tenant_severity_status_created", "tenant_id", "severity", "status", "created_at"),
+        Index("ix_alerts_order_line_created", "order_line_id", "created_at"),
+        # Keyset feed: newest first within the tenant, optionally narrowed by status or severity.
+        Index("ix_alerts_tenant_created_id", "tenant_id", "created_at", "id"),
+        Index("ix_alerts_tenant_status_created_id", "tenant_id", "status", "created_at", "id"),
+        Index("ix_alerts_tenant_severity_created_id", "tenant_id", "severity", "created_at", "id"),
     )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
@@ -133,6 +231,9 @@ class Alert(Base):
 
 class AlertFeedback(Base):
     __tablename__ = "alert_feedback"
+    __table_args__ = (
+        Index("ix_alert_feedback_created_id", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     alert_id: Mapped[str] = mapped_column(String(36), ForeignKey("alerts.id"), nullable=False, index=True)
@@ -150,10 +251,89 @@ class SyncRun(Base):
     connector_id: Mapped[str] = mapped_column(String(36), ForeignKey("supplier_connectors.id"), nullable=False, index=True)
     mode: Mapped[str] = mapped_column(String(32), nullable=False, default="incremental")
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="queued")
+    profile: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="0")
     attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
     impacted_orders_json: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
     started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
     completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    duration_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    # Per-stage wall time of the last attempt, in milliseconds.
+    fetch_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    validate_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    inventory_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    orders_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    scoring_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    alerting_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    reconcile_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    commit_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    # Inventory and order records of the last attempt; inventory snapshots always count as inserted.
+    records_received: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    records_unchanged: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    records_inserted: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    records_updated: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    records_rejected: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Open lines a full sync found missing from the supplier feed.
+    records_missing: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    bytes_fetched: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+
+
+class SyncCursor(Base):
+    """Per-connector incremental sync watermark: newest supplier ``source_timestamp`` ingested."""
+
+    __tablename__ = "sync_cursors"
+
+    connector_id: Mapped[str] = mapped_column(String(36), ForeignKey("supplier_connectors.id"), primary_key=True)
+    watermark: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+
+
+class SyncRunProfile(Base):
+    __tablename__ = "sync_run_profiles"
+
+    sync_run_id: Mapped[str] = mapped_column(String(36), ForeignKey("sync_runs.id"), primary_key=True)
+    # Sampled stacks in collapsed ("frame;frame;frame count") flame-graph format.
+    collapsed_stacks: Mapped[str] = mapped_column(Text, nullable=False)
+    # Marshalled cProfile stats, loadable with pstats.Stats.
+    pstats: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    sample_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+
+class RescoreCheckpoint(Base):
+    """Progress of one tenant within a ``rescore-all`` run; lines are rescored in ``id`` order."""
+
+    __tablename__ = "rescore_checkpoints"
+
+    run_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_order_line_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    lines_scored: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+
+
+class ExportWatermark(Base):
+    __tablename__ = "export_watermarks"
 
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_created_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+
+
+class RecommendationRule(Base):
+    __tablename__ = "recommendation_rules"
 
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    reason_code: Mapped[str] = mapped_column(String(64), nullable=False)
+    position: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    priority: Mapped[str] = mapped_column(String(16), nullable=False)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    action: Mapped[str] = mapped_column(Text, nullable=False)
+    supplier_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    project_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
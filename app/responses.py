@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import Response
+
+from app.instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response for payloads already shaped like the response_model's aliased output.
+
+    Endpoints return this directly to skip per-item model validation and FastAPI's second
+    serialization pass through ``response_model``; the model still documents the schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return dumps(content)
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def wants_msgpack(accept: str | None) -> bool:
+    return any(media_type in (accept or "") for media_type in MSGPACK_MEDIA_TYPES)
+
+
+class MsgPackResponse(Response):
+    """MessagePack counterpart of FastJSONResponse, chosen by ``Accept: application/msgpack``."""
+
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return msgpack.packb(content, default=_default)
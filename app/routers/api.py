@@ -2,17 +2,25 @@ from __future__ import annotations
 
 import json
 import uuid
+from dataclasses import asdict
 from datetime import date, datetime, timedelta, timezone
+from typing import Any, Literal
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
-from sqlalchemy import and_, case, func
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from sqlalchemy import and_, case, func, insert, tuple_, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app import config, models, schemas
-from app.deps import RequestContext, get_db, get_request_context
-from app.services.recommendations import recommendations_for_reasons
-from app.services.sync import queue_sync_run, run_sync_job
+from app import codes, config, models, schemas
+from app.deps import RequestContext, get_db, get_read_db, get_request_context
+from app.responses import FastJSONResponse, MsgPackResponse, msgpack_available, wants_msgpack
+from app.services import export, model_registry, recommendations, substitutions, timeline
+from app.services.alerts import ALERT_SEVERITIES, ALERT_STATUSES
+from app.services.features import load_features
+from app.services.scoring import feature_components
+from app.services.simulation import simulate
+from app.services.sync import SYNC_STAGES, queue_sync_run, run_sync_job
 
 router = APIRouter(prefix="/api", tags=["api"])
 
@@ -49,6 +57,7 @@ def create_supplier_connector(
         secret_ref=f"secret://{ctx.tenant_id}/connectors/{uuid.uuid4()}",
         status="pending_validation",
         poll_interval_minutes=payload.poll_interval_minutes,
+        profile_syncs=payload.profile_syncs,
     )
     db.add(connector)
     try:
@@ -57,23 +66,30 @@ def create_supplier_connector(
         db.rollback()
         raise HTTPException(status_code=409, detail="connector already exists for tenant + supplier") from None
     db.refresh(connector)
-    return schemas.ConnectorResponse.model_validate(
-        {
-            "id": connector.id,
-            "tenantId": connector.tenant_id,
-            "supplierName": connector.supplier_name,
-            "authType": connector.auth_type,
-            "status": connector.status,
-            "pollIntervalMinutes": connector.poll_interval_minutes,
-            "lastSyncAt": connector.last_sync_at,
-            "createdAt": connector.created_at,
-        }
-    )
+    return schemas.ConnectorResponse.model_validate(_connector_payload(connector))
 
 
-@router.get("/integrations/suppliers", response_model=list[schemas.ConnectorResponse])
+def _connector_payload(connector: models.SupplierConnector) -> dict:
+    return {
+        "id": connector.id,
+        "tenantId": connector.tenant_id,
+        "supplierName": connector.supplier_name,
+        "authType": connector.auth_type,
+        "status": connector.status,
+        "pollIntervalMinutes": connector.poll_interval_minutes,
+        "lastSyncAt": connector.last_sync_at,
+        "profileSyncs": connector.profile_syncs,
+        "createdAt": connector.created_at,
+    }
+
+
+@router.get(
+    "/integrations/suppliers",
+    response_model=list[schemas.ConnectorResponse],
+    response_class=FastJSONResponse,
+)
 def list_supplier_connectors(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     ctx: RequestContext = Depends(get_request_context),
 ):
     connectors = (
@@ -82,21 +98,7 @@ def list_supplier_connectors(
         .order_by(models.SupplierConnector.created_at.desc())
         .all()
     )
-    return [
-        schemas.ConnectorResponse.model_validate(
-            {
-                "id": row.id,
-                "tenantId": row.tenant_id,
-                "supplierName": row.supplier_name,
-                "authType": row.auth_type,
-                "status": row.status,
-                "pollIntervalMinutes": row.poll_interval_minutes,
-                "lastSyncAt": row.last_sync_at,
-                "createdAt": row.created_at,
-            }
-        )
-        for row in connectors
-    ]
+    return FastJSONResponse([_connector_payload(row) for row in connectors])
 
 
 @router.post("/sync/run", response_model=schemas.SyncRunResponse, status_code=status.HTTP_202_ACCEPTED)
@@ -124,8 +126,8 @@ def trigger_sync_run(
     if recent:
         raise HTTPException(status_code=429, detail="manual sync is rate limited")
 
-    run = queue_sync_run(db, connector.id, payload.mode)
-    background_tasks.add_task(run_sync_job, run.id)
+    run = queue_sync_run(db, connector.id, payload.mode, profile=payload.profile)
+    background_tasks.add_task(run_sync_job, run.id, ctx.tenant_id)
     return schemas.SyncRunResponse.model_validate(
         {
             "id": run.id,
@@ -137,6 +139,154 @@ def trigger_sync_run(
     )
 
 
+SYNC_RECORD_COUNTS = ("received", "unchanged", "inserted", "updated", "rejected", "missing")
+
+
+def _tenant_sync_run(db: Session, run_id: str, tenant_id: str) -> models.SyncRun:
+    row = (
+        db.query(models.SyncRun, models.SupplierConnector.tenant_id)
+        .join(models.SupplierConnector, models.SupplierConnector.id == models.SyncRun.connector_id)
+        .filter(models.SyncRun.id == run_id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="sync run not found")
+    run, run_tenant_id = row
+    if run_tenant_id != tenant_id:
+        raise HTTPException(status_code=403, detail="cross-tenant access denied")
+    return run
+
+
+@router.get("/sync/runs/{run_id}", response_model=schemas.SyncRunDetailResponse, response_class=FastJSONResponse)
+def get_sync_run(
+    run_id: str,
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    run = _tenant_sync_run(db, run_id, ctx.tenant_id)
+    return FastJSONResponse(
+        {
+            "id": run.id,
+            "connectorId": run.connector_id,
+            "status": run.status,
+            "mode": run.mode,
+            "profile": run.profile,
+            "attempts": run.attempts,
+            "error": run.error,
+            "startedAt": run.started_at,
+            "completedAt": run.completed_at,
+            "durationMs": run.duration_ms,
+            "stagesMs": {stage: getattr(run, f"{stage}_ms") for stage in SYNC_STAGES},
+            "records": {name: getattr(run, f"records_{name}") for name in SYNC_RECORD_COUNTS},
+            "bytesFetched": run.bytes_fetched,
+            "impactedOrderIds": json.loads(run.impacted_orders_json or "[]"),
+        }
+    )
+
+
+@router.get(
+    "/sync/runs/{run_id}/profile",
+    responses={200: {"content": {"text/plain": {}, "application/octet-stream": {}}}},
+)
+def download_sync_profile(
+    run_id: str,
+    profile_format: Literal["collapsed", "pstats"] = Query(default="collapsed", alias="format"),
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """Collapsed stacks feed flamegraph.pl/speedscope; the pstats blob loads with ``pstats.Stats``."""
+    run = _tenant_sync_run(db, run_id, ctx.tenant_id)
+    profile = db.query(models.SyncRunProfile).filter(models.SyncRunProfile.sync_run_id == run.id).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="sync run was not profiled")
+    if profile_format == "pstats":
+        return Response(
+            content=profile.pstats,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="sync-{run.id}.pstats"'},
+        )
+    return PlainTextResponse(
+        profile.collapsed_stacks,
+        headers={"Content-Disposition": f'attachment; filename="sync-{run.id}.collapsed.txt"'},
+    )
+
+
+@router.put("/integrations/{connector_id}/profiling", response_model=schemas.ConnectorResponse)
+def set_connector_profiling(
+    connector_id: str,
+    payload: schemas.ConnectorProfilingRequest,
+    db: Session = Depends(get_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    connector = (
+        db.query(models.SupplierConnector)
+        .filter(models.SupplierConnector.id == connector_id, models.SupplierConnector.tenant_id == ctx.tenant_id)
+        .first()
+    )
+    if not connector:
+        raise HTTPException(status_code=404, detail="connector not found")
+    connector.profile_syncs = payload.enabled
+    db.commit()
+    return FastJSONResponse(_connector_payload(connector))
+
+
+@router.get("/sync/metrics", response_model=list[schemas.SyncMetricsBucket], response_class=FastJSONResponse)
+def sync_metrics(
+    days: int = Query(default=7, ge=1, le=90),
+    connector_id: str | None = Query(default=None, alias="connectorId"),
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """Finished runs aggregated per connector and day, to spot slow suppliers or stages."""
+    day = func.date(models.SyncRun.started_at)
+    columns = [
+        models.SyncRun.connector_id,
+        models.SupplierConnector.supplier_name,
+        day.label("day"),
+        func.count(models.SyncRun.id).label("runs"),
+        func.sum(case((models.SyncRun.status == "failed", 1), else_=0)).label("failed_runs"),
+        func.avg(models.SyncRun.duration_ms).label("avg_duration_ms"),
+        func.max(models.SyncRun.duration_ms).label("max_duration_ms"),
+        func.sum(models.SyncRun.bytes_fetched).label("bytes_fetched"),
+        *[func.avg(getattr(models.SyncRun, f"{stage}_ms")).label(f"{stage}_ms") for stage in SYNC_STAGES],
+        *[func.sum(getattr(models.SyncRun, f"records_{name}")).label(f"records_{name}") for name in SYNC_RECORD_COUNTS],
+    ]
+    query = (
+        db.query(*columns)
+        .join(models.SupplierConnector, models.SupplierConnector.id == models.SyncRun.connector_id)
+        .filter(
+            models.SupplierConnector.tenant_id == ctx.tenant_id,
+            models.SyncRun.status.in_(("success", "failed")),
+            models.SyncRun.started_at >= utcnow() - timedelta(days=days),
+        )
+    )
+    if connector_id:
+        query = query.filter(models.SyncRun.connector_id == connector_id)
+    rows = (
+        query.group_by(models.SyncRun.connector_id, models.SupplierConnector.supplier_name, day)
+        .order_by(day, models.SupplierConnector.supplier_name)
+        .all()
+    )
+
+    return FastJSONResponse(
+        [
+            {
+                "connectorId": row.connector_id,
+                "supplierName": row.supplier_name,
+                "day": str(row.day),
+                "runs": row.runs,
+                "failedRuns": row.failed_runs,
+                "avgDurationMs": round(row.avg_duration_ms or 0.0, 3),
+                "maxDurationMs": round(row.max_duration_ms or 0.0, 3),
+                "avgStagesMs": {stage: round(getattr(row, f"{stage}_ms") or 0.0, 3) for stage in SYNC_STAGES},
+                "records": {name: getattr(row, f"records_{name}") or 0 for name in SYNC_RECORD_COUNTS},
+                "bytesFetched": row.bytes_fetched or 0,
+            }
+            for row in rows
+        ]
+    )
+
+
 @router.post("/integrations/{connector_id}/retry", response_model=schemas.SyncRunResponse, status_code=status.HTTP_202_ACCEPTED)
 def retry_connector_sync(
     connector_id: str,
@@ -152,7 +302,7 @@ def retry_connector_sync(
     if not connector:
         raise HTTPException(status_code=404, detail="connector not found")
     run = queue_sync_run(db, connector.id, "incremental")
-    background_tasks.add_task(run_sync_job, run.id)
+    background_tasks.add_task(run_sync_job, run.id, ctx.tenant_id)
     return schemas.SyncRunResponse.model_validate(
         {
             "id": run.id,
@@ -175,19 +325,61 @@ def _latest_assessment_subquery(db: Session):
     )
 
 
-@router.get("/orders/risk", response_model=schemas.OrderRiskListResponse)
-def list_order_risk(
-    status_filter: str | None = Query(default=None, alias="status"),
-    project_id: str | None = Query(default=None, alias="projectId"),
-    supplier_id: str | None = Query(default=None, alias="supplierId"),
-    impact_before: date | None = Query(default=None, alias="impactBefore"),
-    page: int = Query(default=1, ge=1),
-    page_size: int = Query(default=25, alias="pageSize", ge=1, le=200),
-    db: Session = Depends(get_db),
-    ctx: RequestContext = Depends(get_request_context),
+def _order_risk_payload(order_line: models.OrderLine, assessment: models.RiskAssessment) -> dict:
+    return {
+        "orderLineId": order_line.id,
+        "projectId": order_line.project_id,
+        "supplierId": order_line.supplier_id,
+        "status": assessment.risk_status,
+        "riskScore": assessment.risk_score,
+        "confidence": assessment.confidence,
+        "reasonCodes": assessment.reason_codes,
+        "estimatedDelayDays": assessment.estimated_delay_days,
+        "impactDate": order_line.impact_date,
+        "stale": assessment.stale_data,
+        "lastUpdated": assessment.assessed_at,
+    }
+
+
+# Public field name -> (column, decoder); the order matches export.ORDER_RISK_COLUMNS.
+ORDER_RISK_FIELDS = {
+    "orderLineId": (models.OrderLine.id, None),
+    "projectId": (models.OrderLine.project_id, None),
+    "supplierId": (models.OrderLine.supplier_id, None),
+    "status": (models.RiskAssessment.status_code, codes.decode_status),
+    "riskScore": (models.RiskAssessment.risk_score, None),
+    "confidence": (models.RiskAssessment.confidence, None),
+    "reasonCodes": (models.RiskAssessment.reason_mask, lambda mask: list(codes.decode_reason_codes(mask))),
+    "estimatedDelayDays": (models.RiskAssessment.estimated_delay_days, None),
+    "impactDate": (models.OrderLine.impact_date, None),
+    "stale": (models.RiskAssessment.stale_data, None),
+    "lastUpdated": (models.RiskAssessment.assessed_at, None),
+}
+
+
+def _parse_fields(raw: str | None) -> list[str]:
+    if not raw:
+        return list(ORDER_RISK_FIELDS)
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in ORDER_RISK_FIELDS]
+    if unknown or not fields:
+        raise HTTPException(status_code=400, detail=f"unknown fields: {', '.join(unknown) or raw}")
+    return fields
+
+
+def _order_risk_query(
+    db: Session,
+    tenant_id: str,
+    status_filter: str | None,
+    project_id: str | None,
+    supplier_id: str | None,
+    impact_before: date | None,
+    reason_code: str | None,
 ):
     if status_filter and status_filter not in {"green", "yellow", "red"}:
         raise HTTPException(status_code=400, detail="invalid status filter")
+    if reason_code and reason_code not in codes.REASON_CODE_BITS:
+        raise HTTPException(status_code=400, detail="invalid reasonCode filter")
 
     latest = _latest_assessment_subquery(db)
     query = (
@@ -200,58 +392,110 @@ def list_order_risk(
                 models.RiskAssessment.assessed_at == latest.c.assessed_at,
             ),
         )
-        .filter(models.OrderLine.tenant_id == ctx.tenant_id)
+        .filter(models.OrderLine.tenant_id == tenant_id)
     )
 
     if status_filter:
-        query = query.filter(models.RiskAssessment.risk_status == status_filter)
+        query = query.filter(models.RiskAssessment.status_code == codes.encode_status(status_filter))
     if project_id:
         query = query.filter(models.OrderLine.project_id == project_id)
     if supplier_id:
         query = query.filter(models.OrderLine.supplier_id == supplier_id)
     if impact_before:
         query = query.filter(models.OrderLine.impact_date <= impact_before)
+    if reason_code:
+        query = query.filter(models.RiskAssessment.reason_mask.op("&")(codes.REASON_CODE_BITS[reason_code]) != 0)
+    return query
 
-    status_rank = case(
-        (models.RiskAssessment.risk_status == "red", 0),
-        (models.RiskAssessment.risk_status == "yellow", 1),
-        else_=2,
-    )
+
+def _order_risk_ordering():
+    return models.RiskAssessment.status_code.desc(), models.OrderLine.impact_date.asc()
+
+
+@router.get("/orders/risk", response_model=schemas.OrderRiskListResponse, response_class=FastJSONResponse)
+def list_order_risk(
+    request: Request,
+    status_filter: str | None = Query(default=None, alias="status"),
+    project_id: str | None = Query(default=None, alias="projectId"),
+    supplier_id: str | None = Query(default=None, alias="supplierId"),
+    impact_before: date | None = Query(default=None, alias="impactBefore"),
+    reason_code: str | None = Query(default=None, alias="reasonCode"),
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=25, alias="pageSize", ge=1, le=200),
+    fields: str | None = Query(default=None),
+    compact: bool = Query(default=False),
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """Risk list; ``fields`` narrows the SQL projection and the payload to the named fields.
+
+    ``compact=true`` returns ``{"fields": [...], "items": [[...], ...], "total": n}`` (one array
+    per row in ``fields`` order) and ``Accept: application/msgpack`` switches the body to
+    MessagePack; the two combine.
+    """
+    selected = _parse_fields(fields)
+    use_msgpack = wants_msgpack(request.headers.get("accept"))
+    if use_msgpack and not msgpack_available():
+        raise HTTPException(status_code=406, detail="MessagePack responses require msgpack")
+
+    query = _order_risk_query(db, ctx.tenant_id, status_filter, project_id, supplier_id, impact_before, reason_code)
     total = query.count()
     rows = (
-        query.order_by(status_rank, models.OrderLine.impact_date.asc())
+        query.with_entities(*[ORDER_RISK_FIELDS[name][0] for name in selected])
+        .order_by(*_order_risk_ordering())
         .offset((page - 1) * page_size)
         .limit(page_size)
         .all()
     )
 
-    items = []
-    for order_line, assessment in rows:
-        reason_codes = json.loads(assessment.reason_codes_json)
-        items.append(
-            schemas.OrderRiskItem.model_validate(
-                {
-                    "orderLineId": order_line.id,
-                    "projectId": order_line.project_id,
-                    "supplierId": order_line.supplier_id,
-                    "status": assessment.risk_status,
-                    "riskScore": assessment.risk_score,
-                    "confidence": assessment.confidence,
-                    "reasonCodes": reason_codes,
-                    "estimatedDelayDays": assessment.estimated_delay_days,
-                    "impactDate": order_line.impact_date,
-                    "stale": assessment.stale_data,
-                    "lastUpdated": assessment.assessed_at,
-                }
-            )
-        )
-    return schemas.OrderRiskListResponse(items=items, total=total)
+    decoders = [ORDER_RISK_FIELDS[name][1] for name in selected]
+    values = [
+        [value if decoder is None else decoder(value) for value, decoder in zip(row, decoders)]
+        for row in rows
+    ]
+    if compact:
+        content = {"fields": selected, "items": values, "total": total}
+    else:
+        content = {"items": [dict(zip(selected, row)) for row in values], "total": total}
+    return MsgPackResponse(content) if use_msgpack else FastJSONResponse(content)
+
+
+@router.get("/orders/risk/export")
+def export_order_risk(
+    export_format: Literal["csv", "ndjson", "parquet"] = Query(default="ndjson", alias="format"),
+    status_filter: str | None = Query(default=None, alias="status"),
+    project_id: str | None = Query(default=None, alias="projectId"),
+    supplier_id: str | None = Query(default=None, alias="supplierId"),
+    impact_before: date | None = Query(default=None, alias="impactBefore"),
+    reason_code: str | None = Query(default=None, alias="reasonCode"),
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    if export_format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=400, detail="parquet export requires pyarrow")
+    query = _order_risk_query(db, ctx.tenant_id, status_filter, project_id, supplier_id, impact_before, reason_code)
+    # No count query: rows stream from a server-side cursor in fixed-size batches.
+    rows = (
+        _order_risk_payload(order_line, assessment)
+        for order_line, assessment in query.order_by(*_order_risk_ordering()).yield_per(export.EXPORT_CHUNK_ROWS)
+    )
+    if export_format == "csv":
+        body = export.iter_csv(rows, export.ORDER_RISK_COLUMNS)
+    elif export_format == "parquet":
+        body = export.iter_parquet(rows, export.order_risk_parquet_schema())
+    else:
+        body = export.iter_ndjson(rows)
+    return StreamingResponse(
+        body,
+        media_type=export.EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="order-risk.{export_format}"'},
+    )
 
 
-@router.get("/orders/{order_id}", response_model=schemas.OrderDetailResponse)
+@router.get("/orders/{order_id}", response_model=schemas.OrderDetailResponse, response_class=FastJSONResponse)
 def get_order_detail(
     order_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     ctx: RequestContext = Depends(get_request_context),
 ):
     order_line = db.query(models.OrderLine).filter(models.OrderLine.id == order_id).first()
@@ -260,99 +504,469 @@ def get_order_detail(
     if order_line.tenant_id != ctx.tenant_id:
         raise HTTPException(status_code=403, detail="cross-tenant access denied")
 
-    assessments = (
-        db.query(models.RiskAssessment)
-        .filter(models.RiskAssessment.order_line_id == order_line.id)
-        .order_by(models.RiskAssessment.assessed_at.desc())
-        .all()
-    )
-    if not assessments:
+    history = timeline.order_timeline(db, order_line.id, config.ORDER_TIMELINE_LIMIT)
+    latest = history.latest
+    if latest is None:
         trace_id = _trace_id()
         raise HTTPException(status_code=500, detail=f"risk assessment missing; trace_id={trace_id}")
 
-    latest = assessments[0]
-    reason_codes = json.loads(latest.reason_codes_json)
-    recommendations = recommendations_for_reasons(order_line, reason_codes)
+    reason_codes = latest.reason_codes
+    alternatives = substitutions.comparative_options(db, order_line) if "LOW_STOCK" in reason_codes else None
+    actions = recommendations.recommendations_for_reasons(order_line, reason_codes, alternatives)
 
-    alerts = (
-        db.query(models.Alert)
-        .filter(models.Alert.order_line_id == order_line.id)
-        .order_by(models.Alert.created_at.desc())
-        .all()
-    )
-    timeline = [
-        {
-            "eventType": "risk_assessed",
-            "timestamp": item.assessed_at,
-            "detail": f"{item.risk_status.upper()} ({item.risk_score:.2f})",
-        }
-        for item in assessments
-    ]
-    timeline.extend(
+    return FastJSONResponse(_order_detail_payload(order_line, history, actions))
+
+
+def _order_detail_payload(
+    order_line: models.OrderLine,
+    history: timeline.OrderTimeline,
+    actions: list[dict[str, Any]],
+) -> dict[str, Any]:
+    latest = history.latest
+    return {
+        "orderLineId": order_line.id,
+        "supplierOrderId": order_line.supplier_order_id,
+        "supplierSku": order_line.supplier_sku,
+        "qtyOrdered": order_line.qty_ordered,
+        "qtyDelivered": order_line.qty_delivered,
+        "etaDate": order_line.eta_date,
+        "impactDate": order_line.impact_date,
+        "currentStatus": latest.risk_status,
+        "currentScore": latest.risk_score,
+        "confidence": latest.confidence,
+        "reasonCodes": latest.reason_codes,
+        "estimatedDelayDays": latest.estimated_delay_days,
+        "riskHistory": [
+            {
+                "assessedAt": item.timestamp.isoformat(),
+                "riskStatus": item.risk_status,
+                "riskScore": item.risk_score,
+                "confidence": item.confidence,
+                "reasonCodes": item.reason_codes,
+            }
+            for item in history.events
+            if item.event_type == "risk_assessed"
+        ],
+        "timeline": [_timeline_event(item) for item in history.events],
+        "timelineCursor": history.next_cursor,
+        "recommendations": actions,
+    }
+
+
+@router.post("/orders/batch", response_model=schemas.OrderBatchResponse, response_class=FastJSONResponse)
+def get_order_details_batch(
+    payload: schemas.OrderBatchRequest,
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """Order detail payloads for many lines with a fixed number of queries.
+
+    Lines and their timelines are each read with one set-based query and recommendations are
+    memoized per reason-code set. Ranked supplier alternatives are per-line work, so LOW_STOCK
+    lines get the rule-based advice here; ``/api/orders/{id}/alternatives`` has the options.
+    """
+    order_ids = list(dict.fromkeys(payload.order_ids))
+    lines = {line.id: line for line in db.query(models.OrderLine).filter(models.OrderLine.id.in_(order_ids)).all()}
+    owned = [order_id for order_id in order_ids if order_id in lines and lines[order_id].tenant_id == ctx.tenant_id]
+    histories = timeline.order_timelines(db, owned, payload.timeline_limit)
+    memo = recommendations.RecommendationMemo()
+
+    items = []
+    errors = []
+    for order_id in order_ids:
+        order_line = lines.get(order_id)
+        if order_line is None:
+            errors.append({"id": order_id, "error": "not_found"})
+        elif order_line.tenant_id != ctx.tenant_id:
+            errors.append({"id": order_id, "error": "forbidden"})
+        elif histories[order_id].latest is None:
+            errors.append({"id": order_id, "error": "assessment_missing"})
+        else:
+            history = histories[order_id]
+            actions = memo.for_line(order_line, history.latest.reason_codes)
+            items.append(_order_detail_payload(order_line, history, actions))
+    return FastJSONResponse({"items": items, "errors": errors})
+
+
+def _timeline_event(event: timeline.OrderEvent) -> dict[str, Any]:
+    return {"eventType": event.event_type, "timestamp": event.timestamp, "detail": event.detail}
+
+
+@router.get("/orders/{order_id}/timeline", response_model=schemas.OrderTimelineResponse, response_class=FastJSONResponse)
+def get_order_timeline(
+    order_id: str,
+    before: str = Query(...),
+    limit: int = Query(default=config.ORDER_TIMELINE_LIMIT, ge=1, le=200),
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """Older timeline events, paged from the ``timelineCursor`` of the order detail response."""
+    order_line = db.query(models.OrderLine).filter(models.OrderLine.id == order_id).first()
+    if not order_line:
+        raise HTTPException(status_code=404, detail="order not found")
+    if order_line.tenant_id != ctx.tenant_id:
+        raise HTTPException(status_code=403, detail="cross-tenant access denied")
+    try:
+        cursor = timeline.parse_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid timeline cursor") from None
+
+    page = timeline.order_timeline(db, order_line.id, limit, before=cursor)
+    return FastJSONResponse(
         {
-            "eventType": "alert_created",
-            "timestamp": alert.created_at,
-            "detail": alert.message,
+            "events": [_timeline_event(item) for item in page.events],
+            "nextCursor": page.next_cursor,
         }
-        for alert in alerts
     )
-    timeline = sorted(timeline, key=lambda x: x["timestamp"], reverse=True)
 
-    return schemas.OrderDetailResponse.model_validate(
+
+@router.get("/orders/{order_id}/features", response_model=schemas.OrderFeaturesResponse)
+def get_order_features(
+    order_id: str,
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    order_line = db.query(models.OrderLine).filter(models.OrderLine.id == order_id).first()
+    if not order_line:
+        raise HTTPException(status_code=404, detail="order not found")
+    if order_line.tenant_id != ctx.tenant_id:
+        raise HTTPException(status_code=403, detail="cross-tenant access denied")
+
+    # Read-only: sync and rescore persist vectors; a stale one is recomputed here without being stored.
+    features = load_features(db, [order_line], persist=False)[0]
+    # Components as the tenant's model computes them; models without the flag use the v1 formula.
+    model = model_registry.model_for_tenant(ctx.tenant_id)
+    components = feature_components(features, utcnow(), getattr(model, "eta_revisions", False))
+    payload = asdict(features)
+    payload["components"] = {
+        "remainingQty": components.remaining_qty,
+        "coverageRatio": components.coverage_ratio,
+        "inventory": components.inventory_component,
+        "lateRate": components.late_rate_component,
+        "leadTimeTrend": components.lead_time_component,
+        "etaVolatility": components.eta_volatility_component,
+        "stalenessHours": components.staleness_hours,
+    }
+    return schemas.OrderFeaturesResponse.model_validate(payload)
+
+
+@router.get("/orders/{order_id}/alternatives", response_model=list[schemas.AlternativeOption])
+def get_order_alternatives(
+    order_id: str,
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    order_line = db.query(models.OrderLine).filter(models.OrderLine.id == order_id).first()
+    if not order_line:
+        raise HTTPException(status_code=404, detail="order not found")
+    if order_line.tenant_id != ctx.tenant_id:
+        raise HTTPException(status_code=403, detail="cross-tenant access denied")
+    return FastJSONResponse(substitutions.comparative_options(db, order_line))
+
+
+@router.put("/substitutions", response_model=schemas.SubstitutionGroupResponse)
+def put_substitution_group(
+    payload: schemas.SubstitutionGroupRequest,
+    db: Session = Depends(get_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    supplier_ids = {member.supplier_id for member in payload.members}
+    owned = {
+        connector_id
+        for (connector_id,) in db.query(models.SupplierConnector.id)
+        .filter(models.SupplierConnector.tenant_id == ctx.tenant_id, models.SupplierConnector.id.in_(supplier_ids))
+        .all()
+    }
+    if owned != supplier_ids:
+        raise HTTPException(status_code=404, detail="connector not found")
+
+    members = list(dict.fromkeys((member.supplier_id, member.supplier_sku) for member in payload.members))
+    substitutions.replace_group(db, ctx.tenant_id, payload.group_key, members)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="supplier SKU already belongs to another substitution group") from None
+    substitutions.load_index(db, tenant_ids=[ctx.tenant_id])
+    return schemas.SubstitutionGroupResponse.model_validate(
         {
-            "orderLineId": order_line.id,
-            "supplierOrderId": order_line.supplier_order_id,
-            "supplierSku": order_line.supplier_sku,
-            "qtyOrdered": order_line.qty_ordered,
-            "qtyDelivered": order_line.qty_delivered,
-            "etaDate": order_line.eta_date,
-            "impactDate": order_line.impact_date,
-            "currentStatus": latest.risk_status,
-            "currentScore": latest.risk_score,
-            "confidence": latest.confidence,
-            "reasonCodes": reason_codes,
-            "estimatedDelayDays": latest.estimated_delay_days,
-            "riskHistory": [
-                {
-                    "assessedAt": item.assessed_at.isoformat(),
-                    "riskStatus": item.risk_status,
-                    "riskScore": item.risk_score,
-                    "confidence": item.confidence,
-                    "reasonCodes": json.loads(item.reason_codes_json),
-                }
-                for item in assessments
-            ],
-            "timeline": timeline[:50],
-            "recommendations": recommendations,
+            "groupKey": payload.group_key,
+            "members": [{"supplierId": supplier_id, "supplierSku": sku} for supplier_id, sku in members],
         }
     )
 
 
+@router.get("/substitutions", response_model=list[schemas.SubstitutionGroupResponse])
+def list_substitution_groups(
+    db: Session = Depends(get_read_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    rows = (
+        db.query(models.SkuSubstitution)
+        .filter(models.SkuSubstitution.tenant_id == ctx.tenant_id)
+        .order_by(models.SkuSubstitution.group_key, models.SkuSubstitution.created_at)
+        .all()
+    )
+    groups: dict[str, list[dict[str, str]]] = {}
+    for row in rows:
+        groups.setdefault(row.group_key, []).append({"supplierId": row.supplier_id, "supplierSku": row.supplier_sku})
+    return FastJSONResponse([{"groupKey": key, "members": members} for key, members in groups.items()])
+
+
+def _rule_payload(rule: recommendations.Rule) -> dict:
+    return {
+        "reasonCode": rule.reason_code,
+        "position": rule.position,
+        "priority": rule.priority,
+        "title": rule.title,
+        "action": rule.action,
+        "supplierId": rule.supplier_id,
+        "projectId": rule.project_id,
+    }
+
+
+@router.get("/recommendation-rules", response_model=list[schemas.RecommendationRuleItem])
+def list_recommendation_rules(
+    ctx: RequestContext = Depends(get_request_context),
+):
+    rules = recommendations.get_rulebook().effective_rules(ctx.tenant_id)
+    return FastJSONResponse([_rule_payload(rule) for rule in rules])
+
+
+@router.put("/recommendation-rules", response_model=list[schemas.RecommendationRuleItem])
+def put_recommendation_rules(
+    payload: schemas.RecommendationRulesRequest,
+    db: Session = Depends(get_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    if ctx.role not in {"owner", "pm"}:
+        raise HTTPException(status_code=403, detail="only owner/pm can change recommendation rules")
+
+    known = set(codes.REASON_CODE_BITS) | {recommendations.FALLBACK_REASON}
+    rules: list[recommendations.Rule] = []
+    for item in payload.rules:
+        if item.reason_code not in known:
+            raise HTTPException(status_code=400, detail=f"unknown reasonCode: {item.reason_code}")
+        rule = recommendations.Rule(
+            reason_code=item.reason_code,
+            position=item.position,
+            priority=item.priority,
+            title=item.title,
+            action=item.action,
+            supplier_id=item.supplier_id,
+            project_id=item.project_id,
+        )
+        if rule.templated:
+            try:
+                recommendations.check_template(rule.title)
+                recommendations.check_template(rule.action)
+                rule.render(models.OrderLine(supplier_sku="", supplier_order_id="", qty_ordered=0.0, qty_delivered=0.0))
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"invalid template in rule: {item.title}") from None
+        rules.append(rule)
+
+    recommendations.replace_tenant_rules(db, ctx.tenant_id, rules)
+    db.commit()
+    recommendations.load_rules(db, tenant_ids=[ctx.tenant_id])
+    return FastJSONResponse([_rule_payload(rule) for rule in sorted(rules, key=recommendations.rule_sort_key)])
+
+
+@router.post("/simulate", response_model=schemas.SimulationResponse, response_class=FastJSONResponse)
+def simulate_order_risk(
+    payload: schemas.SimulationRequest,
+    db: Session = Depends(get_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    try:
+        result = simulate(db, ctx.tenant_id, payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+    finally:
+        db.rollback()
+    return FastJSONResponse(result)
+
+
+ALERT_CURSOR_SEPARATOR = "|"
+
+
+def _alert_cursor(alert: models.Alert) -> str:
+    return f"{alert.created_at.isoformat()}{ALERT_CURSOR_SEPARATOR}{alert.id}"
+
+
+def _parse_alert_cursor(raw: str) -> tuple[datetime, str]:
+    created_at, separator, alert_id = raw.partition(ALERT_CURSOR_SEPARATOR)
+    if not separator or not alert_id:
+        raise ValueError("malformed alert cursor")
+    return datetime.fromisoformat(created_at), alert_id
+
+
 @router.get("/alerts")
 def list_alerts(
-    db: Session = Depends(get_db),
+    severity: list[str] = Query(default=[]),
+    status_filter: list[str] = Query(default=[], alias="status"),
+    created_from: datetime | None = Query(default=None, alias="createdFrom"),
+    created_to: datetime | None = Query(default=None, alias="createdTo"),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=200, ge=1, le=500),
+    db: Session = Depends(get_read_db),
     ctx: RequestContext = Depends(get_request_context),
 ):
-    alerts = (
-        db.query(models.Alert)
-        .filter(models.Alert.tenant_id == ctx.tenant_id)
-        .order_by(models.Alert.created_at.desc())
-        .limit(200)
-        .all()
+    """Newest-first alert feed; the ``X-Next-Cursor`` response header continues after the last item.
+
+    Paging is a keyset over ``(created_at, id)`` so every page is an index range scan on
+    ``ix_alerts_tenant_created_id`` (or the status/severity variants) however deep it goes.
+    """
+    invalid = sorted(set(severity) - set(ALERT_SEVERITIES)) + sorted(set(status_filter) - set(ALERT_STATUSES))
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"invalid alert filter: {', '.join(invalid)}")
+
+    query = db.query(models.Alert).filter(models.Alert.tenant_id == ctx.tenant_id)
+    if severity:
+        query = query.filter(models.Alert.severity.in_(severity))
+    if status_filter:
+        query = query.filter(models.Alert.status.in_(status_filter))
+    if created_from is not None:
+        query = query.filter(models.Alert.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(models.Alert.created_at < created_to)
+    if cursor:
+        try:
+            after = _parse_alert_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid alert cursor") from None
+        query = query.filter(tuple_(models.Alert.created_at, models.Alert.id) < after)
+    alerts = query.order_by(models.Alert.created_at.desc(), models.Alert.id.desc()).limit(limit + 1).all()
+
+    headers = {"X-Next-Cursor": _alert_cursor(alerts[limit - 1])} if len(alerts) > limit else None
+    return FastJSONResponse(
+        [
+            {
+                "id": alert.id,
+                "orderLineId": alert.order_line_id,
+                "severity": alert.severity,
+                "status": alert.status,
+                "message": alert.message,
+                "createdAt": alert.created_at,
+                "acknowledgedAt": alert.acknowledged_at,
+                "resolvedAt": alert.resolved_at,
+            }
+            for alert in alerts[:limit]
+        ],
+        headers=headers,
     )
-    return [
-        {
-            "id": alert.id,
-            "orderLineId": alert.order_line_id,
-            "severity": alert.severity,
-            "status": alert.status,
-            "message": alert.message,
-            "createdAt": alert.created_at,
-            "acknowledgedAt": alert.acknowledged_at,
-            "resolvedAt": alert.resolved_at,
-        }
-        for alert in alerts
-    ]
+
+
+def _bulk_result(alert_id: str, result: str, alert_status: str | None = None, feedback_id: str | None = None) -> dict[str, Any]:
+    return {"id": alert_id, "result": result, "status": alert_status, "feedbackId": feedback_id}
+
+
+@router.post("/alerts/bulk", response_model=schemas.BulkAlertActionResponse, response_class=FastJSONResponse)
+def bulk_alert_action(
+    payload: schemas.BulkAlertActionRequest,
+    db: Session = Depends(get_db),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """Apply one action to many alerts in a single transaction, reporting an outcome per id.
+
+    Ownership (and, for feedback, each line's latest model version) comes from one query; the
+    change itself is one UPDATE or one multi-row INSERT. Unknown and cross-tenant ids are
+    reported and skipped rather than failing the whole request.
+    """
+    if payload.action == "resolve" and ctx.role not in {"owner", "pm"}:
+        raise HTTPException(status_code=403, detail="only owner/pm can resolve red alerts")
+
+    alert_ids = list(dict.fromkeys(payload.alert_ids))
+    columns = [models.Alert.id, models.Alert.tenant_id, models.Alert.status]
+    if payload.action != "feedback":
+        query = db.query(*columns).filter(models.Alert.id.in_(alert_ids))
+    else:
+        latest = (
+            db.query(
+                models.RiskAssessment.order_line_id.label("order_line_id"),
+                func.max(models.RiskAssessment.assessed_at).label("assessed_at"),
+            )
+            .join(models.Alert, models.Alert.order_line_id == models.RiskAssessment.order_line_id)
+            .filter(models.Alert.id.in_(alert_ids))
+            .group_by(models.RiskAssessment.order_line_id)
+            .subquery()
+        )
+        query = (
+            db.query(*columns, models.RiskAssessment.model_version)
+            .filter(models.Alert.id.in_(alert_ids))
+            .outerjoin(latest, latest.c.order_line_id == models.Alert.order_line_id)
+            .outerjoin(
+                models.RiskAssessment,
+                and_(
+                    models.RiskAssessment.order_line_id == latest.c.order_line_id,
+                    models.RiskAssessment.assessed_at == latest.c.assessed_at,
+                ),
+            )
+        )
+    found = {row.id: row for row in query.all()}
+
+    results: dict[str, dict[str, Any]] = {}
+    owned = []
+    for alert_id in alert_ids:
+        row = found.get(alert_id)
+        if row is None:
+            results[alert_id] = _bulk_result(alert_id, "not_found")
+        elif row.tenant_id != ctx.tenant_id:
+            results[alert_id] = _bulk_result(alert_id, "forbidden")
+        else:
+            owned.append(row)
+
+    now = utcnow()
+    if payload.action == "feedback":
+        feedback_rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "alert_id": row.id,
+                "user_id": ctx.user_id,
+                "disposition": payload.disposition,
+                "notes": payload.notes,
+                "model_version": row.model_version or "heuristic_v1",
+                "created_at": now,
+            }
+            for row in owned
+        ]
+        if feedback_rows:
+            db.execute(insert(models.AlertFeedback), feedback_rows)
+        for row, feedback in zip(owned, feedback_rows):
+            results[row.id] = _bulk_result(row.id, "created", row.status, feedback["id"])
+    else:
+        target, timestamp = ("acknowledged", "acknowledged_at") if payload.action == "acknowledge" else ("resolved", "resolved_at")
+        # Acknowledging only moves open alerts; resolving moves anything not yet resolved.
+        movable = {"open"} if target == "acknowledged" else {"open", "acknowledged"}
+        changed = [row.id for row in owned if row.status in movable]
+        changed_ids: set[str] = set()
+        if changed:
+            # Re-check status and tenant in the UPDATE itself: a concurrent request may have moved an alert
+            # since the read above, and only the rows this statement actually matched count as updated.
+            statement = (
+                update(models.Alert)
+                .where(
+                    models.Alert.id.in_(changed),
+                    models.Alert.status.in_(movable),
+                    models.Alert.tenant_id == ctx.tenant_id,
+                )
+                .values({models.Alert.status: target, getattr(models.Alert, timestamp): now})
+                .returning(models.Alert.id)
+                .execution_options(synchronize_session=False)
+            )
+            changed_ids = set(db.execute(statement).scalars())
+        # Alerts moved by someone else in between are reported with their current status.
+        lost = [alert_id for alert_id in changed if alert_id not in changed_ids]
+        current = dict(db.query(models.Alert.id, models.Alert.status).filter(models.Alert.id.in_(lost)).all()) if lost else {}
+        for row in owned:
+            if row.id in changed_ids:
+                results[row.id] = _bulk_result(row.id, "updated", target)
+            else:
+                results[row.id] = _bulk_result(row.id, "unchanged", current.get(row.id, row.status))
+    db.commit()
+
+    ordered = [results[alert_id] for alert_id in alert_ids]
+    applied = sum(1 for item in ordered if item["result"] in {"created", "updated"})
+    return FastJSONResponse({"action": payload.action, "applied": applied, "results": ordered})
 
 
 @router.post("/alerts/{alert_id}/feedback", response_model=schemas.AlertFeedbackResponse, status_code=status.HTTP_201_CREATED)
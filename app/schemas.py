@@ -3,7 +3,9 @@ from __future__ import annotations
 from datetime import date, datetime
 from typing import Any, Literal
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+from app import config
 
 
 class ConnectorCreateRequest(BaseModel):
@@ -11,6 +13,7 @@ class ConnectorCreateRequest(BaseModel):
     auth_type: str = Field(alias="authType")
     credentials: dict[str, Any]
     poll_interval_minutes: int = Field(default=1440, alias="pollIntervalMinutes")
+    profile_syncs: bool = Field(default=False, alias="profileSyncs")
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -30,6 +33,7 @@ class ConnectorResponse(BaseModel):
     status: str
     poll_interval_minutes: int = Field(alias="pollIntervalMinutes")
     last_sync_at: datetime | None = Field(alias="lastSyncAt")
+    profile_syncs: bool = Field(alias="profileSyncs")
     created_at: datetime = Field(alias="createdAt")
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
@@ -38,6 +42,8 @@ class ConnectorResponse(BaseModel):
 class SyncRunRequest(BaseModel):
     connector_id: str = Field(alias="connectorId")
     mode: Literal["incremental", "full"] = "incremental"
+    # Wrap this run in the sync profiler; see GET /api/sync/runs/{id}/profile.
+    profile: bool = False
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -52,6 +58,44 @@ class SyncRunResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 
+class ConnectorProfilingRequest(BaseModel):
+    enabled: bool
+
+
+class SyncRunDetailResponse(BaseModel):
+    id: str
+    connector_id: str = Field(alias="connectorId")
+    status: str
+    mode: str
+    profile: bool
+    attempts: int
+    error: str | None
+    started_at: datetime = Field(alias="startedAt")
+    completed_at: datetime | None = Field(alias="completedAt")
+    duration_ms: float = Field(alias="durationMs")
+    stages_ms: dict[str, float] = Field(alias="stagesMs")
+    records: dict[str, int]
+    bytes_fetched: int = Field(alias="bytesFetched")
+    impacted_order_ids: list[str] = Field(alias="impactedOrderIds")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SyncMetricsBucket(BaseModel):
+    connector_id: str = Field(alias="connectorId")
+    supplier_name: str = Field(alias="supplierName")
+    day: str
+    runs: int
+    failed_runs: int = Field(alias="failedRuns")
+    avg_duration_ms: float = Field(alias="avgDurationMs")
+    max_duration_ms: float = Field(alias="maxDurationMs")
+    avg_stages_ms: dict[str, float] = Field(alias="avgStagesMs")
+    records: dict[str, int]
+    bytes_fetched: int = Field(alias="bytesFetched")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
 class OrderRiskItem(BaseModel):
     order_line_id: str = Field(alias="orderLineId")
     project_id: str | None = Field(alias="projectId")
@@ -81,6 +125,26 @@ class TimelineEvent(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
 
+class OrderBatchRequest(BaseModel):
+    order_ids: list[str] = Field(alias="orderIds", min_length=1, max_length=config.ORDER_BATCH_MAX_IDS)
+    timeline_limit: int = Field(default=config.ORDER_BATCH_TIMELINE_LIMIT, alias="timelineLimit", ge=1, le=config.ORDER_TIMELINE_LIMIT)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class OrderBatchError(BaseModel):
+    id: str
+    # not_found, forbidden or assessment_missing
+    error: str
+
+
+class OrderTimelineResponse(BaseModel):
+    events: list[TimelineEvent]
+    next_cursor: str | None = Field(alias="nextCursor")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
 class Recommendation(BaseModel):
     title: str
     action: str
@@ -102,11 +166,152 @@ class OrderDetailResponse(BaseModel):
     estimated_delay_days: int = Field(alias="estimatedDelayDays")
     risk_history: list[dict[str, Any]] = Field(alias="riskHistory")
     timeline: list[TimelineEvent]
+    # Pass as ``before`` to /api/orders/{id}/timeline for older events; null when the timeline is complete.
+    timeline_cursor: str | None = Field(alias="timelineCursor")
     recommendations: list[Recommendation]
 
     model_config = ConfigDict(populate_by_name=True)
 
 
+class OrderBatchResponse(BaseModel):
+    items: list[OrderDetailResponse]
+    errors: list[OrderBatchError]
+
+
+class OrderFeaturesResponse(BaseModel):
+    order_line_id: str = Field(alias="orderLineId")
+    qty_available: float | None = Field(alias="qtyAvailable")
+    inventory_source_timestamp: datetime | None = Field(alias="inventorySourceTimestamp")
+    qty_ordered: float = Field(alias="qtyOrdered")
+    qty_delivered: float = Field(alias="qtyDelivered")
+    history_count: int = Field(alias="historyCount")
+    delayed_count: int = Field(alias="delayedCount")
+    avg_historical_lead_days: float | None = Field(alias="avgHistoricalLeadDays")
+    lead_time_days: float = Field(alias="leadTimeDays")
+    eta_variance_days: float = Field(alias="etaVarianceDays")
+    impact_date: date | None = Field(alias="impactDate")
+    eta_volatility_days: float = Field(alias="etaVolatilityDays")
+    eta_trend_days: float = Field(alias="etaTrendDays")
+    eta_shift_stddev_days: float = Field(alias="etaShiftStddevDays")
+    components: dict[str, float | None]
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SubstitutionMember(BaseModel):
+    supplier_id: str = Field(alias="supplierId")
+    supplier_sku: str = Field(alias="supplierSku")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SubstitutionGroupRequest(BaseModel):
+    group_key: str = Field(alias="groupKey", min_length=1, max_length=128)
+    members: list[SubstitutionMember] = Field(min_length=2)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SubstitutionGroupResponse(BaseModel):
+    group_key: str = Field(alias="groupKey")
+    members: list[SubstitutionMember]
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class AlternativeOption(BaseModel):
+    supplier_id: str = Field(alias="supplierId")
+    supplier_name: str = Field(alias="supplierName")
+    supplier_sku: str = Field(alias="supplierSku")
+    qty_available: float | None = Field(alias="qtyAvailable")
+    risk_score: float = Field(alias="riskScore")
+    risk_status: Literal["green", "yellow", "red"] = Field(alias="riskStatus")
+    reason_codes: list[str] = Field(alias="reasonCodes")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class RecommendationRuleItem(BaseModel):
+    reason_code: str = Field(alias="reasonCode", min_length=1, max_length=64)
+    position: int = 100
+    priority: Literal["high", "medium", "low"]
+    title: str = Field(min_length=1, max_length=255)
+    action: str = Field(min_length=1)
+    supplier_id: str | None = Field(default=None, alias="supplierId")
+    project_id: str | None = Field(default=None, alias="projectId")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class RecommendationRulesRequest(BaseModel):
+    rules: list[RecommendationRuleItem]
+
+
+class InventoryOverride(BaseModel):
+    supplier_id: str = Field(alias="supplierId")
+    sku: str
+    qty_available: float | None = Field(default=None, alias="qtyAvailable", ge=0)
+    qty_delta: float | None = Field(default=None, alias="qtyDelta")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @model_validator(mode="after")
+    def validate_quantity(self) -> "InventoryOverride":
+        if (self.qty_available is None) == (self.qty_delta is None):
+            raise ValueError("exactly one of qtyAvailable or qtyDelta is required")
+        return self
+
+
+class EtaShiftOverride(BaseModel):
+    order_line_id: str | None = Field(default=None, alias="orderLineId")
+    supplier_id: str | None = Field(default=None, alias="supplierId")
+    days: int
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @model_validator(mode="after")
+    def validate_target(self) -> "EtaShiftOverride":
+        if not self.order_line_id and not self.supplier_id:
+            raise ValueError("orderLineId or supplierId is required")
+        return self
+
+
+class SupplierSwapOverride(BaseModel):
+    order_line_id: str = Field(alias="orderLineId")
+    supplier_id: str = Field(alias="supplierId")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SimulationRequest(BaseModel):
+    project_id: str | None = Field(default=None, alias="projectId")
+    order_line_ids: list[str] | None = Field(default=None, alias="orderLineIds")
+    inventory: list[InventoryOverride] = Field(default_factory=list)
+    eta_shifts: list[EtaShiftOverride] = Field(default_factory=list, alias="etaShifts")
+    supplier_swaps: list[SupplierSwapOverride] = Field(default_factory=list, alias="supplierSwaps")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SimulationDelta(BaseModel):
+    order_line_id: str = Field(alias="orderLineId")
+    supplier_id: str = Field(alias="supplierId")
+    before_status: str = Field(alias="beforeStatus")
+    after_status: str = Field(alias="afterStatus")
+    before_score: float = Field(alias="beforeScore")
+    after_score: float = Field(alias="afterScore")
+    reason_codes: list[str] = Field(alias="reasonCodes")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SimulationResponse(BaseModel):
+    evaluated: int
+    before: dict[str, int]
+    after: dict[str, int]
+    deltas: list[SimulationDelta]
+
+
 class AlertFeedbackRequest(BaseModel):
     disposition: Literal["accurate", "false_positive", "too_late"]
     notes: str = ""
@@ -135,3 +340,34 @@ class ResolveAlertRequest(BaseModel):
 
     model_config = ConfigDict(populate_by_name=True)
 
+
+class BulkAlertActionRequest(BaseModel):
+    alert_ids: list[str] = Field(alias="alertIds", min_length=1, max_length=config.BULK_ALERT_MAX_IDS)
+    action: Literal["feedback", "acknowledge", "resolve"]
+    disposition: Literal["accurate", "false_positive", "too_late"] | None = None
+    notes: str = Field(default="", max_length=500)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @model_validator(mode="after")
+    def validate_disposition(self) -> "BulkAlertActionRequest":
+        if self.action == "feedback" and self.disposition is None:
+            raise ValueError("disposition is required for feedback")
+        return self
+
+
+class BulkAlertResult(BaseModel):
+    id: str
+    # created/updated/unchanged, or not_found/forbidden for ids that were skipped.
+    result: str
+    status: str | None = None
+    feedback_id: str | None = Field(default=None, alias="feedbackId")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class BulkAlertActionResponse(BaseModel):
+    action: str
+    applied: int
+    results: list[BulkAlertResult]
+
@@ -58,5 +58,5 @@ def seed_demo_data(db) -> None:
 
     for connector in connectors:
         run = queue_sync_run(db, connector.id, "incremental")
-        run_sync_job(run.id)
+        run_sync_job(run.id, connector.tenant_id)
 
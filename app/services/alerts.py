@@ -9,6 +9,9 @@ from app import config, models
 from app.services.recommendations import recommendations_for_reasons
 from app.services.scoring import ScoreResult
 
+ALERT_SEVERITIES = ("low", "medium", "high")
+ALERT_STATUSES = ("open", "acknowledged", "resolved")
+
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,69 @@
+"""ETA revision log and the running statistics scoring reads instead of scanning it.
+
+Each time a supplier moves an order line's ETA, one ``EtaRevision`` row is written and the
+line's statistics are folded forward in O(1):
+
+- ``eta_shift_mean_days`` / ``eta_shift_m2``: Welford mean and sum of squared deviations of the
+  signed shifts over the line's whole life (``eta_shift_stddev`` gives the sample deviation, which
+  scoring reads so a line that swings both ways still counts as volatile).
+- ``eta_volatility_days``: exponentially weighted mean of the absolute shift, so recent churn
+  outweighs old revisions.
+- ``eta_trend_days``: exponentially weighted mean of the signed shift; positive means the ETA
+  keeps slipping later.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import date, datetime
+from typing import Any
+
+from app import config, models
+
+
+def apply_revision(line: models.OrderLine, shift_days: float) -> None:
+    """Fold one ETA shift into the line's running statistics."""
+    count = line.eta_revision_count + 1
+    delta = shift_days - line.eta_shift_mean_days
+    mean = line.eta_shift_mean_days + delta / count
+    line.eta_shift_m2 += delta * (shift_days - mean)
+    line.eta_shift_mean_days = mean
+    line.eta_revision_count = count
+
+    alpha = config.ETA_EWMA_ALPHA
+    if count == 1:
+        line.eta_volatility_days = abs(shift_days)
+        line.eta_trend_days = shift_days
+    else:
+        line.eta_volatility_days = alpha * abs(shift_days) + (1 - alpha) * line.eta_volatility_days
+        line.eta_trend_days = alpha * shift_days + (1 - alpha) * line.eta_trend_days
+
+
+def eta_shift_stddev(line: models.OrderLine) -> float:
+    if line.eta_revision_count < 2:
+        return 0.0
+    return math.sqrt(line.eta_shift_m2 / (line.eta_revision_count - 1))
+
+
+def revise_eta(
+    line: models.OrderLine,
+    eta_date: date | None,
+    source_timestamp: datetime | None,
+) -> dict[str, Any] | None:
+    """Set the line's ETA; returns an ``eta_revisions`` row to insert when a promised date moved.
+
+    A first ETA (or one withdrawn by the supplier) is not a revision and leaves the statistics alone.
+    """
+    previous = line.eta_date
+    line.eta_date = eta_date
+    if previous is None or eta_date is None or previous == eta_date:
+        return None
+    shift_days = (eta_date - previous).days
+    apply_revision(line, float(shift_days))
+    return {
+        "order_line_id": line.id,
+        "previous_eta": previous,
+        "eta_date": eta_date,
+        "shift_days": shift_days,
+        "source_timestamp": source_timestamp,
+    }
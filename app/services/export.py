@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import csv
+import io
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from app.responses import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+    pq = None
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_CHUNK_ROWS = 1000
+
+ORDER_RISK_COLUMNS = [
+    "orderLineId",
+    "projectId",
+    "supplierId",
+    "status",
+    "riskScore",
+    "confidence",
+    "reasonCodes",
+    "estimatedDelayDays",
+    "impactDate",
+    "stale",
+    "lastUpdated",
+]
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def _chunks(rows: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return ";".join(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(rows: Iterable[dict[str, Any]], columns: list[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in _chunks(rows, EXPORT_CHUNK_ROWS):
+        for row in chunk:
+            writer.writerow({key: _csv_value(value) for key, value in row.items()})
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(rows: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    for chunk in _chunks(rows, EXPORT_CHUNK_ROWS):
+        yield b"".join(dumps(row) + b"\n" for row in chunk)
+
+
+def order_risk_parquet_schema() -> "pa.Schema":
+    return pa.schema(
+        [
+            ("orderLineId", pa.string()),
+            ("projectId", pa.string()),
+            ("supplierId", pa.string()),
+            ("status", pa.string()),
+            ("riskScore", pa.float64()),
+            ("confidence", pa.float64()),
+            ("reasonCodes", pa.list_(pa.string())),
+            ("estimatedDelayDays", pa.int32()),
+            ("impactDate", pa.date32()),
+            ("stale", pa.bool_()),
+            ("lastUpdated", pa.timestamp("us")),
+        ]
+    )
+
+
+class _DrainingSink:
+    """Write-only file object that hands written bytes back to the caller between row groups.
+
+    Parquet records absolute column-chunk offsets in its footer, so ``tell`` must keep
+    counting bytes that were already drained.
+    """
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._pending: list[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._pending.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        return None
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._pending)
+        self._pending.clear()
+        return data
+
+
+def iter_parquet(rows: Iterable[dict[str, Any]], schema: "pa.Schema") -> Iterator[bytes]:
+    if pq is None:
+        raise RuntimeError("parquet export requires pyarrow")
+    sink = _DrainingSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    for chunk in _chunks(rows, EXPORT_CHUNK_ROWS):
+        writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from dataclasses import fields
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.scoring import HISTORY_STATUSES, ScoringFeatures, extract_features
+
+_FEATURE_COLUMNS = [item.name for item in fields(ScoringFeatures) if item.name != "order_line_id"]
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _to_features(row: models.OrderLineFeatures) -> ScoringFeatures:
+    return ScoringFeatures(order_line_id=row.order_line_id, **{name: getattr(row, name) for name in _FEATURE_COLUMNS})
+
+
+def store_features(db: Session, features: list[ScoringFeatures]) -> None:
+    if not features:
+        return
+    now = utcnow()
+    existing = {
+        row.order_line_id: row
+        for row in db.query(models.OrderLineFeatures)
+        .filter(models.OrderLineFeatures.order_line_id.in_([item.order_line_id for item in features]))
+        .all()
+    }
+    for item in features:
+        row = existing.get(item.order_line_id)
+        if row is None:
+            row = models.OrderLineFeatures(order_line_id=item.order_line_id)
+            db.add(row)
+        for name in _FEATURE_COLUMNS:
+            setattr(row, name, getattr(item, name))
+        row.computed_at = now
+
+
+def refresh_features(db: Session, order_lines: list[models.OrderLine]) -> list[ScoringFeatures]:
+    """Recompute and persist features for every line given; ``load_features`` calls it for the stale ones."""
+    # Pending line and snapshot changes get their updated_at/captured_at before computed_at is taken.
+    db.flush()
+    features = extract_features(db, order_lines)
+    store_features(db, features)
+    return features
+
+
+def _inputs_changed_at(db: Session, order_lines: list[models.OrderLine]) -> dict[tuple[str, str], datetime]:
+    """Newest inventory snapshot or history-line change per (supplier_id, supplier_sku) of the lines."""
+    supplier_ids = {line.supplier_id for line in order_lines}
+    skus = {line.supplier_sku for line in order_lines}
+    snapshot = models.SupplierInventorySnapshot
+    history = models.OrderLine
+    rows = (
+        db.query(snapshot.connector_id, snapshot.supplier_sku, func.max(snapshot.captured_at))
+        .filter(snapshot.connector_id.in_(supplier_ids), snapshot.supplier_sku.in_(skus))
+        .group_by(snapshot.connector_id, snapshot.supplier_sku)
+        .all()
+    ) + (
+        db.query(history.supplier_id, history.supplier_sku, func.max(history.updated_at))
+        .filter(
+            history.supplier_id.in_(supplier_ids),
+            history.supplier_sku.in_(skus),
+            history.status.in_(HISTORY_STATUSES),
+        )
+        .group_by(history.supplier_id, history.supplier_sku)
+        .all()
+    )
+    changed: dict[tuple[str, str], datetime] = {}
+    for supplier_id, supplier_sku, changed_at in rows:
+        key = (supplier_id, supplier_sku)
+        changed[key] = max(changed_at, changed.get(key, changed_at))
+    return changed
+
+
+def load_features(db: Session, order_lines: list[models.OrderLine], persist: bool = True) -> list[ScoringFeatures]:
+    """Read stored feature vectors, recomputing only rows whose inputs changed since they were computed.
+
+    A vector is current while it is newer than its line's ``updated_at`` and than the newest
+    inventory snapshot and history-line change for the line's supplier SKU. With ``persist=False``
+    recomputed vectors are returned without being written back.
+    """
+    if not order_lines:
+        return []
+    rows = {
+        row.order_line_id: row
+        for row in db.query(models.OrderLineFeatures)
+        .filter(models.OrderLineFeatures.order_line_id.in_([line.id for line in order_lines]))
+        .all()
+    }
+    changed = _inputs_changed_at(db, order_lines) if rows else {}
+    stored = {}
+    for line in order_lines:
+        row = rows.get(line.id)
+        if row is None or row.computed_at < line.updated_at:
+            continue
+        inputs_changed = changed.get((line.supplier_id, line.supplier_sku))
+        if inputs_changed is None or row.computed_at >= inputs_changed:
+            stored[line.id] = _to_features(row)
+    missing = [line for line in order_lines if line.id not in stored]
+    recomputed = refresh_features(db, missing) if persist else extract_features(db, missing)
+    for item in recomputed:
+        stored[item.order_line_id] = item
+    return [stored[line.id] for line in order_lines]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Protocol, Sequence
+
+from app import config
+from app.services.scoring import HeuristicV1Model, HeuristicV2Model, ScoreResult, ScoringFeatures
+
+logger = logging.getLogger(__name__)
+
+
+class ScoringModel(Protocol):
+    version: str
+
+    def score(self, features: Sequence[ScoringFeatures]) -> list[ScoreResult]:
+        ...
+
+
+_MODELS: dict[str, ScoringModel] = {}
+
+
+def register_model(model: ScoringModel) -> None:
+    _MODELS[model.version] = model
+
+
+def get_model(version: str) -> ScoringModel:
+    try:
+        return _MODELS[version]
+    except KeyError:
+        raise ValueError(f"unknown scoring model: {version}") from None
+
+
+def available_models() -> list[str]:
+    return sorted(_MODELS)
+
+
+def model_for_tenant(tenant_id: str) -> ScoringModel:
+    return get_model(config.TENANT_SCORING_MODELS.get(tenant_id, config.DEFAULT_SCORING_MODEL))
+
+
+def shadow_model_for_tenant(tenant_id: str) -> ScoringModel | None:
+    version = config.TENANT_SHADOW_MODELS.get(tenant_id)
+    return get_model(version) if version else None
+
+
+@dataclass
+class ShadowDivergence:
+    order_line_id: str
+    primary_status: str
+    shadow_status: str
+    score_delta: float
+
+
+def shadow_score(
+    model: ScoringModel,
+    features: Sequence[ScoringFeatures],
+    primary: Sequence[ScoreResult],
+) -> list[ShadowDivergence]:
+    """Score a bounded sample with a candidate model and report where it disagrees.
+
+    Shadow results are never persisted or alerted on, and a failing candidate cannot
+    break the primary scoring path.
+    """
+    limit = config.SHADOW_MAX_LINES_PER_BATCH
+    try:
+        shadow = model.score(features[:limit])
+    except Exception:  # noqa: BLE001
+        logger.exception("shadow model %s failed", model.version)
+        return []
+
+    divergences = []
+    for item, expected, candidate in zip(features, primary, shadow):
+        delta = candidate.risk_score - expected.risk_score
+        if candidate.risk_status != expected.risk_status or abs(delta) >= config.SHADOW_SCORE_DIVERGENCE:
+            divergences.append(
+                ShadowDivergence(
+                    order_line_id=item.order_line_id,
+                    primary_status=expected.risk_status,
+                    shadow_status=candidate.risk_status,
+                    score_delta=round(delta, 4),
+                )
+            )
+    for divergence in divergences:
+        logger.info(
+            "shadow divergence model=%s order_line=%s primary=%s shadow=%s delta=%.4f",
+            model.version,
+            divergence.order_line_id,
+            divergence.primary_status,
+            divergence.shadow_status,
+            divergence.score_delta,
+        )
+    return divergences
+
+
+register_model(HeuristicV1Model())
+register_model(HeuristicV2Model())
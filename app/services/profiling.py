@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import cProfile
+import marshal
+import sys
+import threading
+from collections import Counter
+from types import FrameType, TracebackType
+
+from app import config
+
+
+def _frame_label(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def _collapse(frame: FrameType | None) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SyncProfiler:
+    """Profile the calling thread with cProfile plus a stack sampler for flame graphs.
+
+    cProfile gives exact call counts and cumulative times; the sampler thread records the
+    profiled thread's stack every ``config.PROFILE_SAMPLE_INTERVAL_S`` seconds in collapsed
+    format. Nothing is hooked outside the ``with`` block.
+    """
+
+    def __init__(self, interval: float | None = None) -> None:
+        self.interval = interval or config.PROFILE_SAMPLE_INTERVAL_S
+        self.samples: Counter[str] = Counter()
+        self._profile = cProfile.Profile()
+        self._stop = threading.Event()
+        self._thread_id = 0
+        self._sampler: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.samples[_collapse(frame)] += 1
+
+    def __enter__(self) -> SyncProfiler:
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, name="sync-profiler", daemon=True)
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._profile.disable()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def collapsed_stacks(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def pstats_bytes(self) -> bytes:
+        # Same format as pstats.Stats.dump_stats, so the blob loads with pstats.Stats(path).
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
@@ -1,51 +1,270 @@
 from __future__ import annotations
 
+import string
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from sqlalchemy.orm import Session
+
 from app import models
 
+# Pseudo reason code for the rule used when no other rule matches.
+FALLBACK_REASON = "FALLBACK"
+# Placeholders a rule's title and action may use, e.g. "Call yard for {supplier_sku}".
+TEMPLATE_FIELDS = frozenset({"supplier_sku", "supplier_order_id", "qty_remaining", "impact_date"})
 
-def recommendations_for_reasons(order_line: models.OrderLine, reason_codes: list[str]) -> list[dict[str, str]]:
-    actions: list[dict[str, str]] = []
 
-    if "LOW_STOCK" in reason_codes:
-        actions.append(
-            {
-                "title": "Source alternate supplier",
-                "action": "Request quote from a backup distributor and split reorder for remaining quantity.",
-                "priority": "high",
-            }
-        )
-    if "ETA_VOLATILITY" in reason_codes:
-        actions.append(
-            {
-                "title": "Resequence dependent work",
-                "action": "Shift tasks requiring this SKU by 2-4 days and advance unaffected tasks.",
-                "priority": "medium",
-            }
-        )
-    if "PARTIAL_DELIVERY" in reason_codes:
-        actions.append(
-            {
-                "title": "Close remaining quantity gap",
-                "action": "Create a split order for undelivered quantity to avoid full-project blockage.",
-                "priority": "high",
-            }
-        )
-    if "STALE_DATA" in reason_codes:
-        actions.append(
-            {
-                "title": "Refresh connector data",
-                "action": "Run connector retry now and verify supplier endpoint freshness before final decisions.",
-                "priority": "medium",
-            }
+@dataclass(frozen=True)
+class Rule:
+    reason_code: str
+    position: int
+    priority: str
+    title: str
+    action: str
+    supplier_id: str | None = None
+    project_id: str | None = None
+
+    @property
+    def templated(self) -> bool:
+        return "{" in self.title or "{" in self.action
+
+    def matches(self, order_line: models.OrderLine) -> bool:
+        if self.supplier_id is not None and self.supplier_id != order_line.supplier_id:
+            return False
+        if self.project_id is not None and self.project_id != order_line.project_id:
+            return False
+        return True
+
+    def render(self, order_line: models.OrderLine) -> dict[str, str]:
+        if not self.templated:
+            return {"title": self.title, "action": self.action, "priority": self.priority}
+        values = {
+            "supplier_sku": order_line.supplier_sku,
+            "supplier_order_id": order_line.supplier_order_id,
+            "qty_remaining": f"{max(order_line.qty_ordered - order_line.qty_delivered, 0.0):.0f}",
+            "impact_date": str(order_line.impact_date) if order_line.impact_date else "unknown",
+        }
+        return {
+            "title": self.title.format_map(values),
+            "action": self.action.format_map(values),
+            "priority": self.priority,
+        }
+
+
+def rule_sort_key(rule: Rule) -> tuple[int, str, str]:
+    # Equal positions would otherwise follow the hash order of the reason-code set, which varies per process.
+    return (rule.position, rule.reason_code, rule.title)
+
+
+def check_template(text: str) -> None:
+    """Raise ValueError unless every placeholder in ``text`` is a bare ``TEMPLATE_FIELDS`` name."""
+    for _, field_name, format_spec, _ in string.Formatter().parse(text):
+        if field_name is None:
+            continue
+        if field_name not in TEMPLATE_FIELDS:
+            raise ValueError(f"unknown template field: {{{field_name}}}")
+        if format_spec and "{" in format_spec:
+            raise ValueError("nested template fields are not supported")
+
+
+DEFAULT_RULES = (
+    Rule(
+        reason_code="LOW_STOCK",
+        position=10,
+        priority="high",
+        title="Source alternate supplier",
+        action="Request quote from a backup distributor and split reorder for remaining quantity.",
+    ),
+    Rule(
+        reason_code="ETA_VOLATILITY",
+        position=20,
+        priority="medium",
+        title="Resequence dependent work",
+        action="Shift tasks requiring this SKU by 2-4 days and advance unaffected tasks.",
+    ),
+    Rule(
+        reason_code="PARTIAL_DELIVERY",
+        position=30,
+        priority="high",
+        title="Close remaining quantity gap",
+        action="Create a split order for undelivered quantity to avoid full-project blockage.",
+    ),
+    Rule(
+        reason_code="STALE_DATA",
+        position=40,
+        priority="medium",
+        title="Refresh connector data",
+        action="Run connector retry now and verify supplier endpoint freshness before final decisions.",
+    ),
+    Rule(
+        reason_code=FALLBACK_REASON,
+        position=1000,
+        priority="low",
+        title="Confirm with supplier",
+        action="Contact supplier dispatcher to confirm ETA and lock delivery window.",
+    ),
+)
+
+
+class RuleBook:
+    """Rules indexed by reason code, with candidate lists cached per (tenant, reason-code set).
+
+    A tenant's rules for a reason code replace the default rules for that code.
+    """
+
+    def __init__(self, default_rules: Iterable[Rule], tenant_rules: dict[str, Iterable[Rule]]) -> None:
+        self._defaults = self._index(default_rules)
+        self._tenants = {tenant_id: self._index(rules) for tenant_id, rules in tenant_rules.items()}
+        self._candidates: dict[tuple[str, frozenset[str]], tuple[Rule, ...]] = {}
+
+    @staticmethod
+    def _index(rules: Iterable[Rule]) -> dict[str, tuple[Rule, ...]]:
+        indexed: dict[str, list[Rule]] = defaultdict(list)
+        for rule in rules:
+            indexed[rule.reason_code].append(rule)
+        return {code: tuple(sorted(items, key=rule_sort_key)) for code, items in indexed.items()}
+
+    def _rules_for(self, tenant_id: str, reason_code: str) -> tuple[Rule, ...]:
+        tenant = self._tenants.get(tenant_id)
+        if tenant is not None and reason_code in tenant:
+            return tenant[reason_code]
+        return self._defaults.get(reason_code, ())
+
+    def candidates(self, tenant_id: str, reason_codes: Iterable[str]) -> tuple[Rule, ...]:
+        key = (tenant_id, frozenset(reason_codes))
+        cached = self._candidates.get(key)
+        if cached is None:
+            rules = [rule for code in key[1] for rule in self._rules_for(tenant_id, code)]
+            cached = tuple(sorted(rules, key=rule_sort_key))
+            self._candidates[key] = cached
+        return cached
+
+    def fallback(self, tenant_id: str) -> tuple[Rule, ...]:
+        return self._rules_for(tenant_id, FALLBACK_REASON)
+
+    def tenant_rules(self) -> dict[str, list[Rule]]:
+        return {tenant_id: [rule for rules in indexed.values() for rule in rules] for tenant_id, indexed in self._tenants.items()}
+
+    def effective_rules(self, tenant_id: str) -> list[Rule]:
+        codes = set(self._defaults) | set(self._tenants.get(tenant_id, {}))
+        rules = [rule for code in codes for rule in self._rules_for(tenant_id, code)]
+        return sorted(rules, key=rule_sort_key)
+
+
+_rulebook = RuleBook(DEFAULT_RULES, {})
+
+
+def get_rulebook() -> RuleBook:
+    return _rulebook
+
+
+def _rule_from_row(row: models.RecommendationRule) -> Rule:
+    return Rule(
+        reason_code=row.reason_code,
+        position=row.position,
+        priority=row.priority,
+        title=row.title,
+        action=row.action,
+        supplier_id=row.supplier_id,
+        project_id=row.project_id,
+    )
+
+
+def load_rules(db: Session, tenant_ids: Iterable[str] | None = None) -> RuleBook:
+    """Rebuild the rulebook from ``db``; with ``tenant_ids`` only those tenants are reloaded and the rest kept."""
+    global _rulebook
+    tenant_rules: dict[str, list[Rule]] = defaultdict(list)
+    query = db.query(models.RecommendationRule)
+    if tenant_ids is not None:
+        tenant_ids = set(tenant_ids)
+        for tenant_id, rules in _rulebook.tenant_rules().items():
+            if tenant_id not in tenant_ids:
+                tenant_rules[tenant_id].extend(rules)
+        query = query.filter(models.RecommendationRule.tenant_id.in_(tenant_ids))
+    for row in query.all():
+        tenant_rules[row.tenant_id].append(_rule_from_row(row))
+    _rulebook = RuleBook(DEFAULT_RULES, tenant_rules)
+    return _rulebook
+
+
+def replace_tenant_rules(db: Session, tenant_id: str, rules: list[Rule]) -> None:
+    db.query(models.RecommendationRule).filter(models.RecommendationRule.tenant_id == tenant_id).delete(
+        synchronize_session=False
+    )
+    for rule in rules:
+        db.add(
+            models.RecommendationRule(
+                tenant_id=tenant_id,
+                reason_code=rule.reason_code,
+                position=rule.position,
+                priority=rule.priority,
+                title=rule.title,
+                action=rule.action,
+                supplier_id=rule.supplier_id,
+                project_id=rule.project_id,
+            )
         )
 
+
+def _alternative_action(option: dict[str, Any]) -> dict[str, str]:
+    return {
+        "title": f"Source from {option['supplierName']} ({option['supplierSku']})",
+        "action": (
+            f"{option['qtyAvailable']:.0f} available with projected risk "
+            f"{option['riskStatus'].upper()} ({option['riskScore']:.2f}); split or move the remaining quantity."
+        ),
+        "priority": "high",
+    }
+
+
+def recommendations_for_reasons(
+    order_line: models.OrderLine,
+    reason_codes: list[str],
+    alternatives: list[dict[str, Any]] | None = None,
+) -> list[dict[str, str]]:
+    """Build recommended actions; ``alternatives`` are ranked comparative_options for the line."""
+    actions: list[dict[str, str]] = []
+    alternatives_added = False
+    for rule in _rulebook.candidates(order_line.tenant_id, reason_codes):
+        if not rule.matches(order_line):
+            continue
+        if rule.reason_code == "LOW_STOCK" and alternatives:
+            # Concrete ranked options replace the generic sourcing advice.
+            if not alternatives_added:
+                actions.extend(_alternative_action(option) for option in alternatives[:3])
+                alternatives_added = True
+            continue
+        actions.append(rule.render(order_line))
+
     if not actions:
-        actions.append(
-            {
-                "title": "Confirm with supplier",
-                "action": "Contact supplier dispatcher to confirm ETA and lock delivery window.",
-                "priority": "low",
-            }
-        )
+        actions.extend(rule.render(order_line) for rule in _rulebook.fallback(order_line.tenant_id) if rule.matches(order_line))
     return actions
 
+
+class RecommendationMemo:
+    """Request-scoped memo of ``recommendations_for_reasons`` for many lines without alternatives.
+
+    Results are shared per (tenant, reason-code set) when the candidate rules render the same for
+    every line; rules scoped to a supplier or project add that id to the key, and templated rules
+    (which interpolate line fields) are rendered per line.
+    """
+
+    def __init__(self) -> None:
+        self._results: dict[tuple, list[dict[str, str]]] = {}
+
+    def for_line(self, order_line: models.OrderLine, reason_codes: list[str]) -> list[dict[str, str]]:
+        rules = _rulebook.candidates(order_line.tenant_id, reason_codes) + _rulebook.fallback(order_line.tenant_id)
+        if any(rule.templated for rule in rules):
+            return recommendations_for_reasons(order_line, reason_codes)
+        key = (
+            order_line.tenant_id,
+            frozenset(reason_codes),
+            order_line.supplier_id if any(rule.supplier_id for rule in rules) else None,
+            order_line.project_id if any(rule.project_id for rule in rules) else None,
+        )
+        cached = self._results.get(key)
+        if cached is None:
+            cached = recommendations_for_reasons(order_line, reason_codes)
+            self._results[key] = cached
+        return cached
@@ -0,0 +1,206 @@
+"""Full re-score of every open order line without re-fetching supplier data.
+
+Used after a threshold change or a new model version. Tenants are spread over a process pool;
+each worker walks its tenant's open lines in ``id`` order, scores them in batches from the feature
+store (only vectors whose inputs changed are recomputed) with a bulk assessment insert, and commits each batch together with its
+``RescoreCheckpoint``. Re-running with the same ``run_id`` skips finished tenants and resumes the
+others after the last committed line.
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, event, func, insert
+from sqlalchemy.orm import Session
+
+from app import codes, config, database, models, sharding
+from app.services import model_registry, recommendations
+from app.services.alerts import maybe_create_alert
+from app.services.features import load_features
+from app.services.scoring import OPEN_STATUSES
+
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class RescoreResult:
+    run_id: str
+    lines_by_tenant: dict[str, int] = field(default_factory=dict)
+    skipped_tenants: list[str] = field(default_factory=list)
+    elapsed_s: float = 0.0
+
+    @property
+    def lines(self) -> int:
+        return sum(self.lines_by_tenant.values())
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+def _previous_statuses(db: Session, line_ids: list[str]) -> dict[str, str]:
+    latest = (
+        db.query(
+            models.RiskAssessment.order_line_id.label("order_line_id"),
+            func.max(models.RiskAssessment.assessed_at).label("assessed_at"),
+        )
+        .filter(models.RiskAssessment.order_line_id.in_(line_ids))
+        .group_by(models.RiskAssessment.order_line_id)
+        .subquery()
+    )
+    rows = (
+        db.query(models.RiskAssessment.order_line_id, models.RiskAssessment.status_code)
+        .join(
+            latest,
+            and_(
+                models.RiskAssessment.order_line_id == latest.c.order_line_id,
+                models.RiskAssessment.assessed_at == latest.c.assessed_at,
+            ),
+        )
+        .all()
+    )
+    return {order_line_id: codes.decode_status(status_code) for order_line_id, status_code in rows}
+
+
+def rescore_batch(db: Session, lines: list[models.OrderLine], model: model_registry.ScoringModel, alerts: bool = True) -> None:
+    """Score one batch of a tenant's open lines and stage assessments (and alerts) without committing."""
+    features = load_features(db, lines)
+    scores = model.score(features)
+    previous = _previous_statuses(db, [line.id for line in lines]) if alerts else {}
+    db.execute(
+        insert(models.RiskAssessment),
+        [
+            {
+                "order_line_id": line.id,
+                "model_version": model.version,
+                "risk_score": score.risk_score,
+                "status_code": codes.encode_status(score.risk_status),
+                "confidence": score.confidence,
+                "reason_mask": codes.encode_reason_codes(score.reason_codes),
+                "estimated_delay_days": score.estimated_delay_days,
+                "stale_data": score.stale_data,
+                "assessed_at": score.assessed_at,
+            }
+            for line, score in zip(lines, scores)
+        ],
+    )
+    if alerts:
+        for line, score in zip(lines, scores):
+            maybe_create_alert(db, line, score, previous.get(line.id))
+
+
+def rescore_tenant(run_id: str, tenant_id: str, batch_size: int | None = None, alerts: bool = True) -> tuple[str, int]:
+    """Rescore one tenant from its checkpoint; returns the tenant and the lines scored by this call."""
+    batch_size = batch_size or config.RESCORE_BATCH_SIZE
+    db = sharding.session_for_tenant(tenant_id)
+    try:
+        checkpoint = db.get(models.RescoreCheckpoint, (run_id, tenant_id))
+        if checkpoint is None:
+            checkpoint = models.RescoreCheckpoint(run_id=run_id, tenant_id=tenant_id, lines_scored=0)
+            db.add(checkpoint)
+        if checkpoint.completed_at is not None:
+            return tenant_id, 0
+
+        model = model_registry.model_for_tenant(tenant_id)
+        scored = 0
+        while True:
+            query = db.query(models.OrderLine).filter(
+                models.OrderLine.tenant_id == tenant_id,
+                models.OrderLine.status.in_(OPEN_STATUSES),
+            )
+            if checkpoint.last_order_line_id is not None:
+                query = query.filter(models.OrderLine.id > checkpoint.last_order_line_id)
+            lines = query.order_by(models.OrderLine.id).limit(batch_size).all()
+            if not lines:
+                break
+            rescore_batch(db, lines, model, alerts=alerts)
+            checkpoint.last_order_line_id = lines[-1].id
+            checkpoint.lines_scored += len(lines)
+            db.commit()
+            # Scored lines are not needed again; keep the identity map from growing with the tenant.
+            db.expunge_all()
+            db.add(checkpoint)
+            scored += len(lines)
+
+        checkpoint.completed_at = utcnow()
+        db.commit()
+        return tenant_id, scored
+    finally:
+        db.close()
+
+
+def _init_worker(database_url: str, shard_directory: str | None, shard_buckets: int) -> None:
+    database.reset_engine(database_url)
+    if database_url.startswith("sqlite"):
+        # Workers take turns writing to SQLite; wait for the lock instead of failing the chunk.
+        @event.listens_for(database.engine, "connect")
+        def _busy_timeout(dbapi_connection, connection_record) -> None:
+            dbapi_connection.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+
+    sharding.configure(shard_directory, shard_buckets)
+    _load_rules()
+
+
+def _load_rules() -> None:
+    for db in sharding.each_session():
+        recommendations.load_rules(db, tenant_ids=sharding.tenant_ids(db) if sharding.router is not None else None)
+
+
+def open_line_tenants(db: Session) -> list[str]:
+    rows = (
+        db.query(models.OrderLine.tenant_id)
+        .filter(models.OrderLine.status.in_(OPEN_STATUSES))
+        .distinct()
+        .order_by(models.OrderLine.tenant_id)
+        .all()
+    )
+    return [tenant_id for (tenant_id,) in rows]
+
+
+def rescore_all(
+    run_id: str,
+    workers: int = 1,
+    batch_size: int | None = None,
+    tenant_ids: list[str] | None = None,
+    alerts: bool = True,
+) -> RescoreResult:
+    """Rescore every tenant with open lines; ``workers=1`` runs in-process."""
+    _load_rules()
+    tenants: list[str] = []
+    finished: set[str] = set()
+    for db in sharding.each_session():
+        tenants += tenant_ids or open_line_tenants(db)
+        finished |= {
+            row.tenant_id
+            for row in db.query(models.RescoreCheckpoint)
+            .filter(models.RescoreCheckpoint.run_id == run_id, models.RescoreCheckpoint.completed_at.is_not(None))
+            .all()
+        }
+    tenants = list(dict.fromkeys(tenants))
+
+    result = RescoreResult(run_id=run_id, skipped_tenants=[tenant for tenant in tenants if tenant in finished])
+    pending = [tenant for tenant in tenants if tenant not in finished]
+    started = time.perf_counter()
+    if workers <= 1 or len(pending) <= 1:
+        for tenant_id in pending:
+            tenant, scored = rescore_tenant(run_id, tenant_id, batch_size, alerts)
+            result.lines_by_tenant[tenant] = scored
+    else:
+        database_url = database.engine.url.render_as_string(hide_password=False)
+        router = sharding.router
+        initargs = (database_url, str(router.directory) if router else None, router.buckets if router else 0)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(rescore_tenant, run_id, tenant_id, batch_size, alerts) for tenant_id in pending]
+            for future in as_completed(futures):
+                tenant, scored = future.result()
+                result.lines_by_tenant[tenant] = scored
+    result.elapsed_s = time.perf_counter() - started
+    return result
@@ -3,10 +3,16 @@ from __future__ import annotations
 import math
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
+from typing import Sequence
 
+from sqlalchemy import and_, case, func
 from sqlalchemy.orm import Session
 
 from app import config, models
+from app.services.eta import eta_shift_stddev
+
+HISTORY_STATUSES = ("delivered", "delayed")
+OPEN_STATUSES = ("open", "partially_delivered")
 
 
 def utcnow() -> datetime:
@@ -47,66 +53,215 @@ def _impact_within_high_priority_window(impact_date: date | datetime | None, now
     return impact_dt <= now + timedelta(days=config.HIGH_PRIORITY_IMPACT_DAYS)
 
 
-def compute_order_risk(db: Session, order_line: models.OrderLine) -> ScoreResult:
-    now = utcnow()
-    latest_inventory = (
-        db.query(models.SupplierInventorySnapshot)
+@dataclass
+class ScoringFeatures:
+    order_line_id: str
+    qty_available: float | None
+    inventory_source_timestamp: datetime | None
+    qty_ordered: float
+    qty_delivered: float
+    history_count: int
+    delayed_count: int
+    avg_historical_lead_days: float | None
+    lead_time_days: float
+    eta_variance_days: float
+    impact_date: date | None
+    # Precomputed from the line's ETA revision log (app.services.eta).
+    eta_volatility_days: float = 0.0
+    eta_trend_days: float = 0.0
+    eta_shift_stddev_days: float = 0.0
+
+
+def _latest_inventory(db: Session, order_lines: list[models.OrderLine]) -> dict[tuple[str, str], models.SupplierInventorySnapshot]:
+    connector_ids = {line.supplier_id for line in order_lines}
+    skus = {line.supplier_sku for line in order_lines}
+    latest = (
+        db.query(
+            models.SupplierInventorySnapshot.connector_id.label("connector_id"),
+            models.SupplierInventorySnapshot.supplier_sku.label("supplier_sku"),
+            func.max(models.SupplierInventorySnapshot.source_timestamp).label("source_timestamp"),
+        )
         .filter(
-            models.SupplierInventorySnapshot.connector_id == order_line.supplier_id,
-            models.SupplierInventorySnapshot.supplier_sku == order_line.supplier_sku,
+            models.SupplierInventorySnapshot.connector_id.in_(connector_ids),
+            models.SupplierInventorySnapshot.supplier_sku.in_(skus),
         )
-        .order_by(models.SupplierInventorySnapshot.source_timestamp.desc())
-        .first()
+        .group_by(models.SupplierInventorySnapshot.connector_id, models.SupplierInventorySnapshot.supplier_sku)
+        .subquery()
+    )
+    snapshots = (
+        db.query(models.SupplierInventorySnapshot)
+        .join(
+            latest,
+            and_(
+                models.SupplierInventorySnapshot.connector_id == latest.c.connector_id,
+                models.SupplierInventorySnapshot.supplier_sku == latest.c.supplier_sku,
+                models.SupplierInventorySnapshot.source_timestamp == latest.c.source_timestamp,
+            ),
+        )
+        .all()
     )
+    return {(snapshot.connector_id, snapshot.supplier_sku): snapshot for snapshot in snapshots}
 
-    qty_available = latest_inventory.qty_available if latest_inventory else 0.0
-    remaining_qty = max(order_line.qty_ordered - order_line.qty_delivered, 0.0)
-    coverage_ratio = 1.0 if remaining_qty == 0 else qty_available / max(remaining_qty, 1.0)
-    inventory_component = clamp(1.0 - min(coverage_ratio, 1.0), 0.0, 1.0)
 
-    historical_orders = (
-        db.query(models.OrderLine)
+def _history_aggregates(db: Session, order_lines: list[models.OrderLine]) -> dict[tuple[str, str, str], tuple]:
+    positive_lead = models.OrderLine.lead_time_days > 0
+    rows = (
+        db.query(
+            models.OrderLine.tenant_id,
+            models.OrderLine.supplier_id,
+            models.OrderLine.supplier_sku,
+            func.count(models.OrderLine.id),
+            func.sum(case((models.OrderLine.status == "delayed", 1), else_=0)),
+            func.sum(case((positive_lead, models.OrderLine.lead_time_days), else_=0.0)),
+            func.sum(case((positive_lead, 1), else_=0)),
+        )
         .filter(
-            models.OrderLine.tenant_id == order_line.tenant_id,
-            models.OrderLine.supplier_id == order_line.supplier_id,
-            models.OrderLine.supplier_sku == order_line.supplier_sku,
-            models.OrderLine.status.in_(["delivered", "delayed"]),
-            models.OrderLine.id != order_line.id,
+            models.OrderLine.tenant_id.in_({line.tenant_id for line in order_lines}),
+            models.OrderLine.supplier_id.in_({line.supplier_id for line in order_lines}),
+            models.OrderLine.supplier_sku.in_({line.supplier_sku for line in order_lines}),
+            models.OrderLine.status.in_(HISTORY_STATUSES),
         )
+        .group_by(models.OrderLine.tenant_id, models.OrderLine.supplier_id, models.OrderLine.supplier_sku)
         .all()
     )
-    has_history = len(historical_orders) > 0
+    return {(row[0], row[1], row[2]): tuple(row[3:]) for row in rows}
+
+
+def candidate_line(line: models.OrderLine, supplier_id: str, supplier_sku: str) -> models.OrderLine:
+    """Transient copy of an order line re-pointed at another supplier/SKU; never added to a session."""
+    return models.OrderLine(
+        id=line.id,
+        tenant_id=line.tenant_id,
+        supplier_id=supplier_id,
+        supplier_order_id=line.supplier_order_id,
+        supplier_sku=supplier_sku,
+        qty_ordered=line.qty_ordered,
+        qty_delivered=line.qty_delivered,
+        status=line.status,
+        eta_variance_days=line.eta_variance_days,
+        lead_time_days=line.lead_time_days,
+        impact_date=line.impact_date,
+        eta_volatility_days=line.eta_volatility_days,
+        eta_trend_days=line.eta_trend_days,
+        eta_revision_count=line.eta_revision_count,
+        eta_shift_mean_days=line.eta_shift_mean_days,
+        eta_shift_m2=line.eta_shift_m2,
+    )
+
+
+def extract_features(db: Session, order_lines: list[models.OrderLine]) -> list[ScoringFeatures]:
+    """Load scoring inputs for a batch of order lines with a fixed number of queries."""
+    if not order_lines:
+        return []
+    inventory = _latest_inventory(db, order_lines)
+    history = _history_aggregates(db, order_lines)
+
+    features = []
+    for line in order_lines:
+        count, delayed, lead_sum, lead_count = history.get((line.tenant_id, line.supplier_id, line.supplier_sku), (0, 0, 0.0, 0))
+        # A line's own outcome is not part of its history.
+        if line.status in HISTORY_STATUSES:
+            count -= 1
+            delayed -= 1 if line.status == "delayed" else 0
+            if line.lead_time_days and line.lead_time_days > 0:
+                lead_sum -= line.lead_time_days
+                lead_count -= 1
+        snapshot = inventory.get((line.supplier_id, line.supplier_sku))
+        features.append(
+            ScoringFeatures(
+                order_line_id=line.id,
+                qty_available=snapshot.qty_available if snapshot else None,
+                inventory_source_timestamp=snapshot.source_timestamp if snapshot else None,
+                qty_ordered=line.qty_ordered,
+                qty_delivered=line.qty_delivered,
+                history_count=count,
+                delayed_count=delayed,
+                avg_historical_lead_days=lead_sum / lead_count if lead_count > 0 else None,
+                lead_time_days=line.lead_time_days,
+                eta_variance_days=line.eta_variance_days,
+                impact_date=line.impact_date,
+                eta_volatility_days=line.eta_volatility_days or 0.0,
+                eta_trend_days=line.eta_trend_days or 0.0,
+                eta_shift_stddev_days=eta_shift_stddev(line),
+            )
+        )
+    return features
+
+
+@dataclass
+class FeatureComponents:
+    remaining_qty: float
+    coverage_ratio: float
+    inventory_component: float
+    late_rate_component: float
+    lead_time_component: float
+    eta_volatility_component: float
+    staleness_hours: float | None
+
+
+def feature_components(features: ScoringFeatures, now: datetime, eta_revisions: bool = False) -> FeatureComponents:
+    """Numeric score inputs; ``eta_revisions`` adds the ETA revision statistics (``heuristic_v2``)."""
+    qty_available = features.qty_available if features.qty_available is not None else 0.0
+    remaining_qty = max(features.qty_ordered - features.qty_delivered, 0.0)
+    coverage_ratio = 1.0 if remaining_qty == 0 else qty_available / max(remaining_qty, 1.0)
+
+    late_rate_component = 0.0
+    lead_time_component = 0.0
+    if features.history_count > 0:
+        late_rate_component = features.delayed_count / features.history_count
+        avg_lead = features.avg_historical_lead_days
+        if avg_lead is not None and features.lead_time_days > 0:
+            lead_time_component = clamp((features.lead_time_days - avg_lead) / max(avg_lead, 1.0), 0.0, 1.0)
+        if eta_revisions:
+            # An ETA that keeps slipping is a lead-time uptrend on this line even when the quoted lead time is flat.
+            lead_time_component = max(lead_time_component, clamp(features.eta_trend_days / 7.0, 0.0, 1.0))
+
+    staleness_hours = None
+    if features.inventory_source_timestamp is not None:
+        staleness_hours = (now - features.inventory_source_timestamp).total_seconds() / 3600.0
+
+    eta_volatility_days = features.eta_variance_days
+    if eta_revisions:
+        # Supplier-reported variance, or the observed revision churn (recent-weighted or lifetime spread) when higher.
+        eta_volatility_days = max(eta_volatility_days, features.eta_volatility_days, features.eta_shift_stddev_days)
+
+    return FeatureComponents(
+        remaining_qty=remaining_qty,
+        coverage_ratio=coverage_ratio,
+        inventory_component=clamp(1.0 - min(coverage_ratio, 1.0), 0.0, 1.0),
+        late_rate_component=late_rate_component,
+        lead_time_component=lead_time_component,
+        eta_volatility_component=clamp(eta_volatility_days / 7.0, 0.0, 1.0),
+        staleness_hours=staleness_hours,
+    )
+
+
+def score_features(features: ScoringFeatures, now: datetime, eta_revisions: bool = False) -> ScoreResult:
+    components = feature_components(features, now, eta_revisions)
+    remaining_qty = components.remaining_qty
+    inventory_component = components.inventory_component
+    late_rate_component = components.late_rate_component
+    lead_time_component = components.lead_time_component
+    eta_volatility_component = components.eta_volatility_component
+    has_history = features.history_count > 0
 
     if has_history:
-        delayed_count = sum(1 for item in historical_orders if item.status == "delayed")
-        late_rate_component = delayed_count / len(historical_orders)
-        historical_lead = [item.lead_time_days for item in historical_orders if item.lead_time_days and item.lead_time_days > 0]
-        if historical_lead and order_line.lead_time_days > 0:
-            avg_lead = sum(historical_lead) / len(historical_lead)
-            lead_time_component = clamp((order_line.lead_time_days - avg_lead) / max(avg_lead, 1.0), 0.0, 1.0)
-        else:
-            lead_time_component = 0.0
         score = (
             0.45 * inventory_component
             + 0.25 * late_rate_component
-            + 0.20 * clamp(order_line.eta_variance_days / 7.0, 0.0, 1.0)
+            + 0.20 * eta_volatility_component
             + 0.10 * lead_time_component
         )
         confidence = 0.78
     else:
-        late_rate_component = 0.0
-        lead_time_component = 0.0
-        score = 0.70 * inventory_component + 0.30 * clamp(order_line.eta_variance_days / 7.0, 0.0, 1.0)
+        score = 0.70 * inventory_component + 0.30 * eta_volatility_component
         confidence = 0.45
 
-    stale_data = False
-    if not latest_inventory:
+    if components.staleness_hours is None:
         stale_data = True
     else:
-        age_hours = (now - latest_inventory.source_timestamp).total_seconds() / 3600.0
-        stale_data = age_hours > config.STALE_DATA_THRESHOLD_HOURS
+        stale_data = components.staleness_hours > config.STALE_DATA_THRESHOLD_HOURS
 
-    eta_volatility_component = clamp(order_line.eta_variance_days / 7.0, 0.0, 1.0)
     reason_codes: list[str] = []
     if inventory_component >= 0.45:
         reason_codes.append("LOW_STOCK")
@@ -118,7 +273,7 @@ def compute_order_risk(db: Session, order_line: models.OrderLine) -> ScoreResult
         reason_codes.append("LEAD_TIME_UPTREND")
     if not has_history:
         reason_codes.append("NO_HISTORY")
-    if order_line.qty_delivered > 0 and remaining_qty > 0:
+    if features.qty_delivered > 0 and remaining_qty > 0:
         reason_codes.append("PARTIAL_DELIVERY")
 
     if stale_data:
@@ -139,7 +294,7 @@ def compute_order_risk(db: Session, order_line: models.OrderLine) -> ScoreResult
 
     confidence = clamp(confidence, 0.2, 0.95)
     estimated_delay_days = int(math.ceil(score * 10)) if remaining_qty > 0 else 0
-    high_priority = risk_status == "red" and _impact_within_high_priority_window(order_line.impact_date, now)
+    high_priority = risk_status == "red" and _impact_within_high_priority_window(features.impact_date, now)
     return ScoreResult(
         risk_score=round(score, 4),
         risk_status=risk_status,
@@ -151,3 +306,23 @@ def compute_order_risk(db: Session, order_line: models.OrderLine) -> ScoreResult
         assessed_at=now,
     )
 
+
+class HeuristicV1Model:
+    version = "heuristic_v1"
+    eta_revisions = False
+
+    def score(self, features: Sequence[ScoringFeatures]) -> list[ScoreResult]:
+        now = utcnow()
+        return [score_features(item, now, self.eta_revisions) for item in features]
+
+
+class HeuristicV2Model(HeuristicV1Model):
+    """v1 plus the ETA revision statistics: slipping trend as lead-time uptrend, revision churn as volatility."""
+
+    version = "heuristic_v2"
+    eta_revisions = True
+
+
+def compute_order_risk(db: Session, order_line: models.OrderLine) -> ScoreResult:
+    """One-off score from the raw tables without touching the feature store; sync and rescore read the store."""
+    return HeuristicV1Model().score(extract_features(db, [order_line]))[0]
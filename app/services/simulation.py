@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from app import config, models, schemas
+from app.services import model_registry
+from app.services.features import load_features
+from app.services.scoring import OPEN_STATUSES, ScoringFeatures, candidate_line, extract_features
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _open_lines(db: Session, tenant_id: str, request: schemas.SimulationRequest) -> list[models.OrderLine]:
+    query = db.query(models.OrderLine).filter(
+        models.OrderLine.tenant_id == tenant_id,
+        models.OrderLine.status.in_(OPEN_STATUSES),
+    )
+    if request.project_id:
+        query = query.filter(models.OrderLine.project_id == request.project_id)
+    if request.order_line_ids:
+        query = query.filter(models.OrderLine.id.in_(request.order_line_ids))
+    lines = query.limit(config.SIMULATION_MAX_LINES + 1).all()
+    if len(lines) > config.SIMULATION_MAX_LINES:
+        raise ValueError(f"simulation is limited to {config.SIMULATION_MAX_LINES} order lines; narrow the scope")
+    return lines
+
+
+def _swapped_features(
+    db: Session,
+    tenant_id: str,
+    lines_by_id: dict[str, models.OrderLine],
+    swaps: dict[str, str],
+) -> dict[str, ScoringFeatures]:
+    if not swaps:
+        return {}
+    tenant_connectors = {
+        connector_id
+        for (connector_id,) in db.query(models.SupplierConnector.id)
+        .filter(models.SupplierConnector.tenant_id == tenant_id, models.SupplierConnector.id.in_(set(swaps.values())))
+        .all()
+    }
+    unknown = set(swaps.values()) - tenant_connectors
+    if unknown:
+        raise ValueError(f"unknown supplierId in supplierSwaps: {', '.join(sorted(unknown))}")
+
+    candidates = [
+        candidate_line(line, swaps[line_id], line.supplier_sku)
+        for line_id, line in lines_by_id.items()
+        if line_id in swaps
+    ]
+    return {item.order_line_id: item for item in extract_features(db, candidates)}
+
+
+def _status_counts(results) -> dict[str, int]:
+    counts = {"green": 0, "yellow": 0, "red": 0}
+    for result in results:
+        counts[result.risk_status] += 1
+    return counts
+
+
+def simulate(db: Session, tenant_id: str, request: schemas.SimulationRequest) -> dict[str, Any]:
+    """Re-score open lines under hypothetical inputs entirely in memory.
+
+    Nothing is written: stored feature vectors are read (or recomputed without persisting),
+    copied, overridden and scored with the tenant's model next to an unmodified baseline.
+    The heuristic has no ETA input, so an ETA slip (positive shift) is modeled as added ETA variance;
+    pulling an ETA earlier leaves the line unchanged. Supplier-level shifts follow a line to its swapped-in supplier.
+    """
+    lines = _open_lines(db, tenant_id, request)
+    lines_by_id = {line.id: line for line in lines}
+    baseline = load_features(db, lines, persist=False)
+
+    swaps = {swap.order_line_id: swap.supplier_id for swap in request.supplier_swaps if swap.order_line_id in lines_by_id}
+    swapped = _swapped_features(db, tenant_id, lines_by_id, swaps)
+    inventory = {(item.supplier_id, item.sku): item for item in request.inventory}
+    shift_by_line: dict[str, int] = {}
+    shift_by_supplier: dict[str, int] = {}
+    for shift in request.eta_shifts:
+        if shift.order_line_id:
+            shift_by_line[shift.order_line_id] = shift_by_line.get(shift.order_line_id, 0) + shift.days
+        else:
+            shift_by_supplier[shift.supplier_id] = shift_by_supplier.get(shift.supplier_id, 0) + shift.days
+
+    now = utcnow()
+    simulated: list[ScoringFeatures] = []
+    effective_suppliers: list[str] = []
+    for line, features in zip(lines, baseline):
+        supplier_id = swaps.get(line.id, line.supplier_id)
+        item = swapped.get(line.id, features)
+        override = inventory.get((supplier_id, line.supplier_sku))
+        if override is not None:
+            if override.qty_available is not None:
+                qty = override.qty_available
+            else:
+                qty = max((item.qty_available or 0.0) + override.qty_delta, 0.0)
+            item = replace(item, qty_available=qty, inventory_source_timestamp=now)
+        shift_days = shift_by_line.get(line.id, 0) + shift_by_supplier.get(supplier_id, 0)
+        if shift_days > 0:
+            item = replace(item, eta_variance_days=item.eta_variance_days + shift_days)
+        simulated.append(item)
+        effective_suppliers.append(supplier_id)
+
+    model = model_registry.model_for_tenant(tenant_id)
+    before = model.score(baseline)
+    after = model.score(simulated)
+
+    deltas = [
+        {
+            "orderLineId": line.id,
+            "supplierId": supplier_id,
+            "beforeStatus": old.risk_status,
+            "afterStatus": new.risk_status,
+            "beforeScore": old.risk_score,
+            "afterScore": new.risk_score,
+            "reasonCodes": new.reason_codes,
+        }
+        for line, supplier_id, old, new in zip(lines, effective_suppliers, before, after)
+        if old.risk_status != new.risk_status
+    ]
+    return {
+        "evaluated": len(lines),
+        "before": _status_counts(before),
+        "after": _status_counts(after),
+        "deltas": deltas,
+    }
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services import model_registry
+from app.services.scoring import candidate_line, extract_features
+
+SupplierSku = tuple[str, str]
+
+
+@dataclass
+class SubstitutionIndex:
+    """SKU equivalence classes keyed by tenant, held in memory for constant-time lookups."""
+
+    group_by_item: dict[tuple[str, str, str], str] = field(default_factory=dict)
+    members: dict[tuple[str, str], list[SupplierSku]] = field(default_factory=lambda: defaultdict(list))
+
+    def add(self, tenant_id: str, group_key: str, supplier_id: str, supplier_sku: str) -> None:
+        self.group_by_item[(tenant_id, supplier_id, supplier_sku)] = group_key
+        self.members[(tenant_id, group_key)].append((supplier_id, supplier_sku))
+
+    def equivalents(self, tenant_id: str, supplier_id: str, supplier_sku: str) -> list[SupplierSku]:
+        group_key = self.group_by_item.get((tenant_id, supplier_id, supplier_sku))
+        if group_key is None:
+            return []
+        return list(self.members[(tenant_id, group_key)])
+
+
+_index = SubstitutionIndex()
+
+
+def load_index(db: Session, tenant_ids: Iterable[str] | None = None) -> SubstitutionIndex:
+    """Rebuild the index from ``db``; with ``tenant_ids`` only those tenants are reloaded and the rest kept."""
+    global _index
+    index = SubstitutionIndex()
+    query = db.query(models.SkuSubstitution)
+    if tenant_ids is not None:
+        tenant_ids = set(tenant_ids)
+        for (tenant_id, supplier_id, supplier_sku), group_key in _index.group_by_item.items():
+            if tenant_id not in tenant_ids:
+                index.add(tenant_id, group_key, supplier_id, supplier_sku)
+        query = query.filter(models.SkuSubstitution.tenant_id.in_(tenant_ids))
+    for row in query.all():
+        index.add(row.tenant_id, row.group_key, row.supplier_id, row.supplier_sku)
+    _index = index
+    return index
+
+
+def get_index() -> SubstitutionIndex:
+    return _index
+
+
+def replace_group(db: Session, tenant_id: str, group_key: str, members: list[SupplierSku]) -> None:
+    db.query(models.SkuSubstitution).filter(
+        models.SkuSubstitution.tenant_id == tenant_id,
+        models.SkuSubstitution.group_key == group_key,
+    ).delete(synchronize_session=False)
+    for supplier_id, supplier_sku in members:
+        db.add(
+            models.SkuSubstitution(
+                tenant_id=tenant_id,
+                group_key=group_key,
+                supplier_id=supplier_id,
+                supplier_sku=supplier_sku,
+            )
+        )
+
+
+def _candidate_keys(db: Session, order_line: models.OrderLine) -> list[SupplierSku]:
+    """Mapped substitutes plus the same SKU at any other connector of the tenant."""
+    candidates = set(get_index().equivalents(order_line.tenant_id, order_line.supplier_id, order_line.supplier_sku))
+    other_connectors = (
+        db.query(models.SupplierConnector.id)
+        .filter(
+            models.SupplierConnector.tenant_id == order_line.tenant_id,
+            models.SupplierConnector.id != order_line.supplier_id,
+        )
+        .all()
+    )
+    candidates.update((connector_id, order_line.supplier_sku) for (connector_id,) in other_connectors)
+    candidates.discard((order_line.supplier_id, order_line.supplier_sku))
+    return sorted(candidates)
+
+
+def comparative_options(db: Session, order_line: models.OrderLine, limit: int = 5) -> list[dict[str, Any]]:
+    """Score every alternative supplier/SKU for a line in one batch, lowest risk first.
+
+    Alternatives without any inventory snapshot are dropped; they cannot be sourced from.
+    """
+    keys = _candidate_keys(db, order_line)
+    if not keys:
+        return []
+    candidates = [candidate_line(order_line, supplier_id, sku) for supplier_id, sku in keys]
+    features = extract_features(db, candidates)
+    scores = model_registry.model_for_tenant(order_line.tenant_id).score(features)
+    names = dict(
+        db.query(models.SupplierConnector.id, models.SupplierConnector.supplier_name)
+        .filter(models.SupplierConnector.id.in_({supplier_id for supplier_id, _ in keys}))
+        .all()
+    )
+
+    options = [
+        {
+            "supplierId": supplier_id,
+            "supplierName": names.get(supplier_id, supplier_id),
+            "supplierSku": sku,
+            "qtyAvailable": item.qty_available,
+            "riskScore": score.risk_score,
+            "riskStatus": score.risk_status,
+            "reasonCodes": score.reason_codes,
+        }
+        for (supplier_id, sku), item, score in zip(keys, features, scores)
+        if item.qty_available is not None
+    ]
+    options.sort(key=lambda option: (option["riskScore"], -(option["qtyAvailable"] or 0.0)))
+    return options[:limit]
@@ -2,30 +2,80 @@ from __future__ import annotations
 
 import hashlib
 import json
+import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, Iterator
 
+from sqlalchemy import insert, tuple_
 from sqlalchemy.orm import Session
 
-from app import database, models
+from app import config, models, sharding
+from app.services import model_registry
 from app.services.alerts import latest_risk_assessment, maybe_create_alert
-from app.services.scoring import compute_order_risk
+from app.services.eta import revise_eta
+from app.services.features import load_features
+from app.services.profiling import SyncProfiler
+from app.services.scoring import OPEN_STATUSES
+
+logger = logging.getLogger(__name__)
 
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
-def queue_sync_run(db: Session, connector_id: str, mode: str = "incremental") -> models.SyncRun:
-    run = models.SyncRun(connector_id=connector_id, mode=mode, status="queued")
+def queue_sync_run(db: Session, connector_id: str, mode: str = "incremental", profile: bool = False) -> models.SyncRun:
+    run = models.SyncRun(connector_id=connector_id, mode=mode, status="queued", profile=profile)
     db.add(run)
     db.commit()
     db.refresh(run)
     return run
 
 
-def _mock_supplier_payload(connector: models.SupplierConnector) -> dict[str, list[dict[str, Any]]]:
+# Providers receive the connector's sync cursor (None for a full pull) and return only records
+# with ``source_timestamp`` at or after it, like a supplier API's ``updated_since`` filter.
+PayloadProvider = Callable[[models.SupplierConnector, datetime | None], dict[str, list[dict[str, Any]]]]
+
+# supplier_name -> payload source; suppliers not listed use the built-in mocked payloads.
+_payload_providers: dict[str, PayloadProvider] = {}
+
+
+def register_payload_provider(supplier_name: str, provider: PayloadProvider) -> None:
+    _payload_providers[supplier_name] = provider
+
+
+def changed_since(payload: dict[str, list[dict[str, Any]]], since: datetime | None) -> dict[str, list[dict[str, Any]]]:
+    """Apply an ``updated_since`` cursor to a complete payload."""
+    if since is None:
+        return payload
+    return {
+        kind: [record for record in records if _record_timestamp(record) >= since]
+        for kind, records in payload.items()
+    }
+
+
+def _record_timestamp(record: dict[str, Any]) -> datetime:
+    try:
+        return _parse_datetime(record.get("source_timestamp"))
+    except (TypeError, ValueError):
+        # Keep unparseable records so validation rejects and counts them.
+        return datetime.max
+
+
+def _supplier_payload(connector: models.SupplierConnector, since: datetime | None) -> dict[str, list[dict[str, Any]]]:
+    provider = _payload_providers.get(connector.supplier_name, _mock_supplier_payload)
+    return provider(connector, since)
+
+
+def _mock_supplier_payload(connector: models.SupplierConnector, since: datetime | None = None) -> dict[str, list[dict[str, Any]]]:
+    return changed_since(_mock_supplier_records(connector), since)
+
+
+def _mock_supplier_records(connector: models.SupplierConnector) -> dict[str, list[dict[str, Any]]]:
     now = utcnow()
     source_ts = now - timedelta(hours=2)
     stale_ts = now - timedelta(hours=52)
@@ -151,9 +201,65 @@ def _validate_order_record(record: dict[str, Any]) -> None:
     _validate_source_timestamp(source_timestamp)
 
 
-def _upsert_inventory(db: Session, connector: models.SupplierConnector, payload: dict[str, Any]) -> None:
-    for record in payload["inventory"]:
-        _validate_inventory_record(record)
+SYNC_STAGES = ("fetch", "validate", "inventory", "orders", "reconcile", "scoring", "alerting", "commit")
+UPSERT_LOOKUP_CHUNK = 500
+
+
+@dataclass
+class SyncStats:
+    """Stage timings and record counts for one sync attempt."""
+
+    started: float = field(default_factory=time.perf_counter)
+    stage_ms: dict[str, float] = field(default_factory=lambda: dict.fromkeys(SYNC_STAGES, 0.0))
+    received: int = 0
+    unchanged: int = 0
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    missing: int = 0
+    bytes_fetched: int = 0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_ms[name] += (time.perf_counter() - started) * 1000
+
+    def apply_to(self, sync_run: models.SyncRun) -> None:
+        for name, elapsed in self.stage_ms.items():
+            setattr(sync_run, f"{name}_ms", round(elapsed, 3))
+        sync_run.records_received = self.received
+        sync_run.records_unchanged = self.unchanged
+        sync_run.records_inserted = self.inserted
+        sync_run.records_updated = self.updated
+        sync_run.records_rejected = self.rejected
+        sync_run.records_missing = self.missing
+        sync_run.bytes_fetched = self.bytes_fetched
+
+
+def _accepted_records(
+    records: list[dict[str, Any]],
+    validate: Callable[[dict[str, Any]], None],
+    connector: models.SupplierConnector,
+    stats: SyncStats,
+) -> list[dict[str, Any]]:
+    """Records that pass validation; invalid ones are counted as rejected and skipped."""
+    accepted = []
+    for record in records:
+        try:
+            validate(record)
+        except (ValueError, TypeError) as exc:
+            stats.rejected += 1
+            logger.warning("rejected supplier record connector=%s error=%s", connector.id, exc)
+            continue
+        accepted.append(record)
+    return accepted
+
+
+def _upsert_inventory(db: Session, connector: models.SupplierConnector, records: list[dict[str, Any]], stats: SyncStats) -> None:
+    for record in records:
         snapshot = models.SupplierInventorySnapshot(
             connector_id=connector.id,
             supplier_sku=record["sku"],
@@ -162,31 +268,54 @@ def _upsert_inventory(db: Session, connector: models.SupplierConnector, payload:
             raw_payload_ref=f"mock://{connector.supplier_name}/{record['sku']}",
         )
         db.add(snapshot)
+        stats.inserted += 1
 
 
-def _hash_record(record: dict[str, Any]) -> str:
+def hash_record(record: dict[str, Any]) -> str:
     encoded = json.dumps(record, sort_keys=True, separators=(",", ":")).encode("utf-8")
     return hashlib.sha256(encoded).hexdigest()
 
 
-def _upsert_orders(db: Session, connector: models.SupplierConnector, payload: dict[str, Any]) -> list[models.OrderLine]:
-    upserted: list[models.OrderLine] = []
-    for record in payload["orders"]:
-        _validate_order_record(record)
-        record_hash = _hash_record(record)
-        source_ts = _parse_datetime(record["source_timestamp"])
-        existing = (
+def _existing_lines(
+    db: Session,
+    connector: models.SupplierConnector,
+    records: list[dict[str, Any]],
+) -> dict[tuple[str, str], models.OrderLine]:
+    """Load the tenant's lines matching the payload keys in a few batched queries."""
+    keys = list({(record["supplier_order_id"], record["supplier_sku"]) for record in records})
+    existing: dict[tuple[str, str], models.OrderLine] = {}
+    for start in range(0, len(keys), UPSERT_LOOKUP_CHUNK):
+        chunk = keys[start : start + UPSERT_LOOKUP_CHUNK]
+        lines = (
             db.query(models.OrderLine)
             .filter(
                 models.OrderLine.tenant_id == connector.tenant_id,
-                models.OrderLine.supplier_order_id == record["supplier_order_id"],
-                models.OrderLine.supplier_sku == record["supplier_sku"],
+                tuple_(models.OrderLine.supplier_order_id, models.OrderLine.supplier_sku).in_(chunk),
             )
-            .first()
+            .all()
         )
+        existing.update(((line.supplier_order_id, line.supplier_sku), line) for line in lines)
+    return existing
+
+
+def _upsert_orders(
+    db: Session,
+    connector: models.SupplierConnector,
+    records: list[dict[str, Any]],
+    stats: SyncStats,
+) -> list[models.OrderLine]:
+    upserted: list[models.OrderLine] = []
+    revisions: list[dict[str, Any]] = []
+    existing_by_key = _existing_lines(db, connector, records)
+    for record in records:
+        record_hash = hash_record(record)
+        source_ts = _parse_datetime(record["source_timestamp"])
+        key = (record["supplier_order_id"], record["supplier_sku"])
+        existing = existing_by_key.get(key)
 
         if existing and existing.source_hash == record_hash and existing.source_timestamp == source_ts:
             upserted.append(existing)
+            stats.unchanged += 1
             continue
 
         if not existing:
@@ -200,6 +329,7 @@ def _upsert_orders(db: Session, connector: models.SupplierConnector, payload: di
                 eta_date=_parse_date(record.get("eta_date")),
                 impact_date=_parse_date(record.get("impact_date")),
                 status=record.get("status", "open"),
+                closed_at=None if record.get("status", "open") in OPEN_STATUSES else source_ts,
                 source_timestamp=source_ts,
                 source_hash=record_hash,
                 eta_variance_days=float(record.get("eta_variance_days", 0)),
@@ -207,57 +337,161 @@ def _upsert_orders(db: Session, connector: models.SupplierConnector, payload: di
                 last_synced_at=utcnow(),
             )
             db.add(existing)
+            existing_by_key[key] = existing
             upserted.append(existing)
+            stats.inserted += 1
             continue
 
         existing.qty_ordered = float(record["qty_ordered"])
         existing.qty_delivered = float(record.get("qty_delivered", existing.qty_delivered))
-        existing.eta_date = _parse_date(record.get("eta_date"))
+        revision = revise_eta(existing, _parse_date(record.get("eta_date")), source_ts)
+        if revision is not None:
+            revisions.append(revision)
         existing.impact_date = _parse_date(record.get("impact_date"))
-        existing.status = record.get("status", existing.status)
+        status = record.get("status", existing.status)
+        if existing.status in OPEN_STATUSES and status not in OPEN_STATUSES:
+            existing.closed_at = source_ts
+        existing.status = status
         existing.source_timestamp = source_ts
         existing.source_hash = record_hash
         existing.eta_variance_days = float(record.get("eta_variance_days", existing.eta_variance_days))
         existing.lead_time_days = float(record.get("lead_time_days", existing.lead_time_days))
         existing.last_synced_at = utcnow()
         upserted.append(existing)
+        stats.updated += 1
+    if revisions:
+        db.execute(insert(models.EtaRevision), revisions)
     return upserted
 
 
-def _apply_scoring_and_alerts(db: Session, order_lines: list[models.OrderLine]) -> list[str]:
-    impacted: list[str] = []
-    for order_line in order_lines:
-        if order_line.status not in {"open", "partially_delivered"}:
-            continue
+def _stock_affected_lines(
+    db: Session,
+    connector: models.SupplierConnector,
+    inventory: list[dict[str, Any]],
+    scored_ids: set[str],
+) -> list[models.OrderLine]:
+    """Open lines of the connector whose SKU got a new inventory snapshot but no order record this run."""
+    skus = list({record["sku"] for record in inventory})
+    affected: list[models.OrderLine] = []
+    for start in range(0, len(skus), UPSERT_LOOKUP_CHUNK):
+        lines = (
+            db.query(models.OrderLine)
+            .filter(
+                models.OrderLine.supplier_id == connector.id,
+                models.OrderLine.status.in_(OPEN_STATUSES),
+                models.OrderLine.supplier_sku.in_(skus[start : start + UPSERT_LOOKUP_CHUNK]),
+            )
+            .order_by(models.OrderLine.id)
+            .all()
+        )
+        affected.extend(line for line in lines if line.id not in scored_ids)
+    return affected
+
+
+def _score_lines(db: Session, tenant_id: str, open_lines: list[models.OrderLine]) -> tuple[list, list[str | None]]:
+    """Score open lines and stage their assessments; returns scores and each line's previous status."""
+    # Lines and SKUs this run touched are recomputed; the rest reuse their stored vectors.
+    features = load_features(db, open_lines)
+    model = model_registry.model_for_tenant(tenant_id)
+    scores = model.score(features)
+    shadow = model_registry.shadow_model_for_tenant(tenant_id)
+    if shadow is not None:
+        model_registry.shadow_score(shadow, features, scores)
+
+    previous_statuses: list[str | None] = []
+    for order_line, score in zip(open_lines, scores):
         previous = latest_risk_assessment(db, order_line.id)
-        previous_status = previous.risk_status if previous else None
-        score = compute_order_risk(db, order_line)
-
+        previous_statuses.append(previous.risk_status if previous else None)
         assessment = models.RiskAssessment(
             order_line_id=order_line.id,
-            model_version="heuristic_v1",
+            model_version=model.version,
             risk_score=score.risk_score,
             risk_status=score.risk_status,
             confidence=score.confidence,
-            reason_codes_json=json.dumps(score.reason_codes),
+            reason_codes=score.reason_codes,
             estimated_delay_days=score.estimated_delay_days,
             stale_data=score.stale_data,
             assessed_at=score.assessed_at,
         )
         db.add(assessment)
+    return scores, previous_statuses
+
+
+def _raise_alerts(db: Session, open_lines: list[models.OrderLine], scores: list, previous_statuses: list[str | None]) -> list[str]:
+    impacted: list[str] = []
+    for order_line, score, previous_status in zip(open_lines, scores, previous_statuses):
         alert = maybe_create_alert(db, order_line, score, previous_status)
         if alert:
             impacted.append(order_line.id)
     return impacted
 
 
-def _run_single_attempt(db: Session, connector: models.SupplierConnector, mode: str) -> list[str]:
-    payload = _mock_supplier_payload(connector)
-    _upsert_inventory(db, connector, payload)
-    order_lines = _upsert_orders(db, connector, payload)
-    # Ensure newly inserted order lines have primary keys before scoring/alerting.
-    db.flush()
-    impacted = _apply_scoring_and_alerts(db, order_lines)
+def _reconcile_missing(db: Session, connector: models.SupplierConnector, records: list[dict[str, Any]]) -> int:
+    """Flag open lines of the connector whose key is absent from a complete feed; unflag returning ones."""
+    feed_keys = {(record["supplier_order_id"], record["supplier_sku"]) for record in records}
+    stored = (
+        db.query(models.OrderLine.id, models.OrderLine.supplier_order_id, models.OrderLine.supplier_sku)
+        .filter(models.OrderLine.supplier_id == connector.id, models.OrderLine.status.in_(OPEN_STATUSES))
+        .all()
+    )
+    missing_ids = [line_id for line_id, order_id, sku in stored if (order_id, sku) not in feed_keys]
+    now = utcnow()
+    for start in range(0, len(missing_ids), UPSERT_LOOKUP_CHUNK):
+        db.query(models.OrderLine).filter(
+            models.OrderLine.id.in_(missing_ids[start : start + UPSERT_LOOKUP_CHUNK]),
+            models.OrderLine.missing_since.is_(None),
+        ).update({models.OrderLine.missing_since: now}, synchronize_session=False)
+    db.query(models.OrderLine).filter(
+        models.OrderLine.supplier_id == connector.id,
+        models.OrderLine.missing_since.is_not(None),
+        tuple_(models.OrderLine.supplier_order_id, models.OrderLine.supplier_sku).in_(feed_keys),
+    ).update({models.OrderLine.missing_since: None}, synchronize_session=False)
+    return len(missing_ids)
+
+
+def _advance_cursor(
+    db: Session,
+    connector: models.SupplierConnector,
+    cursor: models.SyncCursor | None,
+    records: list[dict[str, Any]],
+) -> None:
+    if not records:
+        return
+    watermark = max(_parse_datetime(record["source_timestamp"]) for record in records)
+    if cursor is None:
+        db.add(models.SyncCursor(connector_id=connector.id, watermark=watermark))
+    elif watermark > cursor.watermark:
+        cursor.watermark = watermark
+
+
+def _run_single_attempt(db: Session, connector: models.SupplierConnector, mode: str, stats: SyncStats) -> list[str]:
+    """Incremental runs resume from the connector's cursor; full runs pull everything and reconcile."""
+    cursor = db.get(models.SyncCursor, connector.id)
+    since = cursor.watermark if mode == "incremental" and cursor is not None else None
+    with stats.stage("fetch"):
+        payload = _supplier_payload(connector, since)
+        stats.bytes_fetched = len(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    with stats.stage("validate"):
+        stats.received = len(payload["inventory"]) + len(payload["orders"])
+        inventory = _accepted_records(payload["inventory"], _validate_inventory_record, connector, stats)
+        orders = _accepted_records(payload["orders"], _validate_order_record, connector, stats)
+    with stats.stage("inventory"):
+        _upsert_inventory(db, connector, inventory, stats)
+    with stats.stage("orders"):
+        order_lines = _upsert_orders(db, connector, orders, stats)
+        # Ensure newly inserted order lines have primary keys before scoring/alerting.
+        db.flush()
+    if mode == "full":
+        with stats.stage("reconcile"):
+            stats.missing = _reconcile_missing(db, connector, orders)
+    open_lines = [line for line in order_lines if line.status in OPEN_STATUSES]
+    # Incremental payloads may carry a stock change without its order records; those lines move too.
+    open_lines += _stock_affected_lines(db, connector, inventory, {line.id for line in open_lines})
+    with stats.stage("scoring"):
+        scores, previous_statuses = _score_lines(db, connector.tenant_id, open_lines)
+    with stats.stage("alerting"):
+        impacted = _raise_alerts(db, open_lines, scores, previous_statuses)
+    _advance_cursor(db, connector, cursor, inventory + orders)
     connector.status = "healthy"
     connector.last_sync_at = utcnow()
     connector.last_sync_error = None
@@ -265,8 +499,60 @@ def _run_single_attempt(db: Session, connector: models.SupplierConnector, mode:
     return impacted
 
 
-def run_sync_job(sync_run_id: str) -> None:
-    db = database.SessionLocal()
+def _finish_run(db: Session, sync_run: models.SyncRun, stats: SyncStats) -> None:
+    sync_run.completed_at = utcnow()
+    stats.apply_to(sync_run)
+    with stats.stage("commit"):
+        db.commit()
+    sync_run.commit_ms = round(stats.stage_ms["commit"], 3)
+    sync_run.duration_ms = round((time.perf_counter() - stats.started) * 1000, 3)
+    db.commit()
+
+
+def _run_attempts(db: Session, sync_run: models.SyncRun, connector: models.SupplierConnector) -> None:
+    sync_run_id = sync_run.id
+    started = time.perf_counter()
+    max_attempts = 3
+    for attempt in range(1, max_attempts + 1):
+        sync_run.attempts = attempt
+        sync_run.status = "running"
+        db.commit()
+        stats = SyncStats(started=started)
+        try:
+            impacted = _run_single_attempt(db, connector, sync_run.mode, stats)
+            sync_run.status = "success"
+            sync_run.error = None
+            sync_run.impacted_orders_json = json.dumps(impacted)
+            _finish_run(db, sync_run, stats)
+            return
+        except Exception as exc:  # noqa: BLE001
+            db.rollback()
+            sync_run = db.query(models.SyncRun).filter(models.SyncRun.id == sync_run_id).first()
+            connector = db.query(models.SupplierConnector).filter(models.SupplierConnector.id == sync_run.connector_id).first()
+            if not sync_run or not connector:
+                return
+            sync_run.attempts = attempt
+            sync_run.error = str(exc)
+            if attempt < max_attempts:
+                sync_run.status = "retrying"
+                db.commit()
+                time.sleep(0.25 * (2 ** (attempt - 1)))
+                continue
+            sync_run.status = "failed"
+            connector.status = "degraded"
+            connector.last_sync_error = str(exc)
+            connector.stale_since = utcnow()
+            _finish_run(db, sync_run, stats)
+            return
+
+
+def run_sync_job(sync_run_id: str, tenant_id: str | None = None) -> None:
+    """Run a queued sync; ``tenant_id`` picks the shard when sharding is on."""
+    with sharding.sync_slot(tenant_id):
+        _run_sync_job(sharding.session_for_tenant(tenant_id), sync_run_id)
+
+
+def _run_sync_job(db: Session, sync_run_id: str) -> None:
     try:
         sync_run = db.query(models.SyncRun).filter(models.SyncRun.id == sync_run_id).first()
         if not sync_run:
@@ -279,39 +565,56 @@ def run_sync_job(sync_run_id: str) -> None:
             db.commit()
             return
 
-        max_attempts = 3
-        for attempt in range(1, max_attempts + 1):
-            sync_run.attempts = attempt
-            sync_run.status = "running"
-            db.commit()
-            try:
-                impacted = _run_single_attempt(db, connector, sync_run.mode)
-                sync_run.status = "success"
-                sync_run.error = None
-                sync_run.impacted_orders_json = json.dumps(impacted)
-                sync_run.completed_at = utcnow()
-                db.commit()
-                return
-            except Exception as exc:  # noqa: BLE001
-                db.rollback()
-                sync_run = db.query(models.SyncRun).filter(models.SyncRun.id == sync_run_id).first()
-                connector = db.query(models.SupplierConnector).filter(models.SupplierConnector.id == sync_run.connector_id).first()
-                if not sync_run or not connector:
-                    return
-                sync_run.attempts = attempt
-                sync_run.error = str(exc)
-                if attempt < max_attempts:
-                    sync_run.status = "retrying"
-                    db.commit()
-                    time.sleep(0.25 * (2 ** (attempt - 1)))
-                    continue
-                sync_run.status = "failed"
-                sync_run.completed_at = utcnow()
-                connector.status = "degraded"
-                connector.last_sync_error = str(exc)
-                connector.stale_since = utcnow()
-                db.commit()
-                return
+        if not (sync_run.profile or connector.profile_syncs):
+            _run_attempts(db, sync_run, connector)
+            return
+
+        sync_run.profile = True
+        with SyncProfiler() as profiler:
+            _run_attempts(db, sync_run, connector)
+        db.add(
+            models.SyncRunProfile(
+                sync_run_id=sync_run_id,
+                collapsed_stacks=profiler.collapsed_stacks(),
+                pstats=profiler.pstats_bytes(),
+                sample_count=sum(profiler.samples.values()),
+            )
+        )
+        db.commit()
     finally:
         db.close()
 
+
+def queue_all_syncs(mode: str = "incremental", tenant_ids: list[str] | None = None) -> list[tuple[str, str]]:
+    """Queue a sync run for every connector (of ``tenant_ids``) on every shard; returns (sync_run_id, tenant_id) pairs."""
+    queued: list[tuple[str, str]] = []
+    for db in sharding.each_session():
+        query = db.query(models.SupplierConnector.id, models.SupplierConnector.tenant_id)
+        if tenant_ids:
+            query = query.filter(models.SupplierConnector.tenant_id.in_(tenant_ids))
+        for connector_id, tenant_id in query.order_by(models.SupplierConnector.tenant_id).all():
+            queued.append((queue_sync_run(db, connector_id, mode).id, tenant_id))
+    return queued
+
+
+def run_sync_jobs(jobs: list[tuple[str, str]], workers: int | None = None) -> None:
+    """Run queued syncs with one thread per shard: a shard's runs go in order, different shards in parallel.
+
+    Without sharding every tenant writes to the one shared database, so the runs go one after another.
+    """
+    by_shard: dict[str | None, list[tuple[str, str]]] = {}
+    for sync_run_id, tenant_id in jobs:
+        by_shard.setdefault(sharding.shard_key_for(tenant_id), []).append((sync_run_id, tenant_id))
+
+    def run_shard(shard_jobs: list[tuple[str, str]]) -> None:
+        for sync_run_id, tenant_id in shard_jobs:
+            run_sync_job(sync_run_id, tenant_id)
+
+    workers = min(workers or config.SYNC_ALL_WORKERS, len(by_shard))
+    if workers <= 1:
+        for shard_jobs in by_shard.values():
+            run_shard(shard_jobs)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-sync") as pool:
+        for future in [pool.submit(run_shard, shard_jobs) for shard_jobs in by_shard.values()]:
+            future.result()
@@ -0,0 +1,245 @@
+"""Bounded order line timeline read with one UNION ALL.
+
+Risk assessments, alerts and ETA revisions are each limited to the newest rows in their own
+indexed branch, merged, ordered and limited in SQL, so the cost of an order detail page does not
+grow with how long the line has been tracked. Older events are paged with a keyset cursor over
+``(timestamp, event_key)``. ``order_timelines`` serves many lines in one query: each branch keeps
+its newest rows per line with a window function, then the merged events are ranked per line again.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import Float, Integer, String, and_, cast, func, literal, null, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app import codes, models
+
+CURSOR_SEPARATOR = "|"
+
+
+@dataclass
+class OrderEvent:
+    event_type: str
+    timestamp: datetime
+    event_key: str
+    detail: str
+    risk_score: float | None = None
+    risk_status: str | None = None
+    confidence: float | None = None
+    reason_codes: list[str] | None = None
+    estimated_delay_days: int | None = None
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.timestamp.isoformat()}{CURSOR_SEPARATOR}{self.event_key}"
+
+
+@dataclass
+class OrderTimeline:
+    latest: OrderEvent | None
+    events: list[OrderEvent]
+    next_cursor: str | None
+
+
+def parse_cursor(raw: str) -> tuple[datetime, str]:
+    """Split a ``before`` cursor; raises ValueError when it was not produced by ``OrderEvent.cursor``."""
+    timestamp, separator, event_key = raw.partition(CURSOR_SEPARATOR)
+    if not separator or not event_key:
+        raise ValueError("malformed timeline cursor")
+    return datetime.fromisoformat(timestamp), event_key
+
+
+def _branch(
+    event_type: str,
+    timestamp,
+    key_prefix: str,
+    key_id,
+    order_line_id,
+    columns: dict,
+    where,
+    limit: int | None,
+    before,
+    current: int = 0,
+    per_line: bool = False,
+):
+    event_key = literal(key_prefix) + cast(key_id, String)
+    values = {
+        "risk_score": cast(null(), Float),
+        "status_code": cast(null(), Integer),
+        "confidence": cast(null(), Float),
+        "reason_mask": cast(null(), Integer),
+        "estimated_delay_days": cast(null(), Integer),
+        "detail": cast(null(), String),
+        **columns,
+    }
+    query = select(
+        order_line_id.label("order_line_id"),
+        literal(current).label("current"),
+        literal(event_type).label("event_type"),
+        timestamp.label("timestamp"),
+        event_key.label("event_key"),
+        *[expression.label(name) for name, expression in values.items()],
+    ).where(where)
+    if before is not None:
+        before_ts, before_key = before
+        query = query.where(or_(timestamp < before_ts, and_(timestamp == before_ts, event_key < before_key)))
+    if limit is None:
+        return query
+    ordering = (timestamp.desc(), event_key.desc())
+    if per_line:
+        # Bound every line's rows in this branch before the merge so deep histories never reach the outer rank.
+        rank = func.row_number().over(partition_by=order_line_id, order_by=ordering).label("branch_rank")
+        ranked = query.add_columns(rank).subquery()
+        return select(*[column for column in ranked.c if column.name != "branch_rank"]).where(ranked.c.branch_rank <= limit)
+    # Each branch is bounded on its own (index range scan) before the merge.
+    return select(query.order_by(*ordering).limit(limit).subquery())
+
+
+def _branches(line_filter, limit: int | None, before, include_latest: bool, per_line: bool = False) -> list:
+    """Assessment, alert and ETA revision branches; ``line_filter`` maps an order_line_id column to a WHERE clause."""
+    assessment = models.RiskAssessment
+    assessment_columns = {
+        "risk_score": assessment.risk_score,
+        "status_code": assessment.status_code,
+        "confidence": assessment.confidence,
+        "reason_mask": assessment.reason_mask,
+        "estimated_delay_days": assessment.estimated_delay_days,
+    }
+    revision = models.EtaRevision
+    revision_columns = {
+        "detail": literal("ETA moved from ")
+        + cast(revision.previous_eta, String)
+        + literal(" to ")
+        + cast(revision.eta_date, String),
+        "estimated_delay_days": revision.shift_days,
+    }
+    branches = [
+        _branch(
+            "risk_assessed",
+            assessment.assessed_at,
+            "r:",
+            assessment.id,
+            assessment.order_line_id,
+            assessment_columns,
+            line_filter(assessment.order_line_id),
+            limit,
+            before,
+            per_line=per_line,
+        ),
+        _branch(
+            "alert_created",
+            models.Alert.created_at,
+            "a:",
+            models.Alert.id,
+            models.Alert.order_line_id,
+            {"detail": models.Alert.message},
+            line_filter(models.Alert.order_line_id),
+            limit,
+            before,
+            per_line=per_line,
+        ),
+        _branch(
+            "eta_revised",
+            revision.recorded_at,
+            "e:",
+            revision.id,
+            revision.order_line_id,
+            revision_columns,
+            line_filter(revision.order_line_id),
+            limit,
+            before,
+            per_line=per_line,
+        ),
+    ]
+    if include_latest:
+        branches.append(
+            _branch(
+                "risk_assessed",
+                assessment.assessed_at,
+                "r:",
+                assessment.id,
+                assessment.order_line_id,
+                assessment_columns,
+                line_filter(assessment.order_line_id),
+                1 if limit is not None else None,
+                None,
+                current=1,
+                per_line=per_line,
+            )
+        )
+    return branches
+
+
+def order_timeline(db: Session, order_line_id: str, limit: int, before: tuple[datetime, str] | None = None) -> OrderTimeline:
+    """Latest assessment (first page only) plus the ``limit`` newest events older than ``before``."""
+    branches = _branches(lambda column: column == order_line_id, limit + 1, before, include_latest=before is None)
+    merged = union_all(*branches).subquery()
+    rows = db.execute(
+        select(merged)
+        .order_by(merged.c.current.desc(), merged.c.timestamp.desc(), merged.c.event_key.desc())
+        .limit(limit + 2)
+    ).all()
+    return _timeline(rows, limit)
+
+
+def order_timelines(db: Session, order_line_ids: list[str], limit: int) -> dict[str, OrderTimeline]:
+    """First timeline page for many lines at once: one query, ranked per line with ROW_NUMBER()."""
+    if not order_line_ids:
+        return {}
+    branches = _branches(lambda column: column.in_(order_line_ids), limit + 1, None, include_latest=True, per_line=True)
+    merged = union_all(*branches).subquery()
+    rank = (
+        func.row_number()
+        .over(
+            partition_by=(merged.c.order_line_id, merged.c.current),
+            order_by=(merged.c.timestamp.desc(), merged.c.event_key.desc()),
+        )
+        .label("rank")
+    )
+    ranked = select(merged, rank).subquery()
+    rows = db.execute(
+        select(ranked)
+        .where(or_(and_(ranked.c.current == 1, ranked.c.rank == 1), and_(ranked.c.current == 0, ranked.c.rank <= limit + 1)))
+        .order_by(ranked.c.order_line_id, ranked.c.current.desc(), ranked.c.timestamp.desc(), ranked.c.event_key.desc())
+    ).all()
+
+    by_line: dict[str, list] = {order_line_id: [] for order_line_id in order_line_ids}
+    for row in rows:
+        by_line[row.order_line_id].append(row)
+    return {order_line_id: _timeline(line_rows, limit) for order_line_id, line_rows in by_line.items()}
+
+
+def _timeline(rows: list, limit: int) -> OrderTimeline:
+    latest = None
+    if rows and rows[0].current:
+        latest = _event(rows[0])
+        rows = rows[1:]
+    events = [_event(row) for row in rows[:limit]]
+    next_cursor = events[-1].cursor if len(rows) > limit else None
+    return OrderTimeline(latest=latest, events=events, next_cursor=next_cursor)
+
+
+def _event(row) -> OrderEvent:
+    if row.event_type != "risk_assessed":
+        return OrderEvent(
+            event_type=row.event_type,
+            timestamp=row.timestamp,
+            event_key=row.event_key,
+            detail=row.detail,
+            estimated_delay_days=row.estimated_delay_days,
+        )
+    status = codes.decode_status(row.status_code)
+    return OrderEvent(
+        event_type=row.event_type,
+        timestamp=row.timestamp,
+        event_key=row.event_key,
+        detail=f"{status.upper()} ({row.risk_score:.2f})",
+        risk_score=row.risk_score,
+        risk_status=status,
+        confidence=row.confidence,
+        reason_codes=list(codes.decode_reason_codes(row.reason_mask)),
+        estimated_delay_days=row.estimated_delay_days,
+    )
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app import config, models
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+    pq = None
+
+WATERMARK_NAME = "alert_feedback_training"
+FINAL_OUTCOMES = {"delivered", "delayed"}
+BATCH_SIZE = 5000
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class TrainingExportResult:
+    rows: int = 0
+    files: list[Path] = field(default_factory=list)
+    watermark: datetime | None = None
+
+
+def _training_schema() -> "pa.Schema":
+    return pa.schema(
+        [
+            ("feedback_id", pa.string()),
+            ("feedback_created_at", pa.timestamp("us")),
+            ("disposition", pa.string()),
+            ("model_version", pa.string()),
+            ("alert_id", pa.string()),
+            ("alert_severity", pa.string()),
+            ("alert_created_at", pa.timestamp("us")),
+            ("tenant_id", pa.string()),
+            ("order_line_id", pa.string()),
+            ("supplier_id", pa.string()),
+            ("supplier_sku", pa.string()),
+            ("qty_ordered", pa.float64()),
+            ("qty_delivered", pa.float64()),
+            ("eta_variance_days", pa.float64()),
+            ("eta_revision_count", pa.int32()),
+            ("eta_volatility_days", pa.float64()),
+            ("eta_trend_days", pa.float64()),
+            ("lead_time_days", pa.float64()),
+            ("eta_date", pa.date32()),
+            ("impact_date", pa.date32()),
+            ("assessed_at", pa.timestamp("us")),
+            ("risk_score", pa.float64()),
+            ("risk_status", pa.string()),
+            ("confidence", pa.float64()),
+            ("reason_mask", pa.int64()),
+            ("reason_codes", pa.list_(pa.string())),
+            ("estimated_delay_days", pa.int32()),
+            ("stale_data", pa.bool_()),
+            ("outcome_status", pa.string()),
+            ("outcome_final", pa.bool_()),
+            ("actual_delay_days", pa.int32()),
+        ]
+    )
+
+
+def _get_watermark(db: Session) -> models.ExportWatermark:
+    watermark = db.get(models.ExportWatermark, WATERMARK_NAME)
+    if watermark is None:
+        watermark = models.ExportWatermark(name=WATERMARK_NAME)
+        db.add(watermark)
+    return watermark
+
+
+def _feedback_batch(
+    db: Session,
+    watermark: models.ExportWatermark,
+    limit: int,
+    settled_before: datetime,
+) -> list[models.AlertFeedback]:
+    # created_at is stamped before commit, so a slow transaction can commit a row older than the newest
+    # visible one; only rows past the settle window are exported, so none lands behind the watermark.
+    query = db.query(models.AlertFeedback).filter(models.AlertFeedback.created_at <= settled_before)
+    if watermark.last_created_at is not None:
+        query = query.filter(
+            or_(
+                models.AlertFeedback.created_at > watermark.last_created_at,
+                and_(
+                    models.AlertFeedback.created_at == watermark.last_created_at,
+                    models.AlertFeedback.id > watermark.last_id,
+                ),
+            )
+        )
+    return query.order_by(models.AlertFeedback.created_at, models.AlertFeedback.id).limit(limit).all()
+
+
+def _assessments_at_alert_time(db: Session, alert_ids: list[str]) -> dict[str, models.RiskAssessment]:
+    """Latest assessment per alert whose assessed_at is not after the alert was raised."""
+    in_effect = (
+        db.query(
+            models.Alert.id.label("alert_id"),
+            models.Alert.order_line_id.label("order_line_id"),
+            func.max(models.RiskAssessment.assessed_at).label("assessed_at"),
+        )
+        .join(
+            models.RiskAssessment,
+            and_(
+                models.RiskAssessment.order_line_id == models.Alert.order_line_id,
+                models.RiskAssessment.assessed_at <= models.Alert.created_at,
+            ),
+        )
+        .filter(models.Alert.id.in_(alert_ids))
+        .group_by(models.Alert.id, models.Alert.order_line_id)
+        .subquery()
+    )
+    rows = (
+        db.query(in_effect.c.alert_id, models.RiskAssessment)
+        .join(
+            models.RiskAssessment,
+            and_(
+                models.RiskAssessment.order_line_id == in_effect.c.order_line_id,
+                models.RiskAssessment.assessed_at == in_effect.c.assessed_at,
+            ),
+        )
+        .all()
+    )
+    return {alert_id: assessment for alert_id, assessment in rows}
+
+
+def _actual_delay_days(order_line: models.OrderLine) -> int | None:
+    # The feed has no delivery date; closed_at is the supplier timestamp of the terminal status.
+    if order_line.status not in FINAL_OUTCOMES or order_line.eta_date is None or order_line.closed_at is None:
+        return None
+    return max((order_line.closed_at.date() - order_line.eta_date).days, 0)
+
+
+def _training_row(
+    feedback: models.AlertFeedback,
+    alert: models.Alert,
+    order_line: models.OrderLine,
+    assessment: models.RiskAssessment | None,
+) -> dict[str, Any]:
+    return {
+        "feedback_id": feedback.id,
+        "feedback_created_at": feedback.created_at,
+        "disposition": feedback.disposition,
+        "model_version": feedback.model_version,
+        "alert_id": alert.id,
+        "alert_severity": alert.severity,
+        "alert_created_at": alert.created_at,
+        "tenant_id": order_line.tenant_id,
+        "order_line_id": order_line.id,
+        "supplier_id": order_line.supplier_id,
+        "supplier_sku": order_line.supplier_sku,
+        "qty_ordered": order_line.qty_ordered,
+        "qty_delivered": order_line.qty_delivered,
+        "eta_variance_days": order_line.eta_variance_days,
+        "eta_revision_count": order_line.eta_revision_count,
+        "eta_volatility_days": order_line.eta_volatility_days,
+        "eta_trend_days": order_line.eta_trend_days,
+        "lead_time_days": order_line.lead_time_days,
+        "eta_date": order_line.eta_date,
+        "impact_date": order_line.impact_date,
+        "assessed_at": assessment.assessed_at if assessment else None,
+        "risk_score": assessment.risk_score if assessment else None,
+        "risk_status": assessment.risk_status if assessment else None,
+        "confidence": assessment.confidence if assessment else None,
+        "reason_mask": assessment.reason_mask if assessment else None,
+        "reason_codes": assessment.reason_codes if assessment else None,
+        "estimated_delay_days": assessment.estimated_delay_days if assessment else None,
+        "stale_data": assessment.stale_data if assessment else None,
+        "outcome_status": order_line.status,
+        "outcome_final": order_line.status in FINAL_OUTCOMES,
+        "actual_delay_days": _actual_delay_days(order_line),
+    }
+
+
+def _write_partitions(output_dir: Path, rows: list[dict[str, Any]], schema: "pa.Schema") -> list[Path]:
+    by_date: dict[date, list[dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        by_date[row["feedback_created_at"].date()].append(row)
+
+    # Named after the batch's first (created_at, id): a batch re-exported after a crash before the
+    # watermark commit starts at the same row and overwrites its earlier files instead of duplicating them.
+    first = rows[0]
+    part_name = f"part-{first['feedback_created_at']:%Y%m%dT%H%M%S%f}-{first['feedback_id']}.parquet"
+    written: list[Path] = []
+    for partition_date, partition_rows in sorted(by_date.items()):
+        partition_dir = output_dir / f"feedback_date={partition_date.isoformat()}"
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        path = partition_dir / part_name
+        staging = path.with_name(path.name + ".tmp")
+        pq.write_table(pa.Table.from_pylist(partition_rows, schema=schema), staging)
+        os.replace(staging, path)
+        written.append(path)
+    return written
+
+
+def export_training_dataset(
+    db: Session,
+    output_dir: Path,
+    batch_size: int = BATCH_SIZE,
+    now: datetime | None = None,
+) -> TrainingExportResult:
+    """Append feedback received since the last run to date-partitioned Parquet files.
+
+    Each row joins the feedback with the assessment in effect when the alert fired and the
+    order line's current outcome. Feedback younger than ``config.TRAINING_EXPORT_SETTLE_WINDOW``
+    waits for the next run. The watermark advances after every written batch and part files are
+    named after the batch's first row, so an interrupted run resumes without duplicating rows.
+    """
+    if pq is None:
+        raise RuntimeError("training dataset export requires pyarrow")
+
+    schema = _training_schema()
+    result = TrainingExportResult()
+    settled_before = (now or utcnow()) - config.TRAINING_EXPORT_SETTLE_WINDOW
+    watermark = _get_watermark(db)
+    while True:
+        feedback_rows = _feedback_batch(db, watermark, batch_size, settled_before)
+        if not feedback_rows:
+            break
+
+        alert_ids = list({feedback.alert_id for feedback in feedback_rows})
+        alerts = {
+            alert.id: alert for alert in db.query(models.Alert).filter(models.Alert.id.in_(alert_ids)).all()
+        }
+        order_line_ids = list({alert.order_line_id for alert in alerts.values()})
+        order_lines = {
+            line.id: line for line in db.query(models.OrderLine).filter(models.OrderLine.id.in_(order_line_ids)).all()
+        }
+        assessments = _assessments_at_alert_time(db, alert_ids)
+
+        rows = []
+        for feedback in feedback_rows:
+            alert = alerts[feedback.alert_id]
+            rows.append(_training_row(feedback, alert, order_lines[alert.order_line_id], assessments.get(alert.id)))
+
+        result.files.extend(_write_partitions(output_dir, rows, schema))
+        result.rows += len(rows)
+        watermark.last_created_at = feedback_rows[-1].created_at
+        watermark.last_id = feedback_rows[-1].id
+        db.commit()
+        db.expunge_all()
+        watermark = _get_watermark(db)
+
+    result.watermark = watermark.last_created_at
+    db.commit()
+    return result
@@ -0,0 +1,276 @@
+"""Optional per-tenant SQLite shards behind a tenant router.
+
+With ``SHARD_DIRECTORY`` set, tenant data lives in ``<directory>/<shard>.db`` instead of the shared
+``DATABASE_URL`` database. A shard is one tenant (``tenant-<id>``) or, with ``SHARD_BUCKETS`` > 0, a
+CRC32 hash bucket of tenants (``bucket-0007``). Every query still filters on ``tenant_id``, so
+tenants that share a bucket stay isolated. Engines are opened on first use, created and migrated
+once per process, and kept in a bounded LRU; the least recently used engine is disposed when the
+cache is full. Every file has the full schema; the training export keeps one watermark per shard,
+next to the feedback it tracks.
+
+``migrate_tenants`` copies tenants out of the shared database and ``rebalance`` moves every tenant
+whose shard file no longer matches the router (e.g. after changing the bucket count).
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import closing, nullcontext
+from pathlib import Path
+from typing import ContextManager, Iterator
+
+from sqlalchemy import Integer, delete, event, insert, select, union
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.schema import Table
+
+from app import config, database, migrations
+
+SHARD_SUFFIX = ".db"
+SQLITE_BUSY_TIMEOUT_MS = 30000
+COPY_BATCH_SIZE = 5000
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def get_shard_directory() -> str | None:
+    return os.getenv("SHARD_DIRECTORY") or None
+
+
+def get_shard_buckets() -> int:
+    return int(os.getenv("SHARD_BUCKETS", config.SHARD_BUCKETS))
+
+
+class ShardRouter:
+    """Maps tenants to shard files and hands out sessions from a bounded LRU of engines."""
+
+    def __init__(self, directory: Path, buckets: int = 0, cache_size: int | None = None) -> None:
+        self.directory = Path(directory)
+        self.buckets = buckets
+        self.cache_size = cache_size or config.SHARD_ENGINE_CACHE_SIZE
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._engines: OrderedDict[str, _Shard] = OrderedDict()
+        self._prepared: set[str] = set()
+        self._sync_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def shard_key(self, tenant_id: str) -> str:
+        if self.buckets > 0:
+            return f"bucket-{zlib.crc32(tenant_id.encode('utf-8')) % self.buckets:04d}"
+        # Distinct ids that sanitize to the same name share a file, which tenant filters tolerate.
+        return f"tenant-{_UNSAFE_FILENAME.sub('_', tenant_id)}"
+
+    def shard_url(self, key: str) -> str:
+        return f"sqlite:///{self.directory / (key + SHARD_SUFFIX)}"
+
+    def shard_keys(self) -> list[str]:
+        """Shards that exist on disk."""
+        return sorted(path.stem for path in self.directory.glob(f"*{SHARD_SUFFIX}"))
+
+    def engine(self, key: str) -> Engine:
+        return self._open(key).engine
+
+    def session_for_key(self, key: str, read_only: bool = False) -> Session:
+        shard = self._open(key)
+        return shard.read_sessions() if read_only else shard.sessions()
+
+    def session(self, tenant_id: str, read_only: bool = False) -> Session:
+        return self.session_for_key(self.shard_key(tenant_id), read_only)
+
+    def sync_lock(self, key: str) -> threading.Lock:
+        """One writer per shard file: syncs of the same shard queue here, other shards run alongside."""
+        with self._lock:
+            return self._sync_locks.setdefault(key, threading.Lock())
+
+    def _open(self, key: str) -> _Shard:
+        with self._lock:
+            cached = self._engines.get(key)
+            if cached is not None:
+                self._engines.move_to_end(key)
+                return cached
+            url = self.shard_url(key)
+            engine = _with_busy_timeout(database.build_primary_engine(url))
+            if key not in self._prepared:
+                database.Base.metadata.create_all(bind=engine)
+                migrations.run_migrations(engine)
+                self._prepared.add(key)
+            cached = _Shard(engine, _with_busy_timeout(database.build_read_engine(url)))
+            self._engines[key] = cached
+            while len(self._engines) > self.cache_size:
+                # Sessions still holding a connection of the evicted engines finish normally.
+                _, evicted = self._engines.popitem(last=False)
+                evicted.dispose()
+            return cached
+
+    def dispose(self) -> None:
+        with self._lock:
+            for shard in self._engines.values():
+                shard.dispose()
+            self._engines.clear()
+
+
+class _Shard:
+    """A shard's primary engine and its read-only WAL pool on the same file."""
+
+    def __init__(self, engine: Engine, read_engine: Engine) -> None:
+        self.engine = engine
+        self.read_engine = read_engine
+        self.sessions = database.session_factory(engine)
+        self.read_sessions = database.session_factory(read_engine)
+
+    def dispose(self) -> None:
+        self.engine.dispose()
+        self.read_engine.dispose()
+
+
+def _with_busy_timeout(engine: Engine) -> Engine:
+    @event.listens_for(engine, "connect")
+    def _busy_timeout(dbapi_connection, connection_record) -> None:
+        # Requests and a shard's sync share the file; wait for its write lock instead of failing.
+        dbapi_connection.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+
+    return engine
+
+
+router: ShardRouter | None = None
+
+
+def configure(directory: str | Path | None, buckets: int | None = None, cache_size: int | None = None) -> ShardRouter | None:
+    """Switch sharding on (``directory``) or off (``None``); any previous router's engines are disposed."""
+    global router
+    if router is not None:
+        router.dispose()
+    router = None
+    if directory:
+        router = ShardRouter(Path(directory), get_shard_buckets() if buckets is None else buckets, cache_size)
+    return router
+
+
+configure(get_shard_directory())
+
+
+def session_for_tenant(tenant_id: str | None, read_only: bool = False) -> Session:
+    """Session on the tenant's shard, or on the shared database when sharding is off.
+
+    ``read_only`` sessions come from the read pool (replica or query-only WAL connections).
+    """
+    if router is None or tenant_id is None:
+        return database.ReadSessionLocal() if read_only else database.SessionLocal()
+    return router.session(tenant_id, read_only)
+
+
+def sync_slot(tenant_id: str | None) -> ContextManager:
+    if router is None or tenant_id is None:
+        return nullcontext()
+    return router.sync_lock(router.shard_key(tenant_id))
+
+
+def shard_key_for(tenant_id: str) -> str | None:
+    return router.shard_key(tenant_id) if router is not None else None
+
+
+def each_session() -> Iterator[Session]:
+    """One session per shard on disk, or a single shared-database session when sharding is off."""
+    if router is None:
+        with closing(database.SessionLocal()) as db:
+            yield db
+        return
+    for key in router.shard_keys():
+        with closing(router.session_for_key(key)) as db:
+            yield db
+
+
+def tenant_tables() -> list[Table]:
+    """Tenant-scoped tables in dependency order (parents first)."""
+    return [table for table in database.Base.metadata.sorted_tables if _tenant_filter(table, "") is not None]
+
+
+def _tenant_filter(table: Table, tenant_id: str):
+    """WHERE clause selecting the tenant's rows: ``tenant_id`` itself, or via the parent a foreign key points at."""
+    if "tenant_id" in table.c:
+        return table.c.tenant_id == tenant_id
+    for foreign_key in table.foreign_keys:
+        parent_filter = _tenant_filter(foreign_key.column.table, tenant_id)
+        if parent_filter is not None:
+            return foreign_key.parent.in_(select(foreign_key.column).where(parent_filter))
+    return None
+
+
+def _surrogate_key(table: Table):
+    """Integer autoincrement primary key, reassigned on copy so tenants merged into one shard never collide."""
+    primary = list(table.primary_key.columns)
+    if len(primary) == 1 and isinstance(primary[0].type, Integer) and primary[0].autoincrement in (True, "auto"):
+        return primary[0]
+    return None
+
+
+def tenant_ids(db: Session | Connection) -> list[str]:
+    """Every tenant with at least one row in the database (UNION drops the duplicates)."""
+    selects = [select(table.c.tenant_id) for table in tenant_tables() if "tenant_id" in table.c]
+    return sorted(tenant_id for (tenant_id,) in db.execute(union(*selects)).all())
+
+
+def _delete_tenant(conn: Connection, tenant_id: str) -> None:
+    for table in reversed(tenant_tables()):
+        conn.execute(delete(table).where(_tenant_filter(table, tenant_id)))
+
+
+def copy_tenant(source: Engine, target: Engine, tenant_id: str, batch_size: int = COPY_BATCH_SIZE) -> int:
+    """Replace the tenant's rows in ``target`` with those in ``source`` in one target transaction; returns rows copied."""
+    copied = 0
+    with source.connect() as reader, target.begin() as writer:
+        _delete_tenant(writer, tenant_id)
+        for table in tenant_tables():
+            surrogate = _surrogate_key(table)
+            columns = [column for column in table.columns if column is not surrogate]
+            query = select(*columns).where(_tenant_filter(table, tenant_id)).order_by(*table.primary_key.columns)
+            result = reader.execution_options(yield_per=batch_size).execute(query)
+            for rows in result.partitions():
+                writer.execute(insert(table), [row._asdict() for row in rows])
+                copied += len(rows)
+    return copied
+
+
+def delete_tenant(engine: Engine, tenant_id: str) -> None:
+    with engine.begin() as conn:
+        _delete_tenant(conn, tenant_id)
+
+
+def migrate_tenants(
+    source: Engine,
+    shard_router: ShardRouter,
+    tenants: list[str] | None = None,
+    purge_source: bool = False,
+) -> dict[str, int]:
+    """Copy tenants from a shared database into their shards; rerunning replaces the shard copy."""
+    if tenants is None:
+        with source.connect() as conn:
+            tenants = tenant_ids(conn)
+    copied: dict[str, int] = {}
+    for tenant_id in tenants:
+        copied[tenant_id] = copy_tenant(source, shard_router.engine(shard_router.shard_key(tenant_id)), tenant_id)
+        if purge_source:
+            delete_tenant(source, tenant_id)
+    return copied
+
+
+def rebalance(shard_router: ShardRouter) -> dict[str, tuple[str, str]]:
+    """Move every tenant found in a shard other than the one the router assigns it; returns tenant -> (from, to).
+
+    The target commits before the source rows are deleted, so an interrupted rebalance is finished by running it
+    again. Shards left empty stay on disk.
+    """
+    moved: dict[str, tuple[str, str]] = {}
+    for key in shard_router.shard_keys():
+        source = shard_router.engine(key)
+        with source.connect() as conn:
+            misplaced = [tenant_id for tenant_id in tenant_ids(conn) if shard_router.shard_key(tenant_id) != key]
+        for tenant_id in misplaced:
+            target_key = shard_router.shard_key(tenant_id)
+            copy_tenant(source, shard_router.engine(target_key), tenant_id)
+            delete_tenant(source, tenant_id)
+            moved[tenant_id] = (key, target_key)
+    return moved
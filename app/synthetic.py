@@ -0,0 +1,287 @@
+"""Synthetic tenant generator for benchmarks and load tests.
+
+Rows are bulk inserted, so tens of thousands of order lines take seconds. Open order lines are
+also kept as supplier payload records (with matching ``source_hash``) and served through a sync
+payload provider, so a sync against a synthetic connector behaves like a real re-poll.
+"""
+
+from __future__ import annotations
+
+import random
+import uuid
+from contextlib import closing, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, ContextManager
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import codes, models, sharding
+from app.services.sync import changed_since, hash_record, register_payload_provider
+
+INSERT_CHUNK_ROWS = 5000
+
+# Latest-assessment mix; reason codes are drawn to match the status.
+_STATUS_WEIGHTS = {"green": 0.7, "yellow": 0.2, "red": 0.1}
+_REASONS_BY_STATUS = {
+    "green": [[], ["ETA_VOLATILITY"]],
+    "yellow": [["ETA_VOLATILITY"], ["SUPPLIER_LATE_HISTORY"], ["STALE_DATA"], ["PARTIAL_DELIVERY"]],
+    "red": [["LOW_STOCK"], ["LOW_STOCK", "ETA_VOLATILITY"], ["SUPPLIER_LATE_HISTORY", "LEAD_TIME_UPTREND"]],
+}
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class SyntheticSpec:
+    tenants: int = 1
+    connectors_per_tenant: int = 2
+    projects_per_tenant: int = 3
+    skus_per_connector: int = 200
+    open_lines_per_tenant: int = 5000
+    # Closed (delivered/delayed) lines per SKU, used by the history features.
+    history_depth: int = 3
+    # Stored risk assessments per open line; the newest one drives lists and alerts.
+    assessment_depth: int = 3
+    seed: int = 42
+    tenant_prefix: str = "synthetic"
+
+
+@dataclass
+class SyntheticDataset:
+    spec: SyntheticSpec
+    tenant_ids: list[str] = field(default_factory=list)
+    connector_ids: dict[str, list[str]] = field(default_factory=dict)
+    open_line_ids: dict[str, list[str]] = field(default_factory=dict)
+    payloads: dict[str, dict[str, list[dict[str, Any]]]] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+
+    def payload_for(
+        self, connector: models.SupplierConnector, since: datetime | None = None
+    ) -> dict[str, list[dict[str, Any]]]:
+        return changed_since(self.payloads.get(connector.id, {"inventory": [], "orders": []}), since)
+
+
+def _bulk_insert(db: Session, model: type, rows: list[dict[str, Any]]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        db.execute(insert(model), rows[start : start + INSERT_CHUNK_ROWS])
+
+
+def _parse_date(raw: str):
+    return datetime.fromisoformat(raw).date()
+
+
+def _order_record(rng: random.Random, now: datetime, order_id: str, sku: str) -> dict[str, Any]:
+    qty_ordered = float(rng.randint(10, 400))
+    partially = rng.random() < 0.15
+    eta = now.date() + timedelta(days=rng.randint(-3, 30))
+    return {
+        "external_order_line_id": f"{order_id}-L1",
+        "supplier_order_id": order_id,
+        "supplier_sku": sku,
+        "qty_ordered": qty_ordered,
+        "qty_delivered": float(rng.randint(1, int(qty_ordered) - 1)) if partially else 0.0,
+        "eta_date": eta.isoformat(),
+        "impact_date": (eta + timedelta(days=rng.randint(0, 5))).isoformat(),
+        "status": "partially_delivered" if partially else "open",
+        "eta_variance_days": round(rng.uniform(0, 6), 1),
+        "lead_time_days": round(rng.uniform(2, 20), 1),
+        "source_timestamp": (now - timedelta(hours=rng.uniform(0, 60))).isoformat(),
+    }
+
+
+def _order_row(tenant_id: str, connector_id: str, project_id: str, record: dict[str, Any], now: datetime) -> dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "tenant_id": tenant_id,
+        "project_id": project_id,
+        "supplier_id": connector_id,
+        "supplier_order_id": record["supplier_order_id"],
+        "supplier_sku": record["supplier_sku"],
+        "qty_ordered": record["qty_ordered"],
+        "qty_delivered": record["qty_delivered"],
+        "eta_date": _parse_date(record["eta_date"]),
+        "impact_date": _parse_date(record["impact_date"]),
+        "status": record["status"],
+        "source_timestamp": datetime.fromisoformat(record["source_timestamp"]),
+        "source_hash": hash_record(record),
+        "eta_variance_days": record["eta_variance_days"],
+        "lead_time_days": record["lead_time_days"],
+        "last_synced_at": now,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _history_rows(
+    rng: random.Random,
+    tenant_id: str,
+    connector_id: str,
+    skus: list[str],
+    depth: int,
+    now: datetime,
+) -> list[dict[str, Any]]:
+    rows = []
+    for sku in skus:
+        for idx in range(depth):
+            eta = now.date() - timedelta(days=rng.randint(10, 365))
+            rows.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "tenant_id": tenant_id,
+                    "supplier_id": connector_id,
+                    "supplier_order_id": f"H-{connector_id[:8]}-{sku}-{idx}",
+                    "supplier_sku": sku,
+                    "qty_ordered": float(rng.randint(10, 400)),
+                    "qty_delivered": 0.0,
+                    "eta_date": eta,
+                    "impact_date": eta,
+                    "status": "delayed" if rng.random() < 0.2 else "delivered",
+                    "source_timestamp": now - timedelta(days=10),
+                    "closed_at": now - timedelta(days=10),
+                    "eta_variance_days": round(rng.uniform(0, 4), 1),
+                    "lead_time_days": round(rng.uniform(2, 20), 1),
+                    "last_synced_at": now,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+    return rows
+
+
+def _assessment_rows(rng: random.Random, order_line_id: str, depth: int, now: datetime) -> tuple[list[dict[str, Any]], str]:
+    rows = []
+    status = "green"
+    for idx in range(depth):
+        status = rng.choices(list(_STATUS_WEIGHTS), weights=list(_STATUS_WEIGHTS.values()))[0]
+        score = {"green": rng.uniform(0, 0.34), "yellow": rng.uniform(0.35, 0.64), "red": rng.uniform(0.65, 1.0)}[status]
+        reasons = rng.choice(_REASONS_BY_STATUS[status])
+        rows.append(
+            {
+                "order_line_id": order_line_id,
+                "model_version": "heuristic_v1",
+                "risk_score": round(score, 4),
+                "status_code": codes.encode_status(status),
+                "confidence": round(rng.uniform(0.5, 0.95), 2),
+                "reason_mask": codes.encode_reason_codes(reasons),
+                "estimated_delay_days": rng.randint(0, 10) if status != "green" else 0,
+                "stale_data": "STALE_DATA" in reasons,
+                "assessed_at": now - timedelta(hours=depth - idx, seconds=rng.randint(0, 3599)),
+            }
+        )
+    return rows, status
+
+
+def _tenant_session(db: Session | None, tenant_id: str) -> ContextManager[Session]:
+    return nullcontext(db) if db is not None else closing(sharding.session_for_tenant(tenant_id))
+
+
+def generate_synthetic_data(db: Session | None, spec: SyntheticSpec | None = None) -> SyntheticDataset:
+    """Insert ``spec`` worth of tenants and register their connectors' sync payloads.
+
+    With ``db`` None each tenant is written to its own shard (or the shared database when sharding is off).
+    """
+    spec = spec or SyntheticSpec()
+    rng = random.Random(spec.seed)
+    now = utcnow()
+    dataset = SyntheticDataset(spec=spec)
+    counts = dict.fromkeys(["connectors", "inventory", "open_lines", "history_lines", "assessments", "alerts"], 0)
+    connector_names = [f"Synthetic-{idx + 1}" for idx in range(spec.connectors_per_tenant)]
+
+    for tenant_idx in range(spec.tenants):
+        tenant_id = f"{spec.tenant_prefix}-{tenant_idx + 1:03d}"
+        dataset.tenant_ids.append(tenant_id)
+        with _tenant_session(db, tenant_id) as session:
+            session.add(models.User(tenant_id=tenant_id, email="owner@demo.local", role="owner"))
+            projects = [models.Project(tenant_id=tenant_id, name=f"Project {idx + 1}") for idx in range(spec.projects_per_tenant)]
+            connectors = [
+                models.SupplierConnector(
+                    tenant_id=tenant_id,
+                    supplier_name=name,
+                    auth_type="api_key",
+                    secret_ref=f"secret://{tenant_id}/{name.lower()}",
+                    status="healthy",
+                    last_sync_at=now,
+                )
+                for name in connector_names
+            ]
+            session.add_all(projects + connectors)
+            session.flush()
+            dataset.connector_ids[tenant_id] = [connector.id for connector in connectors]
+            counts["connectors"] += len(connectors)
+
+            skus: dict[str, list[str]] = {}
+            history: list[dict[str, Any]] = []
+            for connector in connectors:
+                skus[connector.id] = [f"{connector.supplier_name.upper()}-{idx:05d}" for idx in range(spec.skus_per_connector)]
+                dataset.payloads[connector.id] = {
+                    "inventory": [
+                        {
+                            "sku": sku,
+                            "qty_available": rng.randint(0, 500),
+                            "source_timestamp": (now - timedelta(hours=rng.uniform(0, 72))).isoformat(),
+                        }
+                        for sku in skus[connector.id]
+                    ],
+                    "orders": [],
+                }
+                history.extend(_history_rows(rng, tenant_id, connector.id, skus[connector.id], spec.history_depth, now))
+
+            open_rows = []
+            for line_idx in range(spec.open_lines_per_tenant):
+                connector = connectors[line_idx % len(connectors)]
+                order_id = f"SO-{tenant_idx + 1}-{line_idx:06d}"
+                record = _order_record(rng, now, order_id, rng.choice(skus[connector.id]))
+                dataset.payloads[connector.id]["orders"].append(record)
+                open_rows.append(_order_row(tenant_id, connector.id, rng.choice(projects).id, record, now))
+
+            inventory_rows = [
+                {
+                    "connector_id": connector.id,
+                    "supplier_sku": item["sku"],
+                    "qty_available": float(item["qty_available"]),
+                    "captured_at": now,
+                    "source_timestamp": datetime.fromisoformat(item["source_timestamp"]),
+                    "raw_payload_ref": f"synthetic://{connector.supplier_name}/{item['sku']}",
+                }
+                for connector in connectors
+                for item in dataset.payloads[connector.id]["inventory"]
+            ]
+            assessment_rows: list[dict[str, Any]] = []
+            alert_rows: list[dict[str, Any]] = []
+            for row in open_rows:
+                rows, latest_status = _assessment_rows(rng, row["id"], spec.assessment_depth, now)
+                assessment_rows.extend(rows)
+                if rows and latest_status != "green":
+                    alert_rows.append(
+                        {
+                            "id": str(uuid.uuid4()),
+                            "tenant_id": tenant_id,
+                            "order_line_id": row["id"],
+                            "severity": "high" if latest_status == "red" else "low",
+                            "status": "open",
+                            "message": f"Risk is {latest_status.upper()} ({rows[-1]['risk_score']:.2f}) for {row['supplier_sku']}.",
+                            "created_at": rows[-1]["assessed_at"],
+                        }
+                    )
+
+            _bulk_insert(session, models.SupplierInventorySnapshot, inventory_rows)
+            _bulk_insert(session, models.OrderLine, history + open_rows)
+            _bulk_insert(session, models.RiskAssessment, assessment_rows)
+            _bulk_insert(session, models.Alert, alert_rows)
+            session.commit()
+
+            dataset.open_line_ids[tenant_id] = [row["id"] for row in open_rows]
+            counts["inventory"] += len(inventory_rows)
+            counts["open_lines"] += len(open_rows)
+            counts["history_lines"] += len(history)
+            counts["assessments"] += len(assessment_rows)
+            counts["alerts"] += len(alert_rows)
+
+    for name in connector_names:
+        register_payload_provider(name, dataset.payload_for)
+    dataset.counts = counts
+    return dataset
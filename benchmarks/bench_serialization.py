@@ -0,0 +1,79 @@
+"""Compare per-item model_validate + response_model serialization with the FastJSONResponse path.
+
+Usage: python -m benchmarks.bench_serialization [--items 200] [--repeats 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from app import schemas
+from app.responses import dumps
+
+
+def _rows(count: int) -> list[dict]:
+    now = datetime(2026, 1, 1, 12, 30, 15, 123456)
+    return [
+        {
+            "orderLineId": str(uuid.uuid4()),
+            "projectId": None,
+            "supplierId": str(uuid.uuid4()),
+            "status": ("green", "yellow", "red")[idx % 3],
+            "riskScore": 0.1234 + idx / 1000,
+            "confidence": 0.78,
+            "reasonCodes": ["LOW_STOCK", "ETA_VOLATILITY"],
+            "estimatedDelayDays": idx % 10,
+            "impactDate": date(2026, 2, 1) + timedelta(days=idx % 30),
+            "stale": idx % 7 == 0,
+            "lastUpdated": now - timedelta(minutes=idx),
+        }
+        for idx in range(count)
+    ]
+
+
+def _validated_path(rows: list[dict], adapter: TypeAdapter) -> bytes:
+    items = [schemas.OrderRiskItem.model_validate(row) for row in rows]
+    response = schemas.OrderRiskListResponse(items=items, total=len(rows))
+    # FastAPI re-validates the return value against response_model before serializing it.
+    return adapter.dump_json(adapter.validate_python(response), by_alias=True)
+
+
+def _fast_path(rows: list[dict]) -> bytes:
+    return dumps({"items": rows, "total": len(rows)})
+
+
+def _best_of(func, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = _rows(args.items)
+    adapter = TypeAdapter(schemas.OrderRiskListResponse)
+    if _validated_path(rows, adapter) != _fast_path(rows):
+        raise SystemExit("serialized payloads differ between paths")
+
+    validated = _best_of(lambda: _validated_path(rows, adapter), args.repeats)
+    fast = _best_of(lambda: _fast_path(rows), args.repeats)
+    print(f"{args.items} items, best of {args.repeats}:")
+    print(f"  model_validate + response_model: {validated * 1000:8.3f} ms")
+    print(f"  FastJSONResponse:                {fast * 1000:8.3f} ms")
+    print(f"  speedup:                         {validated / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
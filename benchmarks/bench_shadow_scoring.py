@@ -0,0 +1,83 @@
+"""Measure the overhead shadow scoring adds to a primary scoring batch.
+
+Usage: python -m benchmarks.bench_shadow_scoring [--lines 5000] [--repeats 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import time
+from datetime import timedelta
+
+from app import config
+from app.services.model_registry import get_model, shadow_score
+from app.services.scoring import HeuristicV1Model, ScoringFeatures, utcnow
+
+
+class _CandidateModel(HeuristicV1Model):
+    version = "heuristic_v1_candidate"
+
+
+def _features(count: int) -> list[ScoringFeatures]:
+    rng = random.Random(7)
+    now = utcnow()
+    return [
+        ScoringFeatures(
+            order_line_id=f"line-{idx}",
+            qty_available=rng.choice([None, rng.uniform(0, 300)]),
+            inventory_source_timestamp=now - timedelta(hours=rng.uniform(0, 72)),
+            qty_ordered=rng.uniform(10, 300),
+            qty_delivered=rng.choice([0.0, 0.0, rng.uniform(0, 50)]),
+            history_count=rng.randint(0, 20),
+            delayed_count=rng.randint(0, 5),
+            avg_historical_lead_days=rng.uniform(3, 15),
+            lead_time_days=rng.uniform(0, 20),
+            eta_variance_days=rng.uniform(0, 6),
+            impact_date=(now + timedelta(days=rng.randint(0, 30))).date(),
+        )
+        for idx in range(count)
+    ]
+
+
+def _best_of(func, repeats: int) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    features = _features(args.lines)
+    primary = get_model(config.DEFAULT_SCORING_MODEL)
+    candidate = _CandidateModel()
+
+    def primary_only() -> None:
+        primary.score(features)
+
+    def with_shadow() -> None:
+        shadow_score(candidate, features, primary.score(features))
+
+    base = _best_of(primary_only, args.repeats)
+    shadowed = _best_of(with_shadow, args.repeats)
+    sampled = min(args.lines, config.SHADOW_MAX_LINES_PER_BATCH)
+    print(f"{args.lines} lines, shadow sample capped at {sampled}, best of {args.repeats}:")
+    print(f"  primary only:     {base * 1000:8.2f} ms")
+    print(f"  primary + shadow: {shadowed * 1000:8.2f} ms")
+    print(f"  overhead:         {(shadowed - base) / base * 100:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
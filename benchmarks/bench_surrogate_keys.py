@@ -0,0 +1,86 @@
+"""Compare string-UUID and integer primary keys on the risk_assessments shape.
+
+Usage: python -m benchmarks.bench_surrogate_keys [--rows 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+STRING_KEY_DDL = (
+    "CREATE TABLE risk_assessments (id VARCHAR(36) PRIMARY KEY, order_line_id VARCHAR(36) NOT NULL, "
+    "risk_score FLOAT NOT NULL, assessed_at DATETIME NOT NULL)"
+)
+INTEGER_KEY_DDL = (
+    "CREATE TABLE risk_assessments (id INTEGER PRIMARY KEY AUTOINCREMENT, order_line_id VARCHAR(36) NOT NULL, "
+    "risk_score FLOAT NOT NULL, assessed_at DATETIME NOT NULL)"
+)
+LATEST_JOIN = (
+    "SELECT ra.id, ra.risk_score FROM risk_assessments ra "
+    "JOIN (SELECT order_line_id, max(assessed_at) AS assessed_at FROM risk_assessments GROUP BY order_line_id) latest "
+    "ON ra.order_line_id = latest.order_line_id AND ra.assessed_at = latest.assessed_at"
+)
+
+
+def _build(path: Path, ddl: str, rows: int, order_lines: list[str], string_keys: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute(ddl)
+    conn.execute("CREATE INDEX ix_risk_assessments_order_line_assessed ON risk_assessments (order_line_id, assessed_at)")
+    batch = []
+    for idx in range(rows):
+        row = (order_lines[idx % len(order_lines)], 0.5, f"2026-01-01 00:{idx // 60 % 60:02d}:{idx % 60:02d}.{idx:06d}")
+        batch.append((str(uuid.uuid4()), *row) if string_keys else row)
+    columns = "order_line_id, risk_score, assessed_at"
+    if string_keys:
+        conn.executemany(f"INSERT INTO risk_assessments (id, {columns}) VALUES (?, ?, ?, ?)", batch)
+    else:
+        conn.executemany(f"INSERT INTO risk_assessments ({columns}) VALUES (?, ?, ?)", batch)
+    conn.commit()
+    return conn
+
+
+def _index_bytes(conn: sqlite3.Connection) -> dict[str, int]:
+    rows = conn.execute(
+        "SELECT name, sum(pgsize) FROM dbstat WHERE name != 'sqlite_schema' GROUP BY name ORDER BY name"
+    ).fetchall()
+    return dict(rows)
+
+
+def _time_join(conn: sqlite3.Connection, repeats: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        conn.execute(LATEST_JOIN).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--order-lines", type=int, default=5_000)
+    args = parser.parse_args()
+
+    order_lines = [str(uuid.uuid4()) for _ in range(args.order_lines)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, ddl, string_keys in (
+            ("string uuid pk", STRING_KEY_DDL, True),
+            ("integer pk", INTEGER_KEY_DDL, False),
+        ):
+            conn = _build(Path(tmp) / f"{label.replace(' ', '_')}.db", ddl, args.rows, order_lines, string_keys)
+            sizes = _index_bytes(conn)
+            print(f"{label}:")
+            for name, size in sizes.items():
+                print(f"  {name:<48} {size / 1024:>10.1f} KiB")
+            print(f"  {'total':<48} {sum(sizes.values()) / 1024:>10.1f} KiB")
+            print(f"  latest-assessment join: {_time_join(conn) * 1000:.1f} ms")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
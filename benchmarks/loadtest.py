@@ -0,0 +1,321 @@
+"""Open-loop load generator for the API tier with per-route latency percentiles.
+
+Launches uvicorn on a fresh SQLite file (or ``--database-url``) seeded with synthetic tenants,
+then replays a weighted request mix at a fixed arrival rate: a sustained phase followed by a
+burst phase. Requests are issued on schedule whether or not earlier ones finished, and latency
+is measured from the scheduled send time, so server queueing shows up in the percentiles.
+
+Point ``--base-url`` at an already running server to skip the launch; that server must have
+been started from ``benchmarks.loadtest_app`` with the same ``--tenant-prefix``.
+
+Usage: python -m benchmarks.loadtest [--rate 50] [--duration 30] [--burst-rate 150] [--burst-duration 10]
+           [--report loadtest.json] [--compare previous.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+# Relative weights of the replayed request mix.
+ROUTE_MIX = {
+    "GET /dashboard": 10,
+    "GET /api/orders/risk": 35,
+    "GET /api/orders/{id}": 35,
+    "POST /api/alerts/{id}/feedback": 15,
+    "POST /api/sync/run": 5,
+}
+# Statuses that count as success; manual syncs are rate limited per connector by design.
+EXPECTED_STATUSES = {
+    "POST /api/alerts/{id}/feedback": {201},
+    "POST /api/sync/run": {202, 429},
+}
+FEEDBACK_DISPOSITIONS = ("accurate", "false_positive", "too_late")
+SERVER_START_TIMEOUT_S = 300.0
+
+
+@dataclass
+class TenantTargets:
+    tenant_id: str
+    order_ids: list[str]
+    alert_ids: list[str]
+    connector_ids: list[str]
+    risk_pages: int
+
+
+@dataclass
+class RouteSamples:
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    errors: int = 0
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _launch_server(args: argparse.Namespace, workdir: Path) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "DATABASE_URL": args.database_url or f"sqlite:///{workdir / 'loadtest.db'}",
+            "LOADTEST_TENANTS": str(args.tenants),
+            "LOADTEST_CONNECTORS": str(args.connectors),
+            "LOADTEST_OPEN_LINES": str(args.open_lines),
+            "LOADTEST_TENANT_PREFIX": args.tenant_prefix,
+        }
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.loadtest_app:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def _wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen | None) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f"server exited with status {server.returncode} during startup")
+        try:
+            if (await client.get("/api/alerts")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit("server did not become ready in time")
+
+
+async def _discover(client: httpx.AsyncClient, tenant_id: str, page_size: int) -> TenantTargets:
+    headers = {"x-tenant-id": tenant_id}
+    risk = (await client.get("/api/orders/risk", params={"pageSize": 200}, headers=headers)).json()
+    alerts = (await client.get("/api/alerts", headers=headers)).json()
+    connectors = (await client.get("/api/integrations/suppliers", headers=headers)).json()
+    if not risk["items"] or not connectors:
+        raise SystemExit(f"tenant {tenant_id} has no data; was the server started from benchmarks.loadtest_app?")
+    return TenantTargets(
+        tenant_id=tenant_id,
+        order_ids=[item["orderLineId"] for item in risk["items"]],
+        alert_ids=[alert["id"] for alert in alerts],
+        connector_ids=[connector["id"] for connector in connectors],
+        risk_pages=max(math.ceil(risk["total"] / page_size), 1),
+    )
+
+
+def _build_request(route: str, target: TenantTargets, rng: random.Random, page_size: int) -> tuple[str, str, dict | None, dict | None]:
+    if route == "GET /dashboard":
+        return "GET", "/dashboard", None, None
+    if route == "GET /api/orders/risk":
+        return "GET", "/api/orders/risk", {"page": rng.randint(1, target.risk_pages), "pageSize": page_size}, None
+    if route == "GET /api/orders/{id}":
+        return "GET", f"/api/orders/{rng.choice(target.order_ids)}", None, None
+    if route == "POST /api/alerts/{id}/feedback":
+        body = {"disposition": rng.choice(FEEDBACK_DISPOSITIONS), "notes": "load test"}
+        return "POST", f"/api/alerts/{rng.choice(target.alert_ids)}/feedback", None, body
+    return "POST", "/api/sync/run", None, {"connectorId": rng.choice(target.connector_ids), "mode": "incremental"}
+
+
+async def _issue(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    route: str,
+    request: tuple[str, str, dict | None, dict | None],
+    tenant_id: str,
+    scheduled: float,
+    samples: RouteSamples,
+) -> float:
+    method, path, params, body = request
+    async with semaphore:
+        try:
+            response = await client.request(method, path, params=params, json=body, headers={"x-tenant-id": tenant_id})
+            status = str(response.status_code)
+            if response.status_code not in EXPECTED_STATUSES.get(route, {200}):
+                samples.errors += 1
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+            samples.errors += 1
+    finished = time.perf_counter()
+    samples.latencies.append(finished - scheduled)
+    samples.statuses[status] += 1
+    return finished
+
+
+async def _run_phase(
+    client: httpx.AsyncClient,
+    targets: list[TenantTargets],
+    rate: float,
+    duration: float,
+    args: argparse.Namespace,
+    rng: random.Random,
+) -> dict:
+    routes = list(ROUTE_MIX)
+    weights = list(ROUTE_MIX.values())
+    samples: dict[str, RouteSamples] = {route: RouteSamples() for route in routes}
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+    tasks = []
+    started = time.perf_counter()
+    for idx in range(int(rate * duration)):
+        scheduled = started + idx / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route = rng.choices(routes, weights=weights)[0]
+        target = rng.choice(targets)
+        if route == "POST /api/alerts/{id}/feedback" and not target.alert_ids:
+            route = "GET /api/orders/{id}"
+        request = _build_request(route, target, rng, args.page_size)
+        tasks.append(
+            asyncio.create_task(_issue(client, semaphore, route, request, target.tenant_id, scheduled, samples[route]))
+        )
+    finished = await asyncio.gather(*tasks)
+    elapsed = (max(finished) if finished else time.perf_counter()) - started
+
+    report_routes = {}
+    all_latencies: list[float] = []
+    total_errors = 0
+    for route, route_samples in samples.items():
+        if not route_samples.latencies:
+            continue
+        all_latencies.extend(route_samples.latencies)
+        total_errors += route_samples.errors
+        report_routes[route] = _latency_summary(route_samples.latencies, route_samples.errors)
+        report_routes[route]["statuses"] = dict(sorted(route_samples.statuses.items()))
+    overall = _latency_summary(all_latencies, total_errors) if all_latencies else {}
+    return {
+        "targetRps": rate,
+        "durationS": duration,
+        "achievedRps": round(len(all_latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "overall": overall,
+        "routes": report_routes,
+    }
+
+
+def _latency_summary(latencies: list[float], errors: int) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "errorRate": round(errors / len(latencies), 4),
+        "p50Ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95Ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99Ms": round(_percentile(latencies, 99) * 1000, 2),
+        "maxMs": round(max(latencies) * 1000, 2),
+    }
+
+
+async def _run(args: argparse.Namespace, base_url: str, server: subprocess.Popen | None) -> dict:
+    tenant_ids = [f"{args.tenant_prefix}-{idx + 1:03d}" for idx in range(args.tenants)]
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits, headers={"x-tenant-id": tenant_ids[0]}) as client:
+        await _wait_until_ready(client, server)
+        targets = [await _discover(client, tenant_id, args.page_size) for tenant_id in tenant_ids]
+        rng = random.Random(args.seed)
+        phases = {"sustained": await _run_phase(client, targets, args.rate, args.duration, args, rng)}
+        if args.burst_rate and args.burst_duration:
+            phases["burst"] = await _run_phase(client, targets, args.burst_rate, args.burst_duration, args, rng)
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "baseUrl": base_url,
+        "dataset": {"tenants": args.tenants, "connectorsPerTenant": args.connectors, "openLinesPerTenant": args.open_lines},
+        "mix": ROUTE_MIX,
+        "phases": phases,
+    }
+
+
+def _print_report(report: dict) -> None:
+    for name, phase in report["phases"].items():
+        print(f"{name}: target {phase['targetRps']} req/s for {phase['durationS']} s, achieved {phase['achievedRps']} req/s")
+        print(f"  {'route':<32} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for route, stats in [*phase["routes"].items(), ("overall", phase["overall"])]:
+            print(
+                f"  {route:<32} {stats['requests']:>8} {stats['errorRate']:>7.2%} "
+                f"{stats['p50Ms']:>9.2f} {stats['p95Ms']:>9.2f} {stats['p99Ms']:>9.2f}"
+            )
+
+
+def _print_comparison(previous: dict, current: dict) -> None:
+    print(f"p95 vs {previous.get('generatedAt', 'previous report')}:")
+    for name, phase in current["phases"].items():
+        old_phase = previous.get("phases", {}).get(name, {})
+        old_stats = {**old_phase.get("routes", {}), "overall": old_phase.get("overall", {})}
+        for route, stats in [*phase["routes"].items(), ("overall", phase["overall"])]:
+            old = old_stats.get(route)
+            if not old:
+                continue
+            change = (stats["p95Ms"] - old["p95Ms"]) / old["p95Ms"] if old["p95Ms"] else 0.0
+            print(
+                f"  {name:<10} {route:<32} {old['p95Ms']:>9.2f} -> {stats['p95Ms']:>9.2f} ms ({change:+.1%}), "
+                f"errors {old['errorRate']:.2%} -> {stats['errorRate']:.2%}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="use a running server instead of launching uvicorn")
+    parser.add_argument("--database-url", help="database for the launched server (default: fresh SQLite file)")
+    parser.add_argument("--tenants", type=int, default=3)
+    parser.add_argument("--connectors", type=int, default=4, help="connectors per tenant")
+    parser.add_argument("--open-lines", type=int, default=5000, help="open order lines per tenant")
+    parser.add_argument("--tenant-prefix", default=f"load{int(time.time())}")
+    parser.add_argument("--rate", type=float, default=50.0, help="sustained arrival rate, req/s")
+    parser.add_argument("--duration", type=float, default=30.0, help="sustained phase length, seconds")
+    parser.add_argument("--burst-rate", type=float, default=150.0, help="burst arrival rate, req/s (0 to skip)")
+    parser.add_argument("--burst-duration", type=float, default=10.0)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--report", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="previous JSON report to diff p95 and error rates against")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit non-zero above this overall error rate")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        base_url = args.base_url
+        if base_url is None:
+            server, base_url = _launch_server(args, Path(tmp))
+        try:
+            report = asyncio.run(_run(args, base_url, server))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    _print_report(report)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"wrote {args.report}")
+    if args.compare:
+        _print_comparison(json.loads(args.compare.read_text()), report)
+    failed = [name for name, phase in report["phases"].items() if phase["overall"].get("errorRate", 0.0) > args.max_error_rate]
+    if failed:
+        print(f"FAIL error rate above {args.max_error_rate:.2%} in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
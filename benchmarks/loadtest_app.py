@@ -0,0 +1,35 @@
+"""ASGI entry point for load tests: the regular app plus a synthetic dataset generated at startup.
+
+Generating inside the server process registers the synthetic sync payload provider there, so
+manual syncs triggered by the load generator replay realistic supplier payloads. The dataset is
+configured through ``LOADTEST_*`` environment variables set by ``benchmarks.loadtest``.
+"""
+
+from __future__ import annotations
+
+import os
+
+from app import database
+from app.main import create_app
+from app.synthetic import SyntheticSpec, generate_synthetic_data
+
+
+def spec_from_env() -> SyntheticSpec:
+    return SyntheticSpec(
+        tenants=int(os.getenv("LOADTEST_TENANTS", "3")),
+        connectors_per_tenant=int(os.getenv("LOADTEST_CONNECTORS", "4")),
+        open_lines_per_tenant=int(os.getenv("LOADTEST_OPEN_LINES", "5000")),
+        tenant_prefix=os.getenv("LOADTEST_TENANT_PREFIX", "load"),
+    )
+
+
+app = create_app(seed_demo=False)
+
+
+@app.on_event("startup")
+def generate_dataset() -> None:
+    db = database.SessionLocal()
+    try:
+        generate_synthetic_data(db, spec_from_env())
+    finally:
+        db.close()
@@ -0,0 +1,187 @@
+"""Regression benchmark suite for sync, scoring and the hot read endpoints on a synthetic tenant.
+
+Each case is timed ``--repeats`` times after one warm-up call. The median is compared with the
+stored baseline (a case regresses when it is more than ``--threshold`` slower) and p95 is checked
+against the absolute latency budgets from the product spec. Exits non-zero on any failure.
+
+Usage: python -m benchmarks.suite [--open-lines 5000] [--repeats 5] [--threshold 0.25] [--update-baselines]
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable
+
+from fastapi.testclient import TestClient
+
+from app import database, models
+from app.main import create_app
+from app.services.scoring import compute_order_risk
+from app.services.sync import queue_sync_run, run_sync_job, utcnow
+from app.synthetic import SyntheticDataset, SyntheticSpec, generate_synthetic_data
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines.json"
+SCORING_SAMPLE_LINES = 200
+SYNC_CHANGED_FRACTION = 0.1
+
+# p95 budgets in milliseconds, from the product spec (measured at 5,000 open lines).
+LATENCY_BUDGETS_MS = {
+    "GET /dashboard": 2000.0,
+    "GET /api/alerts": 500.0,
+}
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def _measure(func: Callable[[], None], repeats: int) -> list[float]:
+    func()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _http_case(client: TestClient, paths: Callable[[], str], headers: dict[str, str]) -> Callable[[], None]:
+    def run() -> None:
+        response = client.get(paths(), headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.request.url} returned {response.status_code}")
+
+    return run
+
+
+def _touch_payload(dataset: SyntheticDataset, connector_id: str, rng: random.Random) -> None:
+    """Change a slice of the connector's orders so the next sync updates them."""
+    orders = dataset.payloads[connector_id]["orders"]
+    stamp = utcnow().isoformat()
+    for record in rng.sample(orders, max(int(len(orders) * SYNC_CHANGED_FRACTION), 1)):
+        record["qty_delivered"] = min(record["qty_delivered"] + 1.0, record["qty_ordered"])
+        record["source_timestamp"] = stamp
+
+
+def run_suite(spec: SyntheticSpec, repeats: int) -> dict[str, list[float]]:
+    results: dict[str, list[float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.reset_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        app = create_app(seed_demo=False)
+        with TestClient(app) as client:
+            db = database.SessionLocal()
+            try:
+                dataset = generate_synthetic_data(db, spec)
+                tenant_id = dataset.tenant_ids[0]
+                headers = {"x-tenant-id": tenant_id}
+                order_ids = itertools.cycle(dataset.open_line_ids[tenant_id])
+
+                http_cases = {
+                    "GET /api/orders/risk": lambda: "/api/orders/risk",
+                    "GET /dashboard": lambda: "/dashboard",
+                    "GET /api/alerts": lambda: "/api/alerts",
+                    "GET /api/orders/{id}": lambda: f"/api/orders/{next(order_ids)}",
+                }
+                for name, paths in http_cases.items():
+                    results[name] = _measure(_http_case(client, paths, headers), repeats)
+
+                sample = (
+                    db.query(models.OrderLine)
+                    .filter(models.OrderLine.id.in_(dataset.open_line_ids[tenant_id][:SCORING_SAMPLE_LINES]))
+                    .all()
+                )
+
+                def score_sample() -> None:
+                    for line in sample:
+                        compute_order_risk(db, line)
+
+                results[f"compute_order_risk x{len(sample)}"] = _measure(score_sample, repeats)
+
+                rng = random.Random(spec.seed)
+                connector_id = dataset.connector_ids[tenant_id][0]
+
+                def sync_once() -> None:
+                    _touch_payload(dataset, connector_id, rng)
+                    run = queue_sync_run(db, connector_id, "incremental")
+                    run_sync_job(run.id)
+
+                results["run_sync_job"] = _measure(sync_once, repeats)
+            finally:
+                db.close()
+    return results
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": round(_percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(_percentile(samples, 95) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=1)
+    parser.add_argument("--connectors", type=int, default=2)
+    parser.add_argument("--skus", type=int, default=200, help="SKUs per connector")
+    parser.add_argument("--open-lines", type=int, default=5000, help="open order lines per tenant")
+    parser.add_argument("--history-depth", type=int, default=3)
+    parser.add_argument("--assessment-depth", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown vs baseline")
+    parser.add_argument("--baselines", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args()
+
+    spec = SyntheticSpec(
+        tenants=args.tenants,
+        connectors_per_tenant=args.connectors,
+        skus_per_connector=args.skus,
+        open_lines_per_tenant=args.open_lines,
+        history_depth=args.history_depth,
+        assessment_depth=args.assessment_depth,
+    )
+    summaries = {name: _summary(samples) for name, samples in run_suite(spec, args.repeats).items()}
+
+    if args.update_baselines:
+        args.baselines.write_text(json.dumps({"spec": asdict(spec), "cases": summaries}, indent=2) + "\n")
+        print(f"wrote baselines for {len(summaries)} cases to {args.baselines}")
+        return
+
+    baseline: dict = {}
+    if args.baselines.exists():
+        stored = json.loads(args.baselines.read_text())
+        if stored.get("spec") == asdict(spec):
+            baseline = stored["cases"]
+        else:
+            print("stored baselines were recorded with a different spec; skipping regression checks")
+
+    failures = []
+    print(f"{'case':<28} {'p50 ms':>10} {'p95 ms':>10} {'baseline p50':>14}")
+    for name, summary in summaries.items():
+        reference = baseline.get(name, {}).get("p50_ms")
+        print(f"{name:<28} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} {reference if reference else '-':>14}")
+        if reference and summary["p50_ms"] > reference * (1 + args.threshold):
+            failures.append(f"{name}: p50 {summary['p50_ms']:.2f} ms is more than {args.threshold:.0%} over {reference:.2f} ms")
+        budget = LATENCY_BUDGETS_MS.get(name)
+        if budget is not None and summary["p95_ms"] > budget:
+            failures.append(f"{name}: p95 {summary['p95_ms']:.2f} ms exceeds the {budget:.0f} ms budget")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
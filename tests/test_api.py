@@ -1,6 +1,23 @@
 from __future__ import annotations
 
+import csv
+import io
+import json
+import pstats
+import sqlite3
 import time
+from datetime import date, timedelta
+
+import msgpack
+import pyarrow.parquet as pq
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import OperationalError
+
+from app import config, database, deps, models, schemas
+from app.services import timeline
+from app.services.scoring import utcnow
 
 
 def _create_connector(client, supplier_name: str = "BuildPro") -> str:
@@ -101,3 +118,610 @@ def test_alert_resolve_rbac(client):
     assert allowed.status_code == 200
     assert allowed.json()["status"] == "resolved"
 
+
+
+def test_order_risk_reason_code_filter(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+
+    stale = client.get("/api/orders/risk", params={"reasonCode": "STALE_DATA"})
+    assert stale.status_code == 200
+    assert stale.json()["total"] > 0
+    assert all("STALE_DATA" in item["reasonCodes"] for item in stale.json()["items"])
+
+    invalid = client.get("/api/orders/risk", params={"reasonCode": "NOT_A_CODE"})
+    assert invalid.status_code == 400
+
+
+def test_fast_json_responses_match_response_model_serialization(client):
+    connector_id = _create_connector(client, "MetroLumber")
+    _run_sync(client, connector_id)
+
+    risks = client.get("/api/orders/risk")
+    order_id = risks.json()["items"][0]["orderLineId"]
+    cases = [
+        (risks, TypeAdapter(schemas.OrderRiskListResponse)),
+        (client.get("/api/integrations/suppliers"), TypeAdapter(list[schemas.ConnectorResponse])),
+        (client.get(f"/api/orders/{order_id}"), TypeAdapter(schemas.OrderDetailResponse)),
+    ]
+    for response, adapter in cases:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        validated = adapter.validate_python(response.json())
+        assert adapter.dump_json(validated, by_alias=True) == response.content
+
+
+def test_order_risk_export_streams_filtered_rows(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+    listed = client.get("/api/orders/risk", params={"pageSize": 200}).json()
+
+    ndjson = client.get("/api/orders/risk/export", params={"format": "ndjson"})
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert exported == listed["items"]
+
+    csv_response = client.get("/api/orders/risk/export", params={"format": "csv", "reasonCode": "STALE_DATA"})
+    assert csv_response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(csv_response.text)))
+    assert rows
+    assert all("STALE_DATA" in row["reasonCodes"].split(";") for row in rows)
+
+    invalid = client.get("/api/orders/risk/export", params={"format": "xml"})
+    assert invalid.status_code == 422
+
+
+def test_order_risk_export_parquet(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+
+    response = client.get("/api/orders/risk/export", params={"format": "parquet"})
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == client.get("/api/orders/risk").json()["total"]
+    assert "reasonCodes" in table.column_names
+
+
+def test_order_features_endpoint_reads_feature_store(client):
+    connector_id = _create_connector(client, "MetroLumber")
+    _run_sync(client, connector_id)
+    order_id = client.get("/api/orders/risk").json()["items"][0]["orderLineId"]
+
+    response = client.get(f"/api/orders/{order_id}/features")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["orderLineId"] == order_id
+    assert body["qtyAvailable"] is not None
+    assert 0.0 <= body["components"]["inventory"] <= 1.0
+
+    forbidden = client.get(f"/api/orders/{order_id}/features", headers={"x-tenant-id": "other-tenant"})
+    assert forbidden.status_code == 403
+
+
+def test_simulate_restock_reports_status_deltas_without_writing(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+    before = client.get("/api/orders/risk", params={"pageSize": 200}).json()
+
+    response = client.post(
+        "/api/simulate",
+        json={
+            "inventory": [{"supplierId": connector_id, "sku": "CONC-STD-80", "qtyAvailable": 1000}],
+            # Pulling ETAs earlier must not add risk on top of the restock.
+            "etaShifts": [{"supplierId": connector_id, "days": -5}],
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["evaluated"] == before["total"]
+    assert body["deltas"]
+    assert all("LOW_STOCK" not in delta["reasonCodes"] for delta in body["deltas"])
+    assert client.get("/api/orders/risk", params={"pageSize": 200}).json() == before
+
+    invalid = client.post(
+        "/api/simulate",
+        json={"inventory": [{"supplierId": connector_id, "sku": "CONC-STD-80"}]},
+    )
+    assert invalid.status_code == 422
+    unknown_supplier = client.post(
+        "/api/simulate",
+        json={"supplierSwaps": [{"orderLineId": body["deltas"][0]["orderLineId"], "supplierId": "missing"}]},
+    )
+    assert unknown_supplier.status_code == 400
+
+
+def test_simulate_eta_shifts_count_only_slips_and_follow_the_swapped_supplier(client):
+    buildpro_id = _create_connector(client, "BuildPro")
+    metro_id = _create_connector(client, "MetroLumber")
+    _run_sync(client, buildpro_id)
+    _run_sync(client, metro_id)
+    items = client.get("/api/orders/risk", params={"pageSize": 200}).json()["items"]
+
+    def after(order_line_id: str, **overrides) -> dict[str, int]:
+        response = client.post("/api/simulate", json={"orderLineIds": [order_line_id], **overrides})
+        assert response.status_code == 200
+        return response.json()["after"]
+
+    def slip(order_line_id: str, days: int) -> list[dict]:
+        return [{"orderLineId": order_line_id, "days": days}]
+
+    target = next(
+        item
+        for item in items
+        if item["supplierId"] == buildpro_id
+        and item["status"] != "red"
+        and after(item["orderLineId"], etaShifts=slip(item["orderLineId"], 30))["red"] == 1
+    )
+    line_id = target["orderLineId"]
+    unchanged = {"green": 0, "yellow": 0, "red": 0, target["status"]: 1}
+    assert after(line_id, etaShifts=slip(line_id, -30)) == unchanged
+
+    swap = [{"orderLineId": line_id, "supplierId": metro_id}]
+    swapped = after(line_id, supplierSwaps=swap)
+    assert after(line_id, supplierSwaps=swap, etaShifts=[{"supplierId": buildpro_id, "days": 30}]) == swapped
+    assert after(line_id, supplierSwaps=swap, etaShifts=[{"supplierId": metro_id, "days": 30}])["red"] == 1
+
+
+def test_substitution_alternatives_rank_and_feed_recommendations(client):
+    buildpro_id = _create_connector(client, "BuildPro")
+    metro_id = _create_connector(client, "MetroLumber")
+    _run_sync(client, buildpro_id)
+    _run_sync(client, metro_id)
+
+    group = client.put(
+        "/api/substitutions",
+        json={
+            "groupKey": "concrete-80lb",
+            "members": [
+                {"supplierId": buildpro_id, "supplierSku": "CONC-STD-80"},
+                {"supplierId": metro_id, "supplierSku": "LUM-2X4-8"},
+            ],
+        },
+    )
+    assert group.status_code == 200
+    assert client.get("/api/substitutions").json()[0]["groupKey"] == "concrete-80lb"
+
+    low_stock = client.get("/api/orders/risk", params={"supplierId": buildpro_id, "reasonCode": "LOW_STOCK"}).json()
+    order_id = low_stock["items"][0]["orderLineId"]
+    alternatives = client.get(f"/api/orders/{order_id}/alternatives").json()
+    assert alternatives[0]["supplierId"] == metro_id
+    assert alternatives[0]["supplierSku"] == "LUM-2X4-8"
+
+    detail = client.get(f"/api/orders/{order_id}").json()
+    assert detail["recommendations"][0]["title"] == "Source from MetroLumber (LUM-2X4-8)"
+
+    foreign = client.put(
+        "/api/substitutions",
+        json={
+            "groupKey": "other",
+            "members": [
+                {"supplierId": buildpro_id, "supplierSku": "A"},
+                {"supplierId": "not-a-connector", "supplierSku": "B"},
+            ],
+        },
+    )
+    assert foreign.status_code == 404
+
+
+def test_tenant_recommendation_rules_override_defaults(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+    low_stock = client.get("/api/orders/risk", params={"reasonCode": "LOW_STOCK"}).json()
+    order_id = low_stock["items"][0]["orderLineId"]
+    assert client.get(f"/api/orders/{order_id}").json()["recommendations"][0]["title"] == "Source alternate supplier"
+
+    rules = {
+        "rules": [
+            {
+                "reasonCode": "LOW_STOCK",
+                "position": 5,
+                "priority": "high",
+                "title": "Call yard for {supplier_sku}",
+                "action": "Reserve {qty_remaining} units at the yard.",
+            }
+        ]
+    }
+    forbidden = client.put("/api/recommendation-rules", json=rules, headers={"x-user-role": "coordinator"})
+    assert forbidden.status_code == 403
+    unknown = client.put(
+        "/api/recommendation-rules",
+        json={"rules": [{**rules["rules"][0], "reasonCode": "NOPE"}]},
+        headers={"x-user-role": "owner"},
+    )
+    assert unknown.status_code == 400
+    for title in ("x {supplier_sku.foo}", "{supplier_sku[a]}", "{tenant_id}", "{qty_remaining:{impact_date}}"):
+        invalid = client.put(
+            "/api/recommendation-rules",
+            json={"rules": [{**rules["rules"][0], "title": title}]},
+            headers={"x-user-role": "owner"},
+        )
+        assert invalid.status_code == 400
+
+    saved = client.put("/api/recommendation-rules", json=rules, headers={"x-user-role": "owner"})
+    assert saved.status_code == 200
+    effective = client.get("/api/recommendation-rules").json()
+    assert [rule["reasonCode"] for rule in effective].count("LOW_STOCK") == 1
+    assert "ETA_VOLATILITY" in {rule["reasonCode"] for rule in effective}
+
+    detail = client.get(f"/api/orders/{order_id}").json()
+    first = detail["recommendations"][0]
+    assert first["title"] == f"Call yard for {detail['supplierSku']}"
+    assert first["action"].startswith("Reserve ")
+
+
+def test_sync_run_metrics_and_daily_aggregates(client):
+    connector_id = _create_connector(client, "BuildPro")
+    response = client.post("/api/sync/run", json={"connectorId": connector_id, "mode": "incremental"})
+    run_id = response.json()["id"]
+
+    run = client.get(f"/api/sync/runs/{run_id}").json()
+    assert run["status"] == "success"
+    assert run["records"] == {"received": 4, "unchanged": 0, "inserted": 4, "updated": 0, "rejected": 0, "missing": 0}
+    assert run["bytesFetched"] > 0
+    assert set(run["stagesMs"]) == {"fetch", "validate", "inventory", "orders", "reconcile", "scoring", "alerting", "commit"}
+    assert run["durationMs"] >= run["stagesMs"]["scoring"]
+    assert client.get(f"/api/sync/runs/{run_id}", headers={"x-tenant-id": "other"}).status_code == 403
+    assert client.get("/api/sync/runs/missing").status_code == 404
+
+    buckets = client.get("/api/sync/metrics", params={"connectorId": connector_id}).json()
+    assert len(buckets) == 1
+    assert buckets[0]["supplierName"] == "BuildPro"
+    assert buckets[0]["runs"] == 1
+    assert buckets[0]["records"]["inserted"] == 4
+
+
+def test_profiled_sync_run_stores_downloadable_profiles(client, tmp_path):
+    connector_id = _create_connector(client, "BuildPro")
+    run_id = client.post("/api/sync/run", json={"connectorId": connector_id, "profile": True}).json()["id"]
+    assert client.get(f"/api/sync/runs/{run_id}").json()["profile"] is True
+
+    collapsed = client.get(f"/api/sync/runs/{run_id}/profile")
+    assert collapsed.status_code == 200
+    assert collapsed.headers["content-type"].startswith("text/plain")
+
+    raw = client.get(f"/api/sync/runs/{run_id}/profile", params={"format": "pstats"})
+    assert raw.headers["content-type"] == "application/octet-stream"
+    dump = tmp_path / "sync.pstats"
+    dump.write_bytes(raw.content)
+    stats = pstats.Stats(str(dump))
+    assert any(name == "_run_single_attempt" for _, _, name in stats.stats)
+
+    other_id = _create_connector(client, "MetroLumber")
+    plain_run_id = client.post("/api/sync/run", json={"connectorId": other_id}).json()["id"]
+    assert client.get(f"/api/sync/runs/{plain_run_id}/profile").status_code == 404
+    toggled = client.put(f"/api/integrations/{other_id}/profiling", json={"enabled": True})
+    assert toggled.json()["profileSyncs"] is True
+
+
+def test_order_detail_bounds_timeline_and_pages_older_events(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+    order_id = client.get("/api/orders/risk").json()["items"][0]["orderLineId"]
+
+    db = database.SessionLocal()
+    try:
+        existing = db.query(models.RiskAssessment).filter_by(order_line_id=order_id).count()
+        existing += db.query(models.Alert).filter_by(order_line_id=order_id).count()
+        oldest = db.query(models.RiskAssessment).filter_by(order_line_id=order_id).first().assessed_at
+        for days in range(1, 71):
+            db.add(
+                models.RiskAssessment(
+                    order_line_id=order_id,
+                    risk_score=0.1,
+                    risk_status="green",
+                    confidence=0.5,
+                    reason_codes=["NO_HISTORY"],
+                    assessed_at=oldest - timedelta(days=days),
+                )
+            )
+        db.add(
+            models.EtaRevision(
+                order_line_id=order_id,
+                previous_eta=date(2026, 1, 1),
+                eta_date=date(2026, 1, 4),
+                shift_days=3,
+                recorded_at=oldest - timedelta(days=30, hours=12),
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    detail = client.get(f"/api/orders/{order_id}").json()
+    assert detail["currentStatus"] != "green"
+    assert len(detail["timeline"]) == 50
+    timestamps = [event["timestamp"] for event in detail["timeline"]]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    events = list(detail["timeline"])
+    cursor = detail["timelineCursor"]
+    while cursor:
+        page = client.get(f"/api/orders/{order_id}/timeline", params={"before": cursor, "limit": 20}).json()
+        events.extend(page["events"])
+        cursor = page["nextCursor"]
+    assert len(events) == existing + 71
+    assert [event["eventType"] for event in events].count("eta_revised") == 1
+    assert len({(event["timestamp"], event["detail"]) for event in events}) == len(events)
+
+    assert client.get(f"/api/orders/{order_id}/timeline", params={"before": "nope"}).status_code == 400
+    forbidden = client.get(f"/api/orders/{order_id}/timeline", params={"before": detail["timelineCursor"]}, headers={"x-tenant-id": "other"})
+    assert forbidden.status_code == 403
+
+    page = client.get(f"/orders/{order_id}")
+    assert page.status_code == 200
+    assert "Older history" in page.text
+
+
+def test_alert_feed_filters_and_keyset_pages(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+    order_id = client.get("/api/orders/risk").json()["items"][0]["orderLineId"]
+
+    start = models.utcnow() - timedelta(days=10)
+    db = database.SessionLocal()
+    try:
+        for minute in range(30):
+            db.add(
+                models.Alert(
+                    tenant_id="demo-tenant",
+                    order_line_id=order_id,
+                    severity=("low", "medium", "high")[minute % 3],
+                    status="resolved" if minute % 2 else "open",
+                    message=f"historical {minute}",
+                    # Pairs of alerts share a timestamp so the id tie-breaker is exercised.
+                    created_at=start + timedelta(minutes=minute // 2),
+                )
+            )
+        db.commit()
+    finally:
+        db.close()
+
+    everything = client.get("/api/alerts").json()
+    assert "x-next-cursor" not in client.get("/api/alerts").headers
+
+    seen = []
+    params = {"limit": 7, "createdTo": (start + timedelta(days=1)).isoformat()}
+    while True:
+        response = client.get("/api/alerts", params=params)
+        seen.extend(response.json())
+        if "x-next-cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["x-next-cursor"]
+    assert len(seen) == 30
+    assert len({alert["id"] for alert in seen}) == 30
+    assert [alert["id"] for alert in seen] == [alert["id"] for alert in everything if alert["message"].startswith("historical")]
+
+    high_open = client.get("/api/alerts", params={"severity": "high", "status": "open", "createdTo": params["createdTo"]}).json()
+    assert len(high_open) == 5
+    assert {(alert["severity"], alert["status"]) for alert in high_open} == {("high", "open")}
+    two = client.get("/api/alerts", params=[("severity", "low"), ("severity", "medium"), ("createdTo", params["createdTo"])]).json()
+    assert len(two) == 20
+
+    assert client.get("/api/alerts", params={"severity": "urgent"}).status_code == 400
+    assert client.get("/api/alerts", params={"cursor": "garbage"}).status_code == 400
+
+
+def test_bulk_alert_actions_report_per_id_results(client):
+    connector_id = _create_connector(client, "BuildPro")
+    _run_sync(client, connector_id)
+    alert_ids = [alert["id"] for alert in client.get("/api/alerts").json()]
+    assert len(alert_ids) >= 2
+    foreign = client.get("/api/alerts", headers={"x-tenant-id": "other"}).json()
+    assert foreign == []
+
+    db = database.SessionLocal()
+    try:
+        other = db.query(models.Alert).filter_by(id=alert_ids[0]).one()
+        foreign_alert = models.Alert(tenant_id="other", order_line_id=other.order_line_id, severity="low", message="other tenant")
+        db.add(foreign_alert)
+        db.commit()
+        foreign_id = foreign_alert.id
+    finally:
+        db.close()
+
+    ids = [alert_ids[0], alert_ids[1], "missing", foreign_id, alert_ids[0]]
+    acknowledged = client.post("/api/alerts/bulk", json={"alertIds": ids, "action": "acknowledge"})
+    assert acknowledged.status_code == 200
+    body = acknowledged.json()
+    assert body["applied"] == 2
+    assert [item["result"] for item in body["results"]] == ["updated", "updated", "not_found", "forbidden"]
+
+    feedback = client.post(
+        "/api/alerts/bulk",
+        json={"alertIds": alert_ids[:2], "action": "feedback", "disposition": "accurate", "notes": "outage"},
+    ).json()
+    assert [item["result"] for item in feedback["results"]] == ["created", "created"]
+    db = database.SessionLocal()
+    try:
+        stored = db.query(models.AlertFeedback).filter(models.AlertFeedback.alert_id.in_(alert_ids[:2])).all()
+        assert {row.id for row in stored} == {item["feedbackId"] for item in feedback["results"]}
+        assert {row.model_version for row in stored} == {"heuristic_v1"}
+    finally:
+        db.close()
+
+    denied = client.post("/api/alerts/bulk", json={"alertIds": alert_ids, "action": "resolve"}, headers={"x-user-role": "coordinator"})
+    assert denied.status_code == 403
+    resolved = client.post("/api/alerts/bulk", json={"alertIds": alert_ids, "action": "resolve"}).json()
+    assert resolved["applied"] == len(alert_ids)
+    again = client.post("/api/alerts/bulk", json={"alertIds": alert_ids[:1], "action": "acknowledge"}).json()
+    assert again["results"] == [{"id": alert_ids[0], "result": "unchanged", "status": "resolved", "feedbackId": None}]
+    assert {alert["status"] for alert in client.get("/api/alerts", params={"status": "resolved"}).json()} == {"resolved"}
+
+    assert client.post("/api/alerts/bulk", json={"alertIds": alert_ids, "action": "feedback"}).status_code == 422
+    too_many = ["x"] * 501
+    assert client.post("/api/alerts/bulk", json={"alertIds": too_many, "action": "acknowledge"}).status_code == 422
+
+
+def test_bulk_acknowledge_skips_alerts_moved_after_the_ownership_read(client):
+    _run_sync(client, _create_connector(client, "BuildPro"))
+    alert_ids = [alert["id"] for alert in client.get("/api/alerts").json()][:2]
+    raced = alert_ids[1]
+
+    def resolve_first(conn, cursor, statement, parameters, context, executemany):
+        # Another request resolves one alert between the bulk read and its UPDATE.
+        if statement.startswith("UPDATE alerts") and not moved:
+            moved.append(raced)
+            with sqlite3.connect(database.engine.url.database) as other:
+                other.execute("UPDATE alerts SET status = 'resolved' WHERE id = ?", (raced,))
+
+    moved: list[str] = []
+    event.listen(database.engine, "before_cursor_execute", resolve_first)
+    try:
+        body = client.post("/api/alerts/bulk", json={"alertIds": alert_ids, "action": "acknowledge"}).json()
+    finally:
+        event.remove(database.engine, "before_cursor_execute", resolve_first)
+
+    assert moved == [raced]
+    assert body["applied"] == 1
+    assert body["results"][1] == {"id": raced, "result": "unchanged", "status": "resolved", "feedbackId": None}
+    assert {alert["id"]: alert["status"] for alert in client.get("/api/alerts").json()}[raced] == "resolved"
+
+
+def test_order_batch_matches_single_details_with_constant_queries(client):
+    _run_sync(client, _create_connector(client, "MetroLumber"))
+    _run_sync(client, _create_connector(client, "BuildPro"))
+    order_ids = [item["orderLineId"] for item in client.get("/api/orders/risk", params={"pageSize": 200}).json()["items"]]
+    assert len(order_ids) >= 4
+
+    def queries(response) -> int:
+        return int(response.headers["server-timing"].split('desc="')[1].split(" queries")[0])
+
+    single = client.post("/api/orders/batch", json={"orderIds": order_ids[:1]})
+    batch = client.post("/api/orders/batch", json={"orderIds": [*order_ids, "missing"], "timelineLimit": 50})
+    assert batch.status_code == 200
+    assert queries(batch) == queries(single)
+
+    body = batch.json()
+    assert body["errors"] == [{"id": "missing", "error": "not_found"}]
+    assert [item["orderLineId"] for item in body["items"]] == order_ids
+    for item in body["items"]:
+        detail = client.get(f"/api/orders/{item['orderLineId']}").json()
+        if "LOW_STOCK" not in detail["reasonCodes"]:
+            assert item == detail
+        assert item["timeline"] == detail["timeline"]
+
+    truncated = client.post("/api/orders/batch", json={"orderIds": order_ids, "timelineLimit": 1}).json()
+    assert {len(item["timeline"]) for item in truncated["items"]} == {1}
+    forbidden = client.post("/api/orders/batch", json={"orderIds": order_ids[:1]}, headers={"x-tenant-id": "other"}).json()
+    assert forbidden == {"items": [], "errors": [{"id": order_ids[0], "error": "forbidden"}]}
+    assert client.post("/api/orders/batch", json={"orderIds": ["x"] * 201}).status_code == 422
+
+
+def test_batch_timelines_pre_limit_deep_histories_per_branch(client):
+    _run_sync(client, _create_connector(client, "BuildPro"))
+    order_ids = [item["orderLineId"] for item in client.get("/api/orders/risk").json()["items"]][:2]
+
+    db = database.SessionLocal()
+    try:
+        start = utcnow() - timedelta(days=400)
+        for offset, order_id in enumerate(order_ids):
+            db.add_all(
+                models.RiskAssessment(
+                    order_line_id=order_id,
+                    risk_score=0.1,
+                    risk_status="green",
+                    confidence=0.5,
+                    reason_codes=["NO_HISTORY"],
+                    assessed_at=start + timedelta(hours=hour, minutes=offset),
+                )
+                for hour in range(300)
+            )
+            db.execute(
+                insert(models.EtaRevision),
+                [
+                    {
+                        "order_line_id": order_id,
+                        "previous_eta": date(2026, 1, 1),
+                        "eta_date": date(2026, 1, 2),
+                        "shift_days": 1,
+                        "recorded_at": start + timedelta(hours=hour, minutes=30),
+                    }
+                    for hour in range(0, 300, 3)
+                ],
+            )
+        db.commit()
+
+        statements: list[str] = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(database.engine, "before_cursor_execute", capture)
+        try:
+            batch = timeline.order_timelines(db, order_ids, 5)
+        finally:
+            event.remove(database.engine, "before_cursor_execute", capture)
+
+        # Every branch ranks its own rows per line before the UNION ALL, then the merge is ranked once more.
+        assert len(statements) == 1
+        assert statements[0].lower().count("row_number()") == 5
+        for order_id in order_ids:
+            assert batch[order_id] == timeline.order_timeline(db, order_id, 5)
+            assert len(batch[order_id].events) == 5
+            assert batch[order_id].next_cursor is not None
+    finally:
+        db.close()
+
+
+def test_order_risk_sparse_fields_and_compact_encoding(client):
+    _run_sync(client, _create_connector(client, "BuildPro"))
+    full = client.get("/api/orders/risk").json()
+
+    sparse = client.get("/api/orders/risk", params={"fields": "orderLineId,status,impactDate"}).json()
+    assert sparse["total"] == full["total"]
+    assert sparse["items"] == [
+        {"orderLineId": item["orderLineId"], "status": item["status"], "impactDate": item["impactDate"]} for item in full["items"]
+    ]
+
+    compact = client.get("/api/orders/risk", params={"compact": "true"})
+    body = compact.json()
+    assert body["fields"][0] == "orderLineId"
+    assert [dict(zip(body["fields"], row)) for row in body["items"]] == full["items"]
+    assert len(compact.content) < len(client.get("/api/orders/risk").content)
+
+    assert client.get("/api/orders/risk", params={"fields": "orderLineId,secret"}).status_code == 400
+    assert client.get("/api/orders/risk", params={"fields": ","}).status_code == 400
+
+    packed = client.get("/api/orders/risk", params={"fields": "orderLineId,reasonCodes"}, headers={"accept": "application/msgpack"})
+    assert packed.status_code == 200
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content)["items"][0]["reasonCodes"] == full["items"][0]["reasonCodes"]
+
+
+def test_reads_go_to_replica_except_right_after_the_callers_commit(client, tmp_path):
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica = create_engine(replica_url)
+    database.Base.metadata.create_all(bind=replica)
+    replica.dispose()
+    database.reset_engine(database.engine.url.render_as_string(hide_password=False), replica_url)
+
+    connector_id = _create_connector(client, "BuildPro")
+    # The writer reads its own write from the primary; anyone else reads the (lagging) replica.
+    assert [row["id"] for row in client.get("/api/integrations/suppliers").json()] == [connector_id]
+    assert client.get("/api/integrations/suppliers", headers={"x-user-id": "someone-else"}).json() == []
+
+
+def test_read_your_writes_window_drops_writers_that_never_read_again(db_session, monkeypatch):
+    monkeypatch.setattr(deps, "_read_primary_until", {})
+    monkeypatch.setattr(config, "READ_YOUR_WRITES_WINDOW_S", 0.0)
+    for idx in range(5):
+        db = database.SessionLocal()
+        try:
+            db.info[deps.WRITER_KEY] = ("t-ryw", f"user-{idx}")
+            db.add(models.User(tenant_id="t-ryw", email=f"user-{idx}@demo.local", role="pm"))
+            db.commit()
+        finally:
+            db.close()
+    # Each commit drops the expired deadlines in front of it, including its own zero-length one.
+    assert deps._read_primary_until == {}
+
+
+def test_sqlite_read_pool_is_query_only(db_session):
+    read_db = database.ReadSessionLocal()
+    try:
+        assert read_db.get_bind() is not database.engine
+        with pytest.raises(OperationalError):
+            read_db.execute(insert(models.User), [{"tenant_id": "t", "email": "a@b.c", "role": "owner"}])
+    finally:
+        read_db.close()
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import logging
+from collections import Counter
+
+from app import config, instrumentation
+
+
+def test_server_timing_header_and_metrics_endpoint(client):
+    response = client.get("/api/alerts")
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert "queries" in timing and "total;dur=" in timing
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'buildsight_http_requests_total{method="GET",route="/api/alerts",status="200"}' in metrics.text
+    assert 'buildsight_db_queries_per_request_count{method="GET",route="/api/alerts"}' in metrics.text
+
+
+def test_n_plus_one_detector_flags_repeated_statements(monkeypatch, caplog):
+    monkeypatch.setattr(config, "N_PLUS_ONE_THRESHOLD", 3)
+    repeated = instrumentation.RequestMetrics(
+        query_count=6,
+        statements=Counter({"SELECT * FROM alerts WHERE id = ?": 5, "SELECT 1": 1}),
+    )
+    varied = instrumentation.RequestMetrics(
+        query_count=6,
+        statements=Counter({f"SELECT {idx}": 1 for idx in range(6)}),
+    )
+
+    with caplog.at_level(logging.WARNING, logger="app.instrumentation"):
+        assert instrumentation._suspected_n_plus_one("GET", "/api/orders/{order_id}", repeated)
+        assert not instrumentation._suspected_n_plus_one("GET", "/api/orders/{order_id}", varied)
+    assert "possible N+1" in caplog.text
+    assert "repeated=5" in caplog.text
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+
+from app import codes, database, migrations
+
+LEGACY_RISK_ASSESSMENTS = (
+    "CREATE TABLE risk_assessments ("
+    "id VARCHAR(36) PRIMARY KEY, order_line_id VARCHAR(36) NOT NULL, model_version VARCHAR(64) NOT NULL, "
+    "risk_score FLOAT NOT NULL, risk_status VARCHAR(16) NOT NULL, confidence FLOAT NOT NULL, "
+    "reason_codes_json TEXT NOT NULL, estimated_delay_days INTEGER NOT NULL, stale_data BOOLEAN NOT NULL, "
+    "assessed_at DATETIME NOT NULL)"
+)
+LEGACY_SYNC_RUNS = (
+    "CREATE TABLE sync_runs ("
+    "id VARCHAR(36) PRIMARY KEY, connector_id VARCHAR(36) NOT NULL, mode VARCHAR(32) NOT NULL, "
+    "status VARCHAR(32) NOT NULL, attempts INTEGER NOT NULL, error TEXT, impacted_orders_json TEXT NOT NULL, "
+    "started_at DATETIME NOT NULL, completed_at DATETIME)"
+)
+
+
+def _legacy_engine(tmp_path: Path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_RISK_ASSESSMENTS))
+        conn.execute(text("CREATE INDEX ix_risk_assessments_order_line_id ON risk_assessments (order_line_id)"))
+        conn.execute(
+            text(
+                "INSERT INTO risk_assessments VALUES "
+                "('a1', 'o1', 'heuristic_v1', 0.9, 'red', 0.7, :reasons, 9, 1, '2026-01-02 00:00:00'), "
+                "('a2', 'o2', 'heuristic_v1', 0.1, 'green', 0.8, '[]', 1, 0, '2026-01-01 00:00:00')"
+            ),
+            {"reasons": json.dumps(["LOW_STOCK", "STALE_DATA"])},
+        )
+        conn.execute(text(LEGACY_SYNC_RUNS))
+        conn.execute(
+            text(
+                "INSERT INTO sync_runs VALUES "
+                "('run-public-id', 'c1', 'incremental', 'success', 1, NULL, '[]', '2026-01-01 00:00:00', NULL)"
+            )
+        )
+    return engine
+
+
+def test_risk_assessment_codes_migration_backfills_legacy_rows(tmp_path: Path):
+    engine = _legacy_engine(tmp_path)
+
+    migrations.run_migrations(engine)
+    migrations.run_migrations(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("risk_assessments")}
+    assert "risk_status" not in columns
+    assert "reason_codes_json" not in columns
+    with engine.connect() as conn:
+        rows = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute(text("SELECT order_line_id, status_code, reason_mask FROM risk_assessments"))
+        }
+    assert rows["o1"] == (codes.RISK_STATUS_CODES["red"], codes.encode_reason_codes(["LOW_STOCK", "STALE_DATA"]))
+    assert rows["o2"] == (codes.RISK_STATUS_CODES["green"], 0)
+
+
+def test_surrogate_key_migration_keeps_public_sync_run_ids(tmp_path: Path):
+    engine = _legacy_engine(tmp_path)
+
+    migrations.run_migrations(engine)
+
+    with engine.connect() as conn:
+        assessments = conn.execute(text("SELECT id, order_line_id FROM risk_assessments ORDER BY id")).all()
+        runs = conn.execute(text("SELECT id FROM sync_runs")).all()
+    assert [tuple(row) for row in assessments] == [(1, "o2"), (2, "o1")]
+    assert [tuple(row) for row in runs] == [("run-public-id",)]
+
+
+def test_upgraded_database_keeps_foreign_keys_valid(tmp_path: Path):
+    engine = _legacy_engine(tmp_path)
+    # Startup order: create_all adds the tables that are new (sync_run_profiles) before migrations run.
+    database.Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+
+    with engine.begin() as conn:
+        # The fixture's assessments point at order lines it never created.
+        conn.execute(text("DELETE FROM risk_assessments"))
+        conn.execute(
+            text(
+                "INSERT INTO supplier_connectors (id, tenant_id, supplier_name, auth_type, secret_ref, status, "
+                "poll_interval_minutes, created_at) "
+                "VALUES ('c1', 't', 'BuildPro', 'api_key', 's', 'healthy', 60, '2026-01-01 00:00:00')"
+            )
+        )
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA foreign_keys = ON"))
+        assert conn.execute(text("PRAGMA foreign_key_check")).all() == []
+        conn.execute(
+            text(
+                "INSERT INTO sync_run_profiles (sync_run_id, collapsed_stacks, pstats, sample_count, created_at) "
+                "VALUES ('run-public-id', '', x'', 0, '2026-01-01 00:00:00')"
+            )
+        )
+        assert conn.execute(text("PRAGMA foreign_key_check")).all() == []
+
+
+def test_integer_key_rebuild_leaves_references_on_the_rebuilt_table(tmp_path: Path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE assessment_notes (assessment_id VARCHAR(36) REFERENCES risk_assessments (id))"))
+    migrations.run_migrations(engine)
+
+    with engine.connect() as conn:
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'assessment_notes'")).scalar_one()
+        tables = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    assert ddl.endswith("REFERENCES risk_assessments (id))")
+    assert "risk_assessments_new" not in tables
+
+
+def test_closed_at_backfill_uses_last_supplier_timestamp(tmp_path: Path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE order_lines (id VARCHAR(36) PRIMARY KEY, status VARCHAR(32) NOT NULL, "
+                "source_timestamp DATETIME, updated_at DATETIME NOT NULL)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO order_lines VALUES "
+                "('done', 'delivered', '2026-01-05 00:00:00', '2026-02-01 00:00:00'), "
+                "('open', 'open', '2026-01-05 00:00:00', '2026-02-01 00:00:00')"
+            )
+        )
+
+    with engine.begin() as conn:
+        migrations._add_order_line_closed_at(conn)
+        migrations._add_order_line_closed_at(conn)
+
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT id, closed_at FROM order_lines")).all())
+    assert str(rows["done"]).startswith("2026-01-05")
+    assert rows["open"] is None
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from app import models
+from app.services.rescore import rescore_all
+from app.synthetic import SyntheticSpec, generate_synthetic_data
+
+SPEC = SyntheticSpec(
+    tenants=3,
+    connectors_per_tenant=1,
+    skus_per_connector=5,
+    open_lines_per_tenant=30,
+    history_depth=1,
+    assessment_depth=1,
+)
+
+
+def _assessments(db_session) -> int:
+    db_session.expire_all()
+    return db_session.query(models.RiskAssessment).count()
+
+
+def test_rescore_all_resumes_from_checkpoints(db_session):
+    dataset = generate_synthetic_data(db_session, SPEC)
+    first, second, third = dataset.tenant_ids
+    before = _assessments(db_session)
+
+    # An interrupted run: the first tenant finished, the second committed one chunk.
+    done_through = sorted(dataset.open_line_ids[second])[9]
+    db_session.add_all(
+        [
+            models.RescoreCheckpoint(run_id="nightly", tenant_id=first, lines_scored=30, completed_at=models.utcnow()),
+            models.RescoreCheckpoint(run_id="nightly", tenant_id=second, last_order_line_id=done_through, lines_scored=10),
+        ]
+    )
+    db_session.commit()
+
+    result = rescore_all("nightly", batch_size=7, alerts=False)
+    assert result.skipped_tenants == [first]
+    assert result.lines_by_tenant == {second: 20, third: 30}
+    assert result.lines_per_second > 0
+    assert _assessments(db_session) == before + 50
+    checkpoints = {row.tenant_id: row for row in db_session.query(models.RescoreCheckpoint).filter_by(run_id="nightly")}
+    assert checkpoints[second].lines_scored == 30
+    assert all(row.completed_at is not None for row in checkpoints.values())
+
+    assert rescore_all("nightly").lines == 0
+
+
+def test_rescore_all_process_pool_scores_every_tenant(db_session):
+    dataset = generate_synthetic_data(db_session, SPEC)
+    before = _assessments(db_session)
+
+    result = rescore_all("pool", workers=2, batch_size=8)
+    assert result.lines_by_tenant == {tenant_id: 30 for tenant_id in dataset.tenant_ids}
+    assert _assessments(db_session) == before + 90
+    latest_versions = {row.model_version for row in db_session.query(models.RiskAssessment)}
+    assert latest_versions == {"heuristic_v1"}
+
+
+def test_rescore_reuses_stored_feature_vectors(db_session):
+    generate_synthetic_data(db_session, SPEC)
+    rescore_all("first", alerts=False)
+    db_session.expire_all()
+    computed = {row.order_line_id: row.computed_at for row in db_session.query(models.OrderLineFeatures)}
+    assert len(computed) == 90
+
+    # A threshold or model change rescores unchanged inputs without recomputing their vectors.
+    assert rescore_all("second", alerts=False).lines == 90
+    db_session.expire_all()
+    assert {row.order_line_id: row.computed_at for row in db_session.query(models.OrderLineFeatures)} == computed
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import logging
+import statistics
 from datetime import timedelta
 
-from app import models
+from app import codes, config, models
+from app.services import eta, features, model_registry, scoring
+from app.services.sync import changed_since, queue_sync_run, register_payload_provider, run_sync_job
 from app.services.scoring import compute_order_risk, status_from_score, utcnow
 
 
@@ -148,3 +152,367 @@ def test_partial_delivery_adds_reason_code(db_session):
     result = compute_order_risk(db_session, order)
     assert "PARTIAL_DELIVERY" in result.reason_codes
 
+
+
+def test_reason_code_mask_round_trip():
+    reasons = ["LOW_STOCK", "ETA_VOLATILITY", "STALE_DATA"]
+    mask = codes.encode_reason_codes(reasons)
+    assert list(codes.decode_reason_codes(mask)) == reasons
+    assert codes.decode_status(codes.encode_status("red")) == "red"
+
+
+def _features(**overrides) -> scoring.ScoringFeatures:
+    now = utcnow()
+    values = {
+        "order_line_id": "line-1",
+        "qty_available": 500.0,
+        "inventory_source_timestamp": now - timedelta(hours=1),
+        "qty_ordered": 100.0,
+        "qty_delivered": 0.0,
+        "history_count": 4,
+        "delayed_count": 0,
+        "avg_historical_lead_days": 10.0,
+        "lead_time_days": 10.0,
+        "eta_variance_days": 0.0,
+        "impact_date": (now + timedelta(days=3)).date(),
+    }
+    return scoring.ScoringFeatures(**{**values, **overrides})
+
+
+def test_every_scoring_reason_code_is_registered():
+    fixtures = [
+        # Baseline: stocked, punctual, fresh; no rule fires.
+        _features(),
+        # Every history-dependent rule plus partial delivery and stale data.
+        _features(
+            qty_available=0.0,
+            inventory_source_timestamp=None,
+            qty_delivered=10.0,
+            delayed_count=4,
+            lead_time_days=30.0,
+            eta_variance_days=7.0,
+        ),
+        _features(history_count=0, delayed_count=0, avg_historical_lead_days=None),
+    ]
+    emitted: set[str] = set()
+    for version in model_registry.available_models():
+        for result in model_registry.get_model(version).score(fixtures):
+            codes.encode_reason_codes(result.reason_codes)
+            emitted.update(result.reason_codes)
+    assert emitted == set(codes.REASON_CODE_BITS)
+
+
+class _AlwaysRedModel:
+    version = "always_red_test"
+
+    def score(self, features):
+        now = utcnow()
+        results = []
+        for item in features:
+            result = scoring.score_features(item, now)
+            result.risk_score = 0.95
+            result.risk_status = "red"
+            results.append(result)
+        return results
+
+
+def test_shadow_model_logs_divergence_without_writing(db_session, monkeypatch, caplog):
+    connector = models.SupplierConnector(
+        tenant_id="t4",
+        supplier_name="BuildPro",
+        auth_type="api_key",
+        secret_ref="secret://test4",
+    )
+    db_session.add(connector)
+    db_session.commit()
+    model_registry.register_model(_AlwaysRedModel())
+    monkeypatch.setitem(config.TENANT_SHADOW_MODELS, "t4", "always_red_test")
+
+    run = queue_sync_run(db_session, connector.id)
+    with caplog.at_level(logging.INFO, logger="app.services.model_registry"):
+        run_sync_job(run.id)
+
+    assessments = db_session.query(models.RiskAssessment).all()
+    assert assessments
+    assert {item.model_version for item in assessments} == {"heuristic_v1"}
+    assert "shadow divergence model=always_red_test" in caplog.text
+
+
+def test_tenant_model_selection(monkeypatch):
+    model_registry.register_model(_AlwaysRedModel())
+    monkeypatch.setitem(config.TENANT_SCORING_MODELS, "t5", "always_red_test")
+    assert model_registry.model_for_tenant("t5").version == "always_red_test"
+    assert model_registry.model_for_tenant("other").version == config.DEFAULT_SCORING_MODEL
+    assert model_registry.shadow_model_for_tenant("other") is None
+
+
+def test_feature_store_reuses_stored_vectors(db_session):
+    connector = models.SupplierConnector(
+        tenant_id="t6",
+        supplier_name="BuildPro",
+        auth_type="api_key",
+        secret_ref="secret://test6",
+    )
+    db_session.add(connector)
+    db_session.commit()
+    order = models.OrderLine(
+        tenant_id="t6",
+        supplier_id=connector.id,
+        supplier_order_id="OPEN-6",
+        supplier_sku="CONC-STD-80",
+        qty_ordered=30,
+        status="open",
+    )
+    db_session.add(order)
+    db_session.commit()
+
+    first = features.load_features(db_session, [order])[0]
+    db_session.commit()
+    stored = db_session.get(models.OrderLineFeatures, order.id)
+    assert stored is not None
+    computed_at = stored.computed_at
+    assert features.load_features(db_session, [order])[0] == first
+    assert db_session.get(models.OrderLineFeatures, order.id).computed_at == computed_at
+
+    # Inputs changing outside a sync invalidate the stored vector regardless of its age.
+    order.qty_ordered = 999
+    db_session.commit()
+    assert features.load_features(db_session, [order], persist=False)[0].qty_ordered == 999
+    assert db_session.get(models.OrderLineFeatures, order.id).computed_at == computed_at
+    assert features.load_features(db_session, [order])[0].qty_ordered == 999
+    db_session.commit()
+
+    db_session.add(
+        models.SupplierInventorySnapshot(
+            connector_id=connector.id,
+            supplier_sku="CONC-STD-80",
+            qty_available=7,
+            source_timestamp=utcnow(),
+        )
+    )
+    db_session.commit()
+    assert features.load_features(db_session, [order])[0].qty_available == 7
+
+
+def test_sync_rejects_invalid_records_and_counts_them(db_session):
+    now = utcnow()
+    valid = {
+        "external_order_line_id": "RJ-1-L1",
+        "supplier_order_id": "RJ-1",
+        "supplier_sku": "SKU-1",
+        "qty_ordered": 10,
+        "source_timestamp": now.isoformat(),
+    }
+    future = {**valid, "supplier_order_id": "RJ-2", "source_timestamp": (now + timedelta(days=3)).isoformat()}
+    missing = {"supplier_order_id": "RJ-3", "supplier_sku": "SKU-1"}
+    register_payload_provider("RejectingSupplier", lambda connector, since=None: {"inventory": [], "orders": [valid, future, missing]})
+    connector = models.SupplierConnector(
+        tenant_id="t-reject",
+        supplier_name="RejectingSupplier",
+        auth_type="api_key",
+        secret_ref="secret://test",
+    )
+    db_session.add(connector)
+    db_session.commit()
+
+    run = queue_sync_run(db_session, connector.id)
+    run_sync_job(run.id)
+
+    db_session.expire_all()
+    stored = db_session.query(models.SyncRun).filter_by(id=run.id).one()
+    assert stored.status == "success"
+    assert (stored.records_received, stored.records_inserted, stored.records_rejected) == (3, 1, 2)
+    assert db_session.query(models.OrderLine).filter_by(tenant_id="t-reject").count() == 1
+
+
+def _cursor_connector(db_session, supplier_name: str, orders: list[dict]) -> models.SupplierConnector:
+    register_payload_provider(supplier_name, lambda connector, since=None: changed_since({"inventory": [], "orders": orders}, since))
+    connector = models.SupplierConnector(
+        tenant_id=f"t-{supplier_name.lower()}",
+        supplier_name=supplier_name,
+        auth_type="api_key",
+        secret_ref="secret://test",
+    )
+    db_session.add(connector)
+    db_session.commit()
+    return connector
+
+
+def _sync(db_session, connector: models.SupplierConnector, mode: str) -> models.SyncRun:
+    run = queue_sync_run(db_session, connector.id, mode)
+    run_sync_job(run.id)
+    db_session.expire_all()
+    return db_session.query(models.SyncRun).filter_by(id=run.id).one()
+
+
+def test_sync_scoring_reuses_current_feature_vectors(db_session):
+    orders = [
+        {
+            "external_order_line_id": "FS-1-L1",
+            "supplier_order_id": "FS-1",
+            "supplier_sku": "SKU-1",
+            "qty_ordered": 10,
+            "source_timestamp": utcnow().isoformat(),
+        }
+    ]
+    connector = _cursor_connector(db_session, "FeatureReuseSupplier", orders)
+    _sync(db_session, connector, "full")
+    line = db_session.query(models.OrderLine).filter_by(supplier_id=connector.id).one()
+    computed_at = db_session.get(models.OrderLineFeatures, line.id).computed_at
+
+    _sync(db_session, connector, "full")
+    assert db_session.get(models.OrderLineFeatures, line.id).computed_at == computed_at
+    assert db_session.query(models.RiskAssessment).filter_by(order_line_id=line.id).count() == 2
+
+    orders[0] = {**orders[0], "qty_ordered": 20, "source_timestamp": utcnow().isoformat()}
+    _sync(db_session, connector, "full")
+    stored = db_session.get(models.OrderLineFeatures, line.id)
+    assert stored.computed_at > computed_at
+    assert stored.qty_ordered == 20
+
+
+def test_incremental_inventory_only_change_rescores_open_lines(db_session):
+    then = utcnow() - timedelta(hours=2)
+    order = {
+        "external_order_line_id": "INV-1-L1",
+        "supplier_order_id": "INV-1",
+        "supplier_sku": "SKU-STOCK",
+        "qty_ordered": 800,
+        "source_timestamp": (then - timedelta(hours=1)).isoformat(),
+    }
+    payload = {
+        "inventory": [{"sku": "SKU-STOCK", "qty_available": 500, "source_timestamp": then.isoformat()}],
+        "orders": [order],
+    }
+    register_payload_provider("StockOnlySupplier", lambda connector, since=None: changed_since(payload, since))
+    connector = models.SupplierConnector(
+        tenant_id="t-stock-only",
+        supplier_name="StockOnlySupplier",
+        auth_type="api_key",
+        secret_ref="secret://test",
+    )
+    db_session.add(connector)
+    db_session.commit()
+
+    assert _sync(db_session, connector, "incremental").status == "success"
+    line = db_session.query(models.OrderLine).filter_by(tenant_id="t-stock-only").one()
+    assessments = db_session.query(models.RiskAssessment).filter_by(order_line_id=line.id)
+    assert assessments.count() == 1
+
+    # The order record is older than the cursor, so only the stock change comes back.
+    payload["inventory"] = [{"sku": "SKU-STOCK", "qty_available": 1000, "source_timestamp": utcnow().isoformat()}]
+    second = _sync(db_session, connector, "incremental")
+    assert (second.records_received, second.records_inserted) == (1, 1)
+    assert assessments.count() == 2
+
+
+def test_incremental_sync_resumes_from_cursor(db_session):
+    then = utcnow() - timedelta(hours=2)
+    orders = [
+        {
+            "external_order_line_id": f"CUR-{n}-L1",
+            "supplier_order_id": f"CUR-{n}",
+            "supplier_sku": "SKU-1",
+            "qty_ordered": 10,
+            "source_timestamp": then.isoformat(),
+        }
+        for n in range(3)
+    ]
+    connector = _cursor_connector(db_session, "CursorSupplier", orders)
+
+    assert _sync(db_session, connector, "incremental").records_inserted == 3
+    assert db_session.get(models.SyncCursor, connector.id).watermark == then
+
+    orders[0] = {**orders[0], "qty_delivered": 4, "source_timestamp": utcnow().isoformat()}
+    second = _sync(db_session, connector, "incremental")
+    # The two untouched records sit exactly on the watermark and are re-sent but skipped by hash.
+    assert (second.records_received, second.records_updated, second.records_unchanged) == (3, 1, 2)
+
+    third = _sync(db_session, connector, "incremental")
+    assert (third.records_received, third.records_updated) == (1, 0)
+
+
+def test_full_sync_flags_lines_missing_from_feed(db_session):
+    now = utcnow()
+    orders = [
+        {
+            "external_order_line_id": f"REC-{n}-L1",
+            "supplier_order_id": f"REC-{n}",
+            "supplier_sku": "SKU-1",
+            "qty_ordered": 10,
+            "source_timestamp": now.isoformat(),
+        }
+        for n in range(3)
+    ]
+    connector = _cursor_connector(db_session, "ReconcileSupplier", orders)
+    assert _sync(db_session, connector, "full").records_missing == 0
+
+    dropped = orders.pop()
+    run = _sync(db_session, connector, "full")
+    assert run.records_missing == 1
+    lines = {line.supplier_order_id: line for line in db_session.query(models.OrderLine).filter_by(supplier_id=connector.id)}
+    assert lines[dropped["supplier_order_id"]].missing_since is not None
+    assert lines["REC-0"].missing_since is None
+
+    orders.append(dropped)
+    assert _sync(db_session, connector, "full").records_missing == 0
+    db_session.expire_all()
+    assert db_session.query(models.OrderLine).filter(models.OrderLine.missing_since.is_not(None)).count() == 0
+
+
+def test_eta_revisions_logged_on_change_with_running_statistics(db_session):
+    record = {
+        "external_order_line_id": "ETA-1-L1",
+        "supplier_order_id": "ETA-1",
+        "supplier_sku": "SKU-1",
+        "qty_ordered": 10,
+        "eta_date": "2026-03-01",
+        "source_timestamp": utcnow().isoformat(),
+    }
+    orders = [record]
+    connector = _cursor_connector(db_session, "EtaSupplier", orders)
+    _sync(db_session, connector, "full")
+
+    for eta_date, qty in [("2026-03-05", 10), ("2026-03-05", 12), ("2026-03-04", 12), ("2026-03-10", 12)]:
+        orders[0] = {**record, "eta_date": eta_date, "qty_ordered": qty, "source_timestamp": utcnow().isoformat()}
+        _sync(db_session, connector, "incremental")
+
+    line = db_session.query(models.OrderLine).filter_by(supplier_order_id="ETA-1").one()
+    revisions = db_session.query(models.EtaRevision).filter_by(order_line_id=line.id).order_by(models.EtaRevision.id).all()
+    shifts = [revision.shift_days for revision in revisions]
+    # The qty-only update does not move the ETA and is not logged.
+    assert shifts == [4, -1, 6]
+
+    mean = sum(shifts) / len(shifts)
+    assert line.eta_revision_count == 3
+    assert abs(line.eta_shift_mean_days - mean) < 1e-9
+    assert abs(eta.eta_shift_stddev(line) - statistics.stdev(shifts)) < 1e-9
+    alpha = config.ETA_EWMA_ALPHA
+    volatility = 4.0
+    trend = 4.0
+    for shift in shifts[1:]:
+        volatility = alpha * abs(shift) + (1 - alpha) * volatility
+        trend = alpha * shift + (1 - alpha) * trend
+    assert abs(line.eta_volatility_days - volatility) < 1e-9
+    assert abs(line.eta_trend_days - trend) < 1e-9
+
+    features = scoring.extract_features(db_session, [line])[0]
+    assert features.eta_volatility_days == line.eta_volatility_days
+    assert features.eta_shift_stddev_days == eta.eta_shift_stddev(line)
+    expected = scoring.clamp(max(volatility, statistics.stdev(shifts)) / 7.0, 0.0, 1.0)
+    assert scoring.feature_components(features, utcnow(), eta_revisions=True).eta_volatility_component == expected
+    # heuristic_v1 keeps its original formula: supplier-reported variance only.
+    assert scoring.feature_components(features, utcnow()).eta_volatility_component == 0.0
+
+    # A line that swings back and forth has a low recent-weighted volatility but a wide lifetime spread.
+    swinging = scoring.candidate_line(line, line.supplier_id, line.supplier_sku)
+    for shift in (12.0, -12.0, 1.0, -1.0, 1.0, -1.0):
+        eta.apply_revision(swinging, shift)
+    swung = scoring.extract_features(db_session, [swinging])[0]
+    assert swung.eta_shift_stddev_days > swung.eta_volatility_days
+    assert scoring.feature_components(swung, utcnow(), eta_revisions=True).eta_volatility_component == scoring.clamp(
+        swung.eta_shift_stddev_days / 7.0, 0.0, 1.0
+    )
+    v1, v2 = (model_registry.get_model(version).score([swung])[0] for version in ("heuristic_v1", "heuristic_v2"))
+    assert "ETA_VOLATILITY" not in v1.reason_codes
+    assert "ETA_VOLATILITY" in v2.reason_codes
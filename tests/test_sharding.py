@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app import cli, config, database, models, sharding
+from app.main import create_app
+from app.services.sync import queue_all_syncs, run_sync_jobs
+from app.synthetic import SyntheticSpec, generate_synthetic_data
+
+
+@pytest.fixture()
+def shard_dir(tmp_path: Path):
+    directory = tmp_path / "shards"
+    sharding.configure(directory, buckets=0)
+    try:
+        yield directory
+    finally:
+        sharding.configure(None)
+
+
+def _count(engine, model, tenant_id: str | None = None) -> int:
+    query = select(func.count()).select_from(model)
+    if tenant_id is not None:
+        query = query.where(model.tenant_id == tenant_id)
+    with engine.connect() as conn:
+        return conn.execute(query).scalar_one()
+
+
+def _connect(client, tenant_id: str, supplier_name: str) -> str:
+    response = client.post(
+        "/api/integrations/suppliers",
+        json={"supplierName": supplier_name, "authType": "api_key", "credentials": {"apiKey": "k"}},
+        headers={"x-tenant-id": tenant_id},
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_requests_are_routed_to_the_tenant_shard(shard_dir, client):
+    _connect(client, "tenant-a", "BuildPro")
+    _connect(client, "tenant-b", "MetroLumber")
+
+    router = sharding.router
+    assert router.shard_keys() == ["tenant-tenant-a", "tenant-tenant-b"]
+    assert _count(router.engine("tenant-tenant-a"), models.SupplierConnector) == 1
+    assert _count(router.engine("tenant-tenant-b"), models.SupplierConnector) == 1
+    assert _count(database.engine, models.SupplierConnector) == 0
+
+    listed = client.get("/api/integrations/suppliers", headers={"x-tenant-id": "tenant-b"}).json()
+    assert [row["supplierName"] for row in listed] == ["MetroLumber"]
+
+
+def test_engine_cache_is_bounded(tmp_path):
+    router = sharding.ShardRouter(tmp_path, cache_size=2)
+    first = router.engine("tenant-1")
+    router.engine("tenant-2")
+    router.engine("tenant-1")
+    router.engine("tenant-3")
+
+    # tenant-2 was least recently used; tenant-1 stays cached.
+    assert list(router._engines) == ["tenant-1", "tenant-3"]
+    assert router.engine("tenant-1") is first
+    assert router.shard_keys() == ["tenant-1", "tenant-2", "tenant-3"]
+    router.dispose()
+
+
+def test_migrate_then_rebalance_into_buckets_keeps_every_row(db_session, shard_dir):
+    spec = SyntheticSpec(tenants=3, connectors_per_tenant=1, skus_per_connector=3, open_lines_per_tenant=6, history_depth=1)
+    dataset = generate_synthetic_data(db_session, spec)
+    shared = database.engine
+    expected = {
+        table.name: db_session.execute(select(func.count()).select_from(table)).scalar_one()
+        for table in sharding.tenant_tables()
+    }
+
+    copied = sharding.migrate_tenants(shared, sharding.router, purge_source=True)
+    assert sorted(copied) == dataset.tenant_ids
+    assert _count(shared, models.OrderLine) == 0
+    for tenant_id in dataset.tenant_ids:
+        engine = sharding.router.engine(sharding.router.shard_key(tenant_id))
+        assert _count(engine, models.OrderLine) == _count(engine, models.OrderLine, tenant_id) > 0
+
+    router = sharding.configure(shard_dir, buckets=2)
+    moved = sharding.rebalance(router)
+    assert sorted(moved) == dataset.tenant_ids
+    assert all(target.startswith("bucket-") for _, target in moved.values())
+
+    totals = {table.name: 0 for table in sharding.tenant_tables()}
+    for key in router.shard_keys():
+        with router.engine(key).connect() as conn:
+            assert all(router.shard_key(tenant_id) == key for tenant_id in sharding.tenant_ids(conn))
+            for table in sharding.tenant_tables():
+                totals[table.name] += conn.execute(select(func.count()).select_from(table)).scalar_one()
+    assert totals == expected
+    assert sharding.rebalance(router) == {}
+
+
+def test_sync_all_runs_each_shard(shard_dir, client):
+    for tenant_id in ("tenant-a", "tenant-b", "tenant-c"):
+        _connect(client, tenant_id, "BuildPro")
+
+    jobs = queue_all_syncs("full")
+    run_sync_jobs(jobs, workers=3)
+
+    assert len(jobs) == 3
+    for sync_run_id, tenant_id in jobs:
+        db = sharding.session_for_tenant(tenant_id)
+        try:
+            assert db.query(models.SyncRun).filter_by(id=sync_run_id).one().status == "success"
+            assert db.query(models.OrderLine).filter(models.OrderLine.tenant_id != tenant_id).count() == 0
+            assert db.query(models.OrderLine).count() > 0
+        finally:
+            db.close()
+
+
+def test_seed_and_cli_commands_use_the_tenant_shards(shard_dir, db_session, tmp_path, capsys):
+    with TestClient(create_app(seed_demo=True)):
+        pass
+    db = sharding.session_for_tenant(config.DEFAULT_TENANT_ID)
+    try:
+        assert {run.status for run in db.query(models.SyncRun)} == {"success"}
+        assert db.query(models.RiskAssessment).count() > 0
+    finally:
+        db.close()
+
+    cli.main(["generate-synthetic", "--tenants", "2", "--connectors", "1", "--skus", "3", "--open-lines", "4", "--history-depth", "1"])
+    assert _count(database.engine, models.OrderLine) == 0
+    for tenant_id in ("synthetic-001", "synthetic-002"):
+        engine = sharding.router.engine(sharding.router.shard_key(tenant_id))
+        assert _count(engine, models.OrderLine) == _count(engine, models.OrderLine, tenant_id) > 0
+
+    cli.main(["export-training", "--output", str(tmp_path / "training")])
+    assert "from 3 databases" in capsys.readouterr().out
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+
+from app import models
+from app.services.sync import queue_sync_run, run_sync_job
+from app.services.training_export import WATERMARK_NAME, export_training_dataset, utcnow
+
+
+def _synced_alerts(db_session) -> list[models.Alert]:
+    connector = models.SupplierConnector(
+        tenant_id="t1",
+        supplier_name="BuildPro",
+        auth_type="api_key",
+        secret_ref="secret://test",
+    )
+    db_session.add(connector)
+    db_session.commit()
+    run = queue_sync_run(db_session, connector.id)
+    run_sync_job(run.id)
+    return db_session.query(models.Alert).order_by(models.Alert.created_at).all()
+
+
+def test_training_export_is_incremental(db_session, tmp_path):
+    alerts = _synced_alerts(db_session)
+    assert alerts
+    first = alerts[0]
+    order_line = db_session.get(models.OrderLine, first.order_line_id)
+    order_line.status = "delayed"
+    order_line.closed_at = datetime.combine(order_line.eta_date + timedelta(days=3), datetime.min.time())
+    db_session.add(models.AlertFeedback(alert_id=first.id, user_id="u1", disposition="accurate"))
+    db_session.commit()
+
+    # Fresh feedback waits out the settle window.
+    assert export_training_dataset(db_session, tmp_path).rows == 0
+    later = utcnow() + timedelta(hours=1)
+    result = export_training_dataset(db_session, tmp_path, now=later)
+    assert result.rows == 1
+    rows = pq.read_table(result.files[0]).to_pylist()
+    assert rows[0]["alert_id"] == first.id
+    assert rows[0]["outcome_status"] == "delayed"
+    assert rows[0]["outcome_final"] is True
+    assert rows[0]["actual_delay_days"] == 3
+    assert rows[0]["risk_status"] in {"yellow", "red"}
+    assert rows[0]["assessed_at"] <= rows[0]["alert_created_at"]
+    assert result.files[0].parent.name.startswith("feedback_date=")
+
+    assert export_training_dataset(db_session, tmp_path, now=later).rows == 0
+
+    db_session.add(
+        models.AlertFeedback(
+            alert_id=alerts[-1].id,
+            user_id="u2",
+            disposition="false_positive",
+            created_at=rows[0]["feedback_created_at"] + timedelta(seconds=1),
+        )
+    )
+    db_session.commit()
+    follow_up = export_training_dataset(db_session, tmp_path, now=later)
+    assert follow_up.rows == 1
+    assert pq.read_table(follow_up.files[0]).column("disposition").to_pylist() == ["false_positive"]
+
+
+def test_training_export_rerun_after_lost_watermark_overwrites_parts(db_session, tmp_path):
+    output = tmp_path / "training"
+    alert = _synced_alerts(db_session)[0]
+    db_session.add(models.AlertFeedback(alert_id=alert.id, user_id="u1", disposition="accurate"))
+    db_session.commit()
+    later = utcnow() + timedelta(hours=1)
+    first = export_training_dataset(db_session, output, now=later)
+
+    # A crash after writing but before the watermark commit looks like the watermark never moved.
+    db_session.delete(db_session.get(models.ExportWatermark, WATERMARK_NAME))
+    db_session.commit()
+    again = export_training_dataset(db_session, output, now=later)
+
+    assert again.files == first.files
+    assert pq.read_table(output).num_rows == 1